@@ -0,0 +1,259 @@
+"""Deterministic offline stand-ins for the services the project talks to.
+
+Benchmarks and tests use these instead of OpenAI, Google Sheets and a
+real mail provider so that runs are reproducible and need no network or
+credentials. Latencies are configurable to model remote round trips.
+"""
+import asyncio
+import base64
+import re
+import socketserver
+import threading
+import time
+import zlib
+from typing import List, Optional
+import numpy as np
+from langchain_core.messages import AIMessage
+
+class FakeEmbeddings:
+    """Hash words into a fixed-size unit vector.
+
+    Texts sharing words land close together, which is enough for
+    retrieval and caching to behave realistically.
+    """
+
+    def __init__(self, dim: int = 256, latency: float = 0.0) -> None:
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return [self._embed(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakeChatModel:
+    """Chat model that answers after a fixed delay."""
+
+    def __init__(self, latency: float = 0.0, model_name: str = "fake-chat") -> None:
+        self.latency = latency
+        self.model_name = model_name
+        self.calls = 0
+
+    def _reply(self, prompt) -> AIMessage:
+        self.calls += 1
+        digest = zlib.crc32(str(prompt).encode())
+        return AIMessage(content=f"answer-{digest:08x}")
+
+    def invoke(self, prompt, config=None, **kwargs) -> AIMessage:
+        time.sleep(self.latency)
+        return self._reply(prompt)
+
+    async def ainvoke(self, prompt, config=None, **kwargs) -> AIMessage:
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
+
+
+def _cell(ref: str):
+    match = re.fullmatch(r"([A-Z]+)(\d+)", ref)
+    col = 0
+    for letter in match.group(1):
+        col = col * 26 + ord(letter) - ord("A") + 1
+    return int(match.group(2)), col
+
+
+def _trim(values: List[str]) -> List[str]:
+    values = list(values)
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+class FakeSheet:
+    """In-memory worksheet mimicking the parts of ``gspread`` in use.
+
+    Every method counts as one API request and sleeps ``latency``.
+    """
+
+    def __init__(self, header: List[str], rows: List[List[str]], latency: float = 0.0) -> None:
+        self.header = list(header)
+        self.rows = [list(r) + [""] * (len(header) - len(r)) for r in rows]
+        self.latency = latency
+        self.requests = 0
+
+    def _request(self) -> None:
+        self.requests += 1
+        time.sleep(self.latency)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows) + 1
+
+    def row_values(self, row: int) -> List[str]:
+        self._request()
+        return list(self.header) if row == 1 else list(self.rows[row - 2])
+
+    def get_all_records(self) -> List[dict]:
+        self._request()
+        return [dict(zip(self.header, r)) for r in self.rows]
+
+    def get_values(self, range_name: str) -> List[List[str]]:
+        self._request()
+        first, last = (_cell(ref) for ref in range_name.split(":"))
+        rows = self.rows[first[0] - 2:last[0] - 1]
+        # Like the Sheets API, trailing empty cells and rows are omitted.
+        values = [_trim(r[first[1] - 1:last[1]]) for r in rows]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def update_cell(self, row: int, col: int, value) -> None:
+        self._request()
+        self.rows[row - 2][col - 1] = value
+
+    def batch_update(self, data: List[dict]) -> None:
+        self._request()
+        for item in data:
+            row, col = _cell(item["range"])
+            self.rows[row - 2][col - 1] = item["values"][0][0]
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        sink = self.server.sink
+        with sink._lock:
+            sink.connections += 1
+        self._send("220 sink ESMTP ready")
+        served = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb, _, arg = line.decode("ascii", "replace").strip().partition(" ")
+            verb = verb.upper()
+            time.sleep(sink.latency)
+            if verb in ("EHLO", "HELO"):
+                self._send("250 sink", "250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                mechanism = arg.split(" ")[0].upper()
+                if mechanism == "LOGIN":
+                    self._send("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self._send("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                elif " " not in arg:
+                    self._send("334 ")
+                    base64.b64decode(self.rfile.readline().strip())
+                with sink._lock:
+                    sink.logins += 1
+                if sink.refuse_login:
+                    self._send("535 authentication failed")
+                else:
+                    self._send("235 authenticated")
+            elif verb == "MAIL":
+                sender, recipients = arg[5:].strip(" <>"), []
+                self._send("250 OK")
+            elif verb == "RCPT":
+                recipient = arg[3:].strip(" <>")
+                code = sink.reject(recipient) if sink.reject else None
+                if code:
+                    self._send(f"{code} rejected")
+                    continue
+                recipients.append(recipient)
+                self._send("250 OK")
+            elif verb == "DATA":
+                self._send("354 end with <CRLF>.<CRLF>")
+                data = []
+                while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                    data.append(chunk)
+                with sink._lock:
+                    sink.messages.append((sender, recipients, b"".join(data)))
+                served += 1
+                self._send("250 queued")
+                if sink.drop_after and served >= sink.drop_after:
+                    return
+            elif verb in ("RSET", "NOOP"):
+                self._send("250 OK")
+            elif verb == "QUIT":
+                self._send("221 bye")
+                return
+            else:
+                self._send("502 not implemented")
+
+    def _send(self, *lines: str) -> None:
+        payload = "".join(
+            f"{l[:3]}{'-' if i < len(lines) - 1 else ' '}{l[4:]}\r\n" for i, l in enumerate(lines)
+        )
+        self.wfile.write(payload.encode())
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Local plain-text SMTP server with AUTH that records every message.
+
+    It does not offer STARTTLS, so agents talking to it are built with
+    ``starttls=False``.
+
+    Parameters
+    ----------
+    latency: float
+        Delay before each reply, modelling the network round trip.
+    drop_after: int, optional
+        Close a connection after this many messages, as providers do.
+    reject: Callable[[str], Optional[int]], optional
+        Return an SMTP error code to refuse a recipient.
+    refuse_login: bool
+        Answer every AUTH with ``535``, as for a wrong password.
+
+    Use as a context manager; ``port`` holds the listening port.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        drop_after: Optional[int] = None,
+        reject=None,
+        refuse_login: bool = False,
+    ) -> None:
+        self.latency = latency
+        self.drop_after = drop_after
+        self.reject = reject
+        self.refuse_login = refuse_login
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self._lock = threading.Lock()
+        self._server = _SMTPServer(("127.0.0.1", 0), _SMTPHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+
+    def __enter__(self) -> "SMTPSink":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
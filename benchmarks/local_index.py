@@ -0,0 +1,91 @@
+"""Recall and latency of the local vector index in exact and IVF modes.
+
+Usage::
+
+    python -m benchmarks.local_index --rows 200000 --dim 384
+
+Prints a JSON document with per-query latency percentiles for exact
+search and for IVF search at several ``nprobe`` settings, together with
+recall@k measured against the exact results.
+"""
+import argparse
+import json
+import tempfile
+import time
+import numpy as np
+from workflow.agents.local_index import LocalIndex
+
+
+def _clustered(rng, centers, rows, noise):
+    picks = rng.integers(0, len(centers), rows)
+    return (centers[picks] + noise * rng.normal(size=(rows, centers.shape[1]))).astype(np.float32)
+
+
+def _run(index, queries, k):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        results.append({doc.page_content for doc, _ in hits})
+    ms = np.array(latencies) * 1000
+    return results, {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtype", default="float32")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(args.clusters, args.dim))
+    data = _clustered(rng, centers, args.rows, 0.5)
+    queries = _clustered(rng, centers, args.queries, 0.5)
+
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalIndex(path, dtype=args.dtype)
+        start = time.perf_counter()
+        for s in range(0, args.rows, 10_000):
+            index.add([str(i) for i in range(s, min(s + 10_000, args.rows))], data[s:s + 10_000])
+        add_seconds = time.perf_counter() - start
+
+        exact, exact_stats = _run(index, queries, args.k)
+        start = time.perf_counter()
+        index.train(args.nlist, seed=args.seed)
+        train_seconds = time.perf_counter() - start
+
+        ivf = []
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            found, stats = _run(index, queries, args.k)
+            recall = np.mean([len(a & b) / args.k for a, b in zip(found, exact)])
+            ivf.append({"nprobe": nprobe, "recall": float(recall), **stats})
+
+        report = {
+            "rows": args.rows,
+            "dim": args.dim,
+            "dtype": args.dtype,
+            "k": args.k,
+            "nlist": len(index._centroids),
+            "add_rows_per_s": args.rows / add_seconds,
+            "train_s": train_seconds,
+            "exact": exact_stats,
+            "ivf": ivf,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":  # pragma: no cover - benchmark script
+    main()
@@ -0,0 +1,267 @@
+"""Offline benchmark suite for the ingestion, query and outreach pipelines.
+
+Usage::
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline bench.json --tolerance 0.2
+
+Every model, sheet and mail server is replaced by the deterministic
+stand-ins in :mod:`benchmarks.fakes`, so results depend only on this
+code and the machine. The report is printed as JSON; with ``--baseline``
+the run is compared to a previous report and the exit status is
+non-zero when a metric regressed by more than the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+from .fakes import FakeChatModel, FakeEmbeddings, FakeSheet, SMTPSink
+
+# The outreach agent lives in the legacy ``src`` tree, which imports its
+# modules as top-level ``agents``.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+WORDS = ["router", "reset", "firmware", "refund", "policy", "invoice", "error",
+         "network", "account", "password", "billing", "upgrade", "manual", "device"]
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def _document(paragraphs: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return "\n\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))) + "."
+        for _ in range(paragraphs)
+    )
+
+
+def _embedder(backend: str, embeddings):
+    from workflow.agents.embedder import EmbeddingAgent
+    from workflow.agents.local_index import LocalIndex
+
+    if backend == "local":
+        return EmbeddingAgent(backend=LocalIndex(), embeddings=embeddings)
+    return EmbeddingAgent(collection=f"bench-{os.getpid()}-{time.time_ns()}", embeddings=embeddings)
+
+
+def bench_ingest(args) -> dict:
+    """Chunks per second through ``load_and_chunk`` and ``EmbeddingAgent.add``."""
+    from workflow.agents.loader import load_and_chunk
+
+    embedder = _embedder(args.backend, FakeEmbeddings(latency=args.embed_latency))
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as tmp:
+        tmp.write(_document(args.paragraphs, args.seed))
+    try:
+        start = time.perf_counter()
+        chunks = load_and_chunk(tmp.name)
+        chunked = time.perf_counter()
+        for s in range(0, len(chunks), args.batch_size):
+            embedder.add(chunks[s:s + args.batch_size])
+        done = time.perf_counter()
+    finally:
+        os.unlink(tmp.name)
+        embedder.clear()
+    return {
+        "chunks": len(chunks),
+        "chunk_per_s": len(chunks) / (chunked - start),
+        "embed_per_s": len(chunks) / (done - chunked),
+        "total_per_s": len(chunks) / (done - start),
+    }
+
+
+def bench_query(args) -> dict:
+    """Latency of ``GET /query`` with concurrent clients hitting the app."""
+    import httpx
+
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    from workflow import app as app_module
+    from workflow.agents.query import QueryAgent
+    from workflow.agents.summarizer import SummarizerAgent
+    from workflow.graph import create_graph
+
+    embedder = _embedder(args.backend, FakeEmbeddings())
+    embedder.add([p for p in _document(200, args.seed).split("\n\n")])
+    llm = FakeChatModel(latency=args.llm_latency)
+    app_module.embedder = embedder
+    app_module.cache = None
+    app_module.workflow = create_graph(QueryAgent(embedder, llm=llm), SummarizerAgent(llm=llm))
+    # Build the remaining services now so the first requests do not pay
+    # for them.
+    app_module.startup()
+    rng = random.Random(args.seed)
+    questions = [" ".join(rng.choice(WORDS) for _ in range(6)) for _ in range(args.requests)]
+
+    async def run() -> List[float]:
+        transport = httpx.ASGITransport(app=app_module.app)
+        latencies: List[float] = []
+        pending = iter(questions)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def worker():
+                for question in pending:
+                    start = time.perf_counter()
+                    resp = await client.get("/query", params={"question": question})
+                    resp.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                    escalated.append(resp.json()["needs_human"])
+
+            await asyncio.gather(*(worker() for _ in range(args.clients)))
+        return latencies
+
+    escalated: List[bool] = []
+    start = time.perf_counter()
+    latencies = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    embedder.clear()
+    # Escalated questions skip the answer and summary calls, so the
+    # latencies only measure the model path when this stays near zero.
+    return {
+        "clients": args.clients,
+        "requests": len(latencies),
+        "llm_latency_ms": args.llm_latency * 1000,
+        "requests_per_s": len(latencies) / elapsed,
+        "escalation_rate": sum(escalated) / len(escalated) if escalated else 0.0,
+        **_percentiles(latencies),
+    }
+
+
+def bench_graph(args) -> dict:
+    """Per-invocation overhead of the compiled graph with instant agents."""
+    from workflow.agents.query import QueryAgent
+    from workflow.agents.summarizer import SummarizerAgent
+    from workflow.graph import create_graph
+    from langchain_core.documents import Document
+
+    class InstantEmbedder:
+        def search(self, query, k=4):
+            return [(Document(page_content=query), 1.0)]
+
+        async def asearch(self, query, k=4):
+            return self.search(query, k)
+
+    llm = FakeChatModel()
+    workflow = create_graph(QueryAgent(InstantEmbedder(), llm=llm), SummarizerAgent(llm=llm))
+    workflow.invoke({"question": "warm up"})
+
+    start = time.perf_counter()
+    for i in range(args.graph_iterations):
+        workflow.invoke({"question": str(i)})
+    sync_us = (time.perf_counter() - start) / args.graph_iterations * 1e6
+
+    async def run():
+        for i in range(args.graph_iterations):
+            await workflow.ainvoke({"question": str(i)})
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    async_us = (time.perf_counter() - start) / args.graph_iterations * 1e6
+    return {"invoke_us": sync_us, "ainvoke_us": async_us}
+
+
+def bench_job_hunt(args) -> dict:
+    """Emails per second sent by ``JobHuntAgent.run`` to a local SMTP sink."""
+    from agents.job_hunt import JobHuntAgent
+
+    header = ["Email", "Type", "Status", "Name"]
+    rows = [[f"user{i}@example.com", "software", "", f"User {i}"] for i in range(args.emails)]
+    sheet = FakeSheet(header, rows, latency=args.sheet_latency)
+    templates = {"software": ("Application {Name}", "Hello {Name},\nI am applying.")}
+    with SMTPSink(latency=args.smtp_latency) as sink:
+        agent = JobHuntAgent(
+            "", "", sink.host, sink.port, "bench", "secret", sheet=sheet, starttls=False,
+            concurrency=args.smtp_concurrency,
+        )
+        start = time.perf_counter()
+        sent = agent.run(templates)
+        elapsed = time.perf_counter() - start
+    return {
+        "emails": sent,
+        "emails_per_s": sent / elapsed,
+        "smtp_connections": sink.connections,
+        "sheet_requests": sheet.requests,
+    }
+
+
+BENCHMARKS = {
+    "ingest": bench_ingest,
+    "query": bench_query,
+    "graph": bench_graph,
+    "job_hunt": bench_job_hunt,
+}
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """List metrics that regressed by more than ``tolerance`` (a fraction).
+
+    Metrics ending in ``_per_s`` must not drop; ``_ms`` and ``_us`` metrics
+    must not rise.
+    """
+    regressions = []
+    for name, metrics in report["results"].items():
+        for key, value in metrics.items():
+            old = baseline.get("results", {}).get(name, {}).get(key)
+            if not isinstance(old, (int, float)) or not old:
+                continue
+            if key.endswith("_per_s") and value < old * (1 - tolerance):
+                regressions.append(f"{name}.{key}: {old:.4g} -> {value:.4g}")
+            if key.endswith(("_ms", "_us")) and value > old * (1 + tolerance):
+                regressions.append(f"{name}.{key}: {old:.4g} -> {value:.4g}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--backend", choices=["chroma", "local"], default="local")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--graph-iterations", type=int, default=200)
+    parser.add_argument("--emails", type=int, default=100)
+    parser.add_argument("--smtp-latency", type=float, default=0.002)
+    parser.add_argument("--smtp-concurrency", type=int, default=1)
+    parser.add_argument("--sheet-latency", type=float, default=0.002)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "results": {name: BENCHMARKS[name](args) for name in args.only},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            regressions = compare(report, json.load(handle), args.tolerance)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":  # pragma: no cover - benchmark script
+    main()
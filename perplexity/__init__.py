@@ -1 +1,6 @@
-from .app import app
+def __getattr__(name):
+    # Importing the package must not build the app and its model clients.
+    if name == "app":
+        from .app import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,45 @@
-from fastapi import FastAPI
-from .graph import create_graph
+import asyncio
+from contextlib import asynccontextmanager
+import threading
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse
 
-app = FastAPI()
-workflow = create_graph()
+workflow = None
+_lock = threading.Lock()
 
-@app.get("/query")
+def startup():
+    global workflow
+    with _lock:
+        if workflow is None:
+            from .graph import create_graph
+            workflow = create_graph()
+
+async def services():
+    if workflow is None:
+        await asyncio.to_thread(startup)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(startup)
+    yield
+    from .fetch import default_fetcher
+    from .search import default_client
+    await default_client().aclose()
+    await default_fetcher().aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    if workflow is None:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/query", dependencies=[Depends(services)])
 async def query(q: str):
-    result = workflow.invoke({"question": q})
+    result = await workflow.ainvoke({"question": q})
     return {"answer": result.get("answer"), "sources": result.get("sources")}
@@ -0,0 +1,252 @@
+import asyncio
+from collections import OrderedDict
+import codecs
+from contextlib import asynccontextmanager
+from html.parser import HTMLParser
+import ipaddress
+import os
+import re
+import socket
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+import httpx
+
+from .search import HEADERS
+
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head", "nav", "footer", "form"}
+BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "pre"}
+
+
+class UnsafeURLError(ValueError):
+    """The URL is not http(s) or points at a private, loopback or link-local address."""
+
+
+async def _resolve(host: str) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+def _public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if getattr(ip, "ipv4_mapped", None) is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+class _TextExtractor(HTMLParser):
+    """Turn HTML fed in pieces into plain text, dropping markup and scripts."""
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.size = 0
+        self._skip = 0
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self._add("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip:
+            self._skip -= 1
+        elif tag in BLOCK_TAGS:
+            self._add("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._add(data)
+
+    def _add(self, text: str):
+        if not self.full:
+            self.parts.append(text)
+            self.size += len(text)
+
+    def text(self) -> str:
+        text = re.sub(r"[ \t\r\f\v]+", " ", "".join(self.parts))
+        text = re.sub(r"\s*\n\s*", "\n", text).strip()
+        return text[: self.max_chars]
+
+
+class PageCache:
+    """LRU cache of extracted page text with the validators needed to revalidate it."""
+
+    def __init__(self, max_size: int = 256, ttl: float = 600.0, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    def get(self, url: str) -> Optional[dict]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def fresh(self, entry: dict) -> bool:
+        return self.clock() - entry["time"] <= self.ttl
+
+    def put(self, url: str, text: str, etag: Optional[str] = None, modified: Optional[str] = None):
+        self._entries[url] = {"text": text, "etag": etag, "modified": modified, "time": self.clock()}
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PageFetcher:
+    """Fetch result pages concurrently and return their text within a deadline.
+
+    Pages still downloading when ``deadline`` expires are abandoned, so
+    answering never waits longer than one slow page. Bodies are read as a
+    stream and cut at ``max_bytes``, and text extraction runs as the bytes
+    arrive. Result URLs come from the web, so the host of every URL and
+    of every redirect it leads to must resolve to public addresses only.
+    """
+
+    def __init__(
+        self,
+        deadline: float = 3.0,
+        timeout: float = 5.0,
+        max_bytes: int = 1 << 20,
+        max_chars: int = 4000,
+        max_per_host: int = 2,
+        max_connections: int = 20,
+        cache: Optional[PageCache] = None,
+        transport=None,
+        resolver: Optional[Callable[[str], Awaitable[List[str]]]] = None,
+        max_redirects: int = 5,
+    ):
+        self.deadline = deadline
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.max_per_host = max_per_host
+        self.cache = cache if cache is not None else PageCache()
+        self.max_redirects = max_redirects
+        # Redirects are followed by hand so that each target is checked.
+        self._options = dict(
+            headers=HEADERS,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=False,
+        )
+        self._transport = transport
+        self._resolve = resolver or _resolve
+        self._client: Optional[httpx.AsyncClient] = None
+        # Semaphore and number of fetches using it, per host; dropped once
+        # no fetch uses it, so the map only holds hosts in flight.
+        self._hosts: Dict[str, list] = {}
+
+    async def fetch_all(self, urls: List[str]) -> Dict[str, str]:
+        urls = list(dict.fromkeys(u for u in urls if u.startswith(("http://", "https://"))))
+        if not urls:
+            return {}
+        tasks = {asyncio.ensure_future(self.fetch(url)): url for url in urls}
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+        for task in pending:
+            task.cancel()
+        pages = {}
+        for task in done:
+            if not task.cancelled() and task.exception() is None and task.result():
+                pages[tasks[task]] = task.result()
+        # Keep result order so the prompt lists pages by rank.
+        return {url: pages[url] for url in urls if url in pages}
+
+    async def fetch(self, url: str) -> str:
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.fresh(entry):
+            return entry["text"]
+        headers = {}
+        if entry is not None and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry["modified"]:
+            headers["If-Modified-Since"] = entry["modified"]
+        if self._client is None:
+            self._client = httpx.AsyncClient(transport=self._transport, **self._options)
+        target = url
+        for _ in range(self.max_redirects + 1):
+            await self._check(target)
+            async with self._slot(urlsplit(target).netloc):
+                async with self._client.stream("GET", target, headers=headers) as resp:
+                    if resp.has_redirect_location:
+                        target = urljoin(target, resp.headers["location"])
+                        continue
+                    if resp.status_code == 304 and entry is not None:
+                        text = entry["text"]
+                    else:
+                        resp.raise_for_status()
+                        kind = resp.headers.get("content-type", "text/html").split(";")[0].strip()
+                        if kind not in ("text/html", "text/plain", "application/xhtml+xml"):
+                            return ""
+                        text = await self._extract(resp)
+            self.cache.put(url, text, resp.headers.get("etag"), resp.headers.get("last-modified"))
+            return text
+        raise httpx.TooManyRedirects(f"More than {self.max_redirects} redirects", request=resp.request)
+
+    async def _check(self, url: str) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise UnsafeURLError(url)
+        try:
+            addresses = [str(ipaddress.ip_address(parts.hostname))]
+        except ValueError:
+            addresses = await self._resolve(parts.hostname)
+        # The connection resolves the name again; a host that changes its
+        # answer in between can still slip through.
+        if not addresses or not all(_public(a) for a in addresses):
+            raise UnsafeURLError(url)
+
+    @asynccontextmanager
+    async def _slot(self, host: str):
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = [asyncio.Semaphore(self.max_per_host), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._hosts[host]
+
+    async def _extract(self, resp: httpx.Response) -> str:
+        decoder = codecs.getincrementaldecoder(resp.charset_encoding or "utf-8")(errors="replace")
+        extractor = _TextExtractor(self.max_chars)
+        received = 0
+        async for block in resp.aiter_bytes():
+            block = block[: self.max_bytes - received]
+            received += len(block)
+            extractor.feed(decoder.decode(block))
+            if received >= self.max_bytes or extractor.full:
+                break
+        extractor.feed(decoder.decode(b"", final=True))
+        return extractor.text()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_default: Optional[PageFetcher] = None
+
+
+def default_fetcher() -> PageFetcher:
+    global _default
+    if _default is None:
+        _default = PageFetcher(
+            deadline=float(os.getenv("FETCH_DEADLINE", "3")),
+            max_bytes=int(os.getenv("FETCH_MAX_BYTES", str(1 << 20))),
+            max_per_host=int(os.getenv("FETCH_PER_HOST", "2")),
+        )
+    return _default
@@ -1,19 +1,126 @@
+import logging
+import operator
+from typing import Annotated, Dict, List, TypedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from .search import google_search
+from langgraph.types import Send
+from .fetch import default_fetcher
+from .planner import QueryPlanner
+from .search import default_client
 from .summarizer import Summarizer
 
-def create_graph(model: str = "gpt-3.5-turbo"):
-    summarizer = Summarizer(model)
-    def search_node(state: dict):
-        state["sources"] = google_search(state["question"])
-        return state
-    def answer_node(state: dict):
-        state["answer"] = summarizer.run(state["question"], state["sources"])
-        return state
-    graph = StateGraph(dict)
-    graph.add_node("search", search_node)
-    graph.add_node("answer", answer_node)
-    graph.add_edge("search", "answer")
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "ref", "ved", "usg", "sa"}
+
+logger = logging.getLogger(__name__)
+
+
+class SearchState(TypedDict, total=False):
+    question: str
+    queries: List[str]
+    # Every sub-search appends its hits; the reducer merges parallel branches.
+    results: Annotated[List[dict], operator.add]
+    sources: List[dict]
+    pages: Dict[str, str]
+    answer: str
+
+
+class SubQuery(TypedDict):
+    query: str
+    position: int
+
+
+def canonical_url(url: str) -> str:
+    parts = urlsplit(url)
+    if parts.path == "/url" and not parts.netloc:
+        # Google wraps result links as /url?q=<target>&sa=...
+        target = dict(parse_qsl(parts.query)).get("q")
+        if target:
+            return canonical_url(target)
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_")
+    )
+    return urlunsplit((parts.scheme.lower(), host, parts.path.rstrip("/") or "/", urlencode(query), ""))
+
+
+def merge_results(results: List[dict], limit: int = 8, k: int = 60) -> List[dict]:
+    """Deduplicate hits by canonical URL and rank them by reciprocal rank fusion."""
+    best: Dict[str, dict] = {}
+    scores: Dict[str, float] = {}
+    for hit in sorted(results, key=lambda h: (h["position"], h["rank"])):
+        key = canonical_url(hit["link"])
+        scores[key] = scores.get(key, 0.0) + 1.0 / (k + hit["rank"])
+        best.setdefault(key, hit)
+    order = sorted(scores, key=lambda key: -scores[key])
+    return [
+        {"title": best[key]["title"], "link": best[key]["link"], "snippet": best[key]["snippet"]}
+        for key in order[:limit]
+    ]
+
+
+def create_graph(
+    model: str = "gpt-3.5-turbo",
+    client=None,
+    summarizer=None,
+    fetcher=None,
+    planner=None,
+    pages: int = 3,
+    sources: int = 8,
+):
+    """Build the search graph: plan, parallel sub-searches, merge, fetch, answer.
+
+    Both ``invoke`` and ``ainvoke`` work. Page downloads are asynchronous
+    only, so ``invoke`` answers from the search snippets alone. A failing
+    sub-search contributes no results instead of failing the answer.
+    """
+    client = client if client is not None else default_client()
+    summarizer = summarizer if summarizer is not None else Summarizer(model)
+    fetcher = fetcher if fetcher is not None else default_fetcher()
+    planner = planner if planner is not None else QueryPlanner(model)
+    def plan_node(state: SearchState):
+        return {"queries": planner.run(state["question"])}
+    async def aplan_node(state: SearchState):
+        return {"queries": await planner.arun(state["question"])}
+    def fan_out(state: SearchState):
+        return [Send("search", {"query": q, "position": i}) for i, q in enumerate(state["queries"])]
+    def ranked(sub: SubQuery, hits):
+        return {"results": [dict(h, position=sub["position"], rank=r) for r, h in enumerate(hits, start=1)]}
+    def search_node(sub: SubQuery):
+        try:
+            return ranked(sub, client.search(sub["query"]))
+        except Exception:
+            logger.warning("search for %r failed", sub["query"], exc_info=True)
+            return {"results": []}
+    async def asearch_node(sub: SubQuery):
+        try:
+            return ranked(sub, await client.asearch(sub["query"]))
+        except Exception:
+            logger.warning("search for %r failed", sub["query"], exc_info=True)
+            return {"results": []}
+    def merge_node(state: SearchState):
+        return {"sources": merge_results(state.get("results", []), sources)}
+    def fetch_node(state: SearchState):
+        return {"pages": {}}
+    async def afetch_node(state: SearchState):
+        return {"pages": await fetcher.fetch_all([s["link"] for s in state["sources"][:pages]])}
+    def answer_node(state: SearchState):
+        return {"answer": summarizer.run(state["question"], state["sources"], state.get("pages"))}
+    async def aanswer_node(state: SearchState):
+        return {"answer": await summarizer.arun(state["question"], state["sources"], state.get("pages"))}
+    graph = StateGraph(SearchState)
+    graph.add_node("plan", RunnableLambda(plan_node, afunc=aplan_node))
+    graph.add_node("search", RunnableLambda(search_node, afunc=asearch_node))
+    graph.add_node("merge", merge_node)
+    graph.add_node("fetch", RunnableLambda(fetch_node, afunc=afetch_node))
+    graph.add_node("answer", RunnableLambda(answer_node, afunc=aanswer_node))
+    graph.add_conditional_edges("plan", fan_out, ["search"])
+    graph.add_edge("search", "merge")
+    graph.add_edge("merge", "fetch")
+    graph.add_edge("fetch", "answer")
     graph.add_edge("answer", END)
-    graph.set_entry_point("search")
+    graph.set_entry_point("plan")
     return graph.compile()
@@ -0,0 +1,32 @@
+import re
+from langchain_openai import ChatOpenAI
+
+PROMPT = (
+    "Split the question into at most {n} short web search queries that together cover it, "
+    "one per line, without numbering. Reply with the question itself if it is simple.\n"
+    "Question: {question}"
+)
+
+class QueryPlanner:
+    def __init__(self, model: str = "gpt-3.5-turbo", llm=None, max_queries: int = 3):
+        self.llm = llm if llm is not None else ChatOpenAI(model=model)
+        self.max_queries = max_queries
+    def _parse(self, question: str, text: str):
+        queries = [question]
+        for line in text.splitlines():
+            line = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip().strip('"')
+            if line and line.lower() not in (q.lower() for q in queries):
+                queries.append(line)
+        # The original question always runs, so sub-queries only add recall;
+        # max_queries caps the searches including it.
+        return queries[: self.max_queries]
+    def run(self, question: str):
+        if self.max_queries < 2:
+            return [question]
+        prompt = PROMPT.format(n=self.max_queries - 1, question=question)
+        return self._parse(question, self.llm.invoke(prompt).content)
+    async def arun(self, question: str):
+        if self.max_queries < 2:
+            return [question]
+        prompt = PROMPT.format(n=self.max_queries - 1, question=question)
+        return self._parse(question, (await self.llm.ainvoke(prompt)).content)
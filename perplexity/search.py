@@ -1,17 +1,281 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+from collections import OrderedDict
+from html.parser import HTMLParser
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import httpx
+
+GOOGLE_URL = "https://www.google.com/search"
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+class _ResultParser(HTMLParser):
+    """Pull results out of ``div.g`` blocks in one pass, without building a tree."""
+
+    def __init__(self, num: int):
+        super().__init__(convert_charrefs=True)
+        self.num = num
+        self.results: List[Dict[str, str]] = []
+        self._depth = 0  # open divs inside the current result, 0 when outside
+        self._current: Optional[Dict[str, str]] = None
+        self._capture: Optional[str] = None
+        self._capture_tag = ""
+        self._capture_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if len(self.results) >= self.num:
+            return
+        if self._current is None:
+            if tag == "div" and "g" in (dict(attrs).get("class") or "").split():
+                self._current = {}
+                self._depth = 1
+            return
+        if tag == "div":
+            self._depth += 1
+        if self._capture is not None:
+            if tag == self._capture_tag:
+                self._capture_depth += 1
+            return
+        attrs = dict(attrs)
+        if tag == "a" and "link" not in self._current and attrs.get("href") is not None:
+            self._current["link"] = attrs["href"]
+        elif tag == "h3" and "title" not in self._current:
+            self._start_capture("title", tag)
+        elif tag == "span" and "snippet" not in self._current and "aCOpRe" in (attrs.get("class") or "").split():
+            self._start_capture("snippet", tag)
+
+    def _start_capture(self, field: str, tag: str):
+        self._capture, self._capture_tag, self._capture_depth = field, tag, 1
+        self._current[field] = ""
+
+    def handle_endtag(self, tag):
+        if self._current is None:
+            return
+        if self._capture is not None and tag == self._capture_tag:
+            self._capture_depth -= 1
+            if not self._capture_depth:
+                self._capture = None
+        if tag == "div":
+            self._depth -= 1
+            if not self._depth:
+                result, self._current = self._current, None
+                if "link" in result and "title" in result:
+                    result.setdefault("snippet", "")
+                    self.results.append({k: result[k] for k in ("title", "link", "snippet")})
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._current[self._capture] += data
+
+
+def parse_results(html: str, num: int = 5) -> List[Dict[str, str]]:
+    parser = _ResultParser(num)
+    # Feed in slices so parsing stops once enough results were found.
+    for start in range(0, len(html), 1 << 14):
+        parser.feed(html[start:start + (1 << 14)])
+        if len(parser.results) >= num:
+            return parser.results
+    parser.close()
+    return parser.results
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """LRU result cache with a TTL, optionally backed by a SQLite file."""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 3600.0,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, created REAL, value TEXT, used REAL)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(results)")]
+            if "used" not in columns:
+                self._db.execute("ALTER TABLE results ADD COLUMN used REAL")
+                self._db.execute("UPDATE results SET used = created")
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT created, value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (row[0], json.loads(row[1]))
+                    self._remember(key, entry)
+            if entry is None:
+                return None
+            if now - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                if self._db is not None:
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+                return None
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            return [dict(r) for r in entry[1]]
+
+    def put(self, key: str, results: List[Dict[str, str]]) -> None:
+        entry = (self.clock(), [dict(r) for r in results])
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                # Trim the file like the memory tier: drop expired rows and
+                # keep the max_size most recently used.
+                self._db.execute("DELETE FROM results WHERE created < ?", (entry[0] - self.ttl,))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, created, value, used) VALUES (?, ?, ?, ?)",
+                    (key, entry[0], json.dumps(entry[1]), entry[0]),
+                )
+                self._db.execute(
+                    "DELETE FROM results WHERE key NOT IN "
+                    "(SELECT key FROM results ORDER BY used DESC, rowid DESC LIMIT ?)",
+                    (self.max_size,),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SearchClient:
+    """Web search over pooled HTTP connections with caching and request coalescing.
+
+    ``transport`` is handed to ``httpx`` unchanged, so tests can serve
+    fixture pages with ``httpx.MockTransport`` or point ``url`` at a local
+    server.
+    """
+
+    def __init__(
+        self,
+        url: str = GOOGLE_URL,
+        timeout: float = 10.0,
+        cache: Optional[SearchCache] = None,
+        transport=None,
+        max_connections: int = 20,
+    ):
+        self.url = url
+        self.cache = cache if cache is not None else SearchCache()
+        self._options = dict(
+            headers=HEADERS,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=True,
+        )
+        self._transport = transport
+        self._client: Optional[httpx.Client] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+
+    def _key(self, query: str, num: int) -> str:
+        return f"{normalize(query)}|{num}"
+
+    def search(self, query: str, num: int = 5) -> List[Dict[str, str]]:
+        key = self._key(query, num)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if self._client is None:
+            self._client = httpx.Client(transport=self._transport, **self._options)
+        self.requests += 1
+        resp = self._client.get(self.url, params={"q": query, "num": num})
+        resp.raise_for_status()
+        results = parse_results(resp.text, num)
+        self.cache.put(key, results)
+        return [dict(r) for r in results]
+
+    async def asearch(self, query: str, num: int = 5) -> List[Dict[str, str]]:
+        key = self._key(query, num)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(query, num, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield the shared fetch so one cancelled caller does not cancel it
+        # for everyone waiting on the same query.
+        results = await asyncio.shield(task)
+        return [dict(r) for r in results]
+
+    async def _fetch(self, query: str, num: int, key: str) -> List[Dict[str, str]]:
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(transport=self._transport, **self._options)
+        self.requests += 1
+        resp = await self._aclient.get(self.url, params={"q": query, "num": num})
+        resp.raise_for_status()
+        results = parse_results(resp.text, num)
+        self.cache.put(key, results)
+        return results
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        self.close()
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+
+_default: Optional[SearchClient] = None
+
+
+def default_client() -> SearchClient:
+    global _default
+    if _default is None:
+        cache = SearchCache(
+            max_size=int(os.getenv("SEARCH_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+            path=os.getenv("SEARCH_CACHE_PATH") or None,
+        )
+        _default = SearchClient(timeout=float(os.getenv("SEARCH_TIMEOUT", "10")), cache=cache)
+    return _default
+
 
 def google_search(query: str, num: int = 5):
-    resp = requests.get("https://www.google.com/search", params={"q": query, "num": num}, headers={"User-Agent": "Mozilla/5.0"})
-    soup = BeautifulSoup(resp.text, "html.parser")
-    out = []
-    for g in soup.select("div.g"):
-        a = g.find("a")
-        t = g.find("h3")
-        if not a or not t:
-            continue
-        s = g.find("span", class_="aCOpRe")
-        out.append({"title": t.text, "link": a["href"], "snippet": s.text if s else ""})
-        if len(out) >= num:
-            break
-    return out
+    return default_client().search(query, num)
+
+
+async def agoogle_search(query: str, num: int = 5):
+    return await default_client().asearch(query, num)
@@ -1,9 +1,17 @@
 from langchain_openai import ChatOpenAI
 
 class Summarizer:
-    def __init__(self, model: str = "gpt-3.5-turbo"):
-        self.llm = ChatOpenAI(model=model)
-    def run(self, question: str, sources):
-        lines = [f"{i+1}. {s['title']} {s['link']} {s['snippet']}" for i, s in enumerate(sources)]
-        prompt = question + "\n" + "\n".join(lines) + "\nAnswer with citations"
-        return self.llm.invoke(prompt).content
+    def __init__(self, model: str = "gpt-3.5-turbo", llm=None):
+        self.llm = llm if llm is not None else ChatOpenAI(model=model)
+    def _prompt(self, question: str, sources, pages=None):
+        pages = pages or {}
+        lines = []
+        for i, s in enumerate(sources):
+            lines.append(f"{i+1}. {s['title']} {s['link']} {s['snippet']}")
+            if pages.get(s["link"]):
+                lines.append(pages[s["link"]])
+        return question + "\n" + "\n".join(lines) + "\nAnswer with citations"
+    def run(self, question: str, sources, pages=None):
+        return self.llm.invoke(self._prompt(question, sources, pages)).content
+    async def arun(self, question: str, sources, pages=None):
+        return (await self.llm.ainvoke(self._prompt(question, sources, pages))).content
@@ -13,6 +13,14 @@ class EmbeddingAgent:
         """Adds text chunks to the vector store."""
         self.store.add_texts(texts)
 
+    async def aadd(self, texts: List[str]) -> None:
+        """Adds text chunks to the vector store without blocking the loop."""
+        await self.store.aadd_texts(texts)
+
     def search(self, query: str, k: int = 4):
         """Retrieves documents relevant to a query."""
         return self.store.similarity_search_with_score(query, k=k)
+
+    async def asearch(self, query: str, k: int = 4):
+        """Retrieves documents relevant to a query without blocking the loop."""
+        return await self.store.asimilarity_search_with_score(query, k=k)
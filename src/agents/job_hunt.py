@@ -1,15 +1,83 @@
 """Agent for sending job application emails from Google Sheets.
 
-The agent fetches contacts from a sheet, chooses a template based on the
-vacancy type, formats the template with row values and dispatches the email.
+The agent reads contacts from a sheet page by page, chooses a template based
+on the vacancy type, formats the template with row values and dispatches the
+email. Templates are parsed once per run and checked against the header.
 Rows that already contain ``Sent`` in the status column are skipped and marked
-once an email is successfully delivered.
+once an email is successfully delivered. A single authenticated SMTP session
+is reused across the whole run and re-established when the server drops it.
+
+Status marks are buffered and written back in a single batch request every
+``flush_every`` rows or ``flush_interval`` seconds. When a journal path is
+given, the row and address of each delivered email are appended to it before
+being buffered, so a crash between sending and flushing neither loses marks
+nor re-emails anyone on the next run. Flushing drops the written rows from
+the journal.
+
+With ``concurrency`` above one, emails are dispatched from a thread pool,
+each worker holding its own SMTP session. Sending is paced by token buckets
+(overall per second and per hour, and per recipient domain), transient
+``4xx`` replies are retried with exponential backoff and rows that still
+fail are listed in :attr:`JobHuntAgent.failures` instead of aborting the run.
+Failing to open a session at all (refused connection, STARTTLS or login
+error) raises :class:`SessionError` and stops the run, since every further
+row would fail the same way and repeated logins can lock the account.
 """
-from typing import Dict, Tuple, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from string import Formatter
+from typing import Callable, Dict, Iterator, List, Tuple, Optional, Set
+import os
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 
 
+class SessionError(Exception):
+    """The SMTP session could not be opened, so no row can be sent."""
+
+
+class _TokenBucket:
+    """Blocks callers so that at most ``rate`` acquisitions happen per second."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Takes one token, waiting until it is available."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now and sleep outside the lock so waiters
+            # are served in arrival order.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._sleep(wait)
+
+
+def _transient(exc: Exception) -> bool:
+    """Tells whether a failed delivery is worth retrying."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    return isinstance(exc, (smtplib.SMTPServerDisconnected, ConnectionError))
+
+
 class JobHuntAgent:
     """Reads a sheet and emails contacts based on vacancy type."""
 
@@ -22,9 +90,21 @@ class JobHuntAgent:
         smtp_user: str,
         smtp_password: str,
         sheet: Optional[object] = None,
+        max_messages_per_connection: int = 100,
+        flush_every: int = 50,
+        flush_interval: float = 10.0,
+        journal_path: Optional[str] = None,
+        concurrency: int = 1,
+        rate_per_second: Optional[float] = None,
+        rate_per_hour: Optional[float] = None,
+        domain_rate_per_second: Optional[float] = None,
+        retries: int = 3,
+        backoff: float = 1.0,
+        page_size: int = 1000,
+        starttls: bool = True,
     ) -> None:
         scopes = [
-            "https://www.googleapis.com/auth/spreadsheets.readonly",
+            "https://www.googleapis.com/auth/spreadsheets",
             "https://www.googleapis.com/auth/drive.readonly",
         ]
         if sheet is None:
@@ -39,16 +119,180 @@ class JobHuntAgent:
         self.smtp_port = smtp_port
         self.smtp_user = smtp_user
         self.smtp_password = smtp_password
+        self.starttls = starttls
+        self.max_messages_per_connection = max_messages_per_connection
+        self._local = threading.local()
+        self._sessions: List[smtplib.SMTP] = []
+        self._session_error: Optional[SessionError] = None
+        self._lock = threading.Lock()
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.journal_path = journal_path
+        self._pending: List[Tuple[int, int, str]] = []
+        self._unflushed: Set[str] = set()
+        self._last_flush = time.monotonic()
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self._limits = []
+        if rate_per_second:
+            self._limits.append(_TokenBucket(rate_per_second, max(1.0, rate_per_second)))
+        if rate_per_hour:
+            self._limits.append(_TokenBucket(rate_per_hour / 3600.0, max(1.0, rate_per_hour)))
+        self.domain_rate_per_second = domain_rate_per_second
+        self._domains: Dict[str, _TokenBucket] = {}
+        self.failures: List[Dict[str, object]] = []
+        self.page_size = page_size
+
+    def __enter__(self) -> "JobHuntAgent":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _connect(self) -> smtplib.SMTP:
+        """Opens an authenticated session for the calling thread."""
+        old = getattr(self._local, "server", None)
+        if old is not None:
+            with self._lock:
+                if old in self._sessions:
+                    self._sessions.remove(old)
+            _quit(old)
+        self._local.server = None
+        # Once one worker failed to log in, the others stop trying too.
+        if self._session_error is not None:
+            raise self._session_error
+        try:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        except (smtplib.SMTPException, OSError) as exc:
+            self._session_error = SessionError(f"Cannot connect to {self.smtp_server}:{self.smtp_port}: {exc}")
+            raise self._session_error from exc
+        try:
+            if self.starttls:
+                server.starttls()
+            server.login(self.smtp_user, self.smtp_password)
+        except (smtplib.SMTPException, OSError) as exc:
+            server.close()
+            self._session_error = SessionError(f"Cannot open a session on {self.smtp_server}: {exc}")
+            raise self._session_error from exc
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self._sessions.append(server)
+        self._local.server = server
+        self._local.sent = 0
+        return server
+
+    def close(self) -> None:
+        """Ends every open SMTP session."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for server in sessions:
+            _quit(server)
+        self._local = threading.local()
 
     def _send_email(self, recipient: str, subject: str, body: str) -> None:
         msg = MIMEText(body)
         msg["Subject"] = subject
         msg["From"] = self.smtp_user
         msg["To"] = recipient
-        with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-            server.starttls()
-            server.login(self.smtp_user, self.smtp_password)
+        server = getattr(self._local, "server", None)
+        if server is None or self._local.sent >= self.max_messages_per_connection:
+            server = self._connect()
+        try:
             server.sendmail(self.smtp_user, [recipient], msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # Providers close idle or long-lived sessions; retry once on a
+            # fresh connection.
+            server = self._connect()
+            server.sendmail(self.smtp_user, [recipient], msg.as_string())
+        self._local.sent += 1
+
+    def _throttle(self, recipient: str) -> None:
+        for bucket in self._limits:
+            bucket.acquire()
+        if self.domain_rate_per_second:
+            domain = recipient.rpartition("@")[2].lower()
+            with self._lock:
+                bucket = self._domains.get(domain)
+                if bucket is None:
+                    bucket = self._domains[domain] = _TokenBucket(self.domain_rate_per_second)
+            bucket.acquire()
+
+    def _deliver(self, recipient: str, subject: str, body: str, key: str) -> Optional[Exception]:
+        """Sends one email with retries and returns the final error, if any."""
+        for attempt in range(self.retries + 1):
+            self._throttle(recipient)
+            try:
+                self._send_email(recipient, subject, body)
+            except (smtplib.SMTPException, OSError) as exc:
+                if attempt == self.retries or not _transient(exc):
+                    return exc
+                time.sleep(self.backoff * 2 ** attempt)
+            else:
+                self._journal(key)
+                return None
+        return None  # pragma: no cover - the loop always returns
+
+    def _journaled(self) -> Set[str]:
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return set()
+        with open(self.journal_path, encoding="utf-8") as handle:
+            return {line.strip() for line in handle if line.strip()}
+
+    def _journal(self, key: str) -> None:
+        if not self.journal_path:
+            return
+        with self._lock, open(self.journal_path, "a", encoding="utf-8") as handle:
+            handle.write(key + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+            self._unflushed.add(key)
+
+    def _compact_journal(self, flushed: Set[str]) -> None:
+        """Rewrites the journal without the keys whose marks are written.
+
+        Keys journaled by workers whose marks are not buffered yet, or that
+        have no status column to be marked in, are kept.
+        """
+        if not self.journal_path:
+            return
+        with self._lock:
+            self._unflushed -= flushed
+            tmp = self.journal_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as handle:
+                handle.writelines(key + "\n" for key in sorted(self._unflushed))
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp, self.journal_path)
+
+    def _mark(self, row: int, col: int, key: str) -> None:
+        self._pending.append((row, col, key))
+        if (
+            len(self._pending) >= self.flush_every
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes buffered status marks back to the sheet in one request."""
+        pending, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            if hasattr(self.sheet, "batch_update"):
+                self.sheet.batch_update(
+                    [{"range": _a1(row, col), "values": [["Sent"]]} for row, col, _ in pending]
+                )
+            else:
+                for row, col, _ in pending:
+                    self.sheet.update_cell(row, col, "Sent")
+        except Exception:
+            self._pending = pending + self._pending
+            raise
+        self._compact_journal({key for _, _, key in pending})
 
     def run(
         self,
@@ -66,35 +310,186 @@ class JobHuntAgent:
             status_column: Column used to mark already-contacted rows.
 
         Returns:
-            Number of successfully dispatched emails.
+            Number of successfully dispatched emails. Rows that could not be
+            delivered are described in :attr:`failures`.
+        """
+        try:
+            return self._run(templates, email_column, type_column, status_column)
+        finally:
+            try:
+                self.flush()
+            finally:
+                self.close()
+
+    def _rows(self, header: List[str]) -> Iterator[Tuple[int, list]]:
+        """Yields ``(row_number, values)`` for every data row, page by page.
+
+        Numbers are converted the way ``get_all_records`` does, so templates
+        such as ``{Salary:,}`` keep working on paged reads.
         """
+        width = len(header)
+        if not hasattr(self.sheet, "get_values"):
+            for row_num, record in enumerate(self.sheet.get_all_records(), start=2):
+                yield row_num, [record.get(h, "") for h in header]
+            return
+        from gspread.utils import numericise_all
 
-        header = [h.lower() for h in self.sheet.row_values(1)]
+        last = _column_letters(width)
+        # The API omits trailing blank rows of a range, so a short page does
+        # not mean the sheet ended; read up to the worksheet size, or until
+        # a page comes back empty when the size is unknown.
+        limit = getattr(self.sheet, "row_count", None)
+        start = 2
+        while limit is None or start <= limit:
+            page = self.sheet.get_values(f"A{start}:{last}{start + self.page_size - 1}")
+            if not page and limit is None:
+                return
+            for offset, values in enumerate(page):
+                yield start + offset, numericise_all(list(values) + [""] * (width - len(values)))
+            start += self.page_size
+
+    def _run(
+        self,
+        templates: Dict[str, Tuple[str, str]],
+        email_column: str,
+        type_column: str,
+        status_column: str,
+    ) -> int:
+        header = list(self.sheet.row_values(1))
+        lowered = [h.lower() for h in header]
         try:
-            email_idx = header.index(email_column.lower())
-            type_idx = header.index(type_column.lower())
+            email_idx = lowered.index(email_column.lower())
+            type_idx = lowered.index(type_column.lower())
         except ValueError as exc:  # pragma: no cover - defensive programming
             raise ValueError("Required column missing") from exc
+        status_idx = lowered.index(status_column.lower()) if status_column.lower() in lowered else None
+
+        compiled = {
+            key: (_Template(subject, header), _Template(body, header))
+            for key, (subject, body) in templates.items()
+        }
+        fallback = compiled.get("default") or (
+            _Template("Job Application", header),
+            _Template("", header),
+        )
+
+        # Only keys journaled by earlier runs are trusted; rows of this run
+        # are journaled once their email has actually been delivered.
+        journaled = self._journaled()
+        self._unflushed = set(journaled)
+        self._last_flush = time.monotonic()
+        self.failures = []
+        self._session_error = None
 
-        status_idx = header.index(status_column.lower()) if status_column.lower() in header else None
+        def jobs() -> Iterator[Tuple[int, str, str, str, str]]:
+            for row_num, values in self._rows(header):
+                email, job_type = values[email_idx], values[type_idx]
+                status = values[status_idx] if status_idx is not None else None
+                if not email or not job_type:
+                    continue
+                key = f"{row_num}:{str(email).strip().lower()}"
+                if status and str(status).strip().lower() == "sent":
+                    with self._lock:
+                        self._unflushed.discard(key)
+                    continue
+                if key in journaled:
+                    # Delivered by an earlier run that died before flushing.
+                    if status_idx is not None:
+                        self._mark(row_num, status_idx + 1, key)
+                    continue
+                subject_tpl, body_tpl = compiled.get(str(job_type).strip().lower(), fallback)
+                yield row_num, email, subject_tpl.render(values), body_tpl.render(values), key
 
-        rows = self.sheet.get_all_records()
         sent = 0
-        for row_num, row in enumerate(rows, start=2):
-            lowered = {k.lower(): v for k, v in row.items()}
-            email = lowered.get(email_column.lower())
-            job_type = lowered.get(type_column.lower())
-            status = lowered.get(status_column.lower()) if status_idx is not None else None
-            if not email or not job_type or (status and str(status).strip().lower() == "sent"):
-                continue
-            key = str(job_type).strip().lower()
-            subject_tpl, body_tpl = templates.get(
-                key, templates.get("default", ("Job Application", ""))
-            )
-            subject = subject_tpl.format(**row)
-            body = body_tpl.format(**row)
-            self._send_email(email, subject, body)
+
+        def settle(job, error: Optional[Exception]) -> None:
+            nonlocal sent
+            row_num, email = job[0], job[1]
+            if error is not None:
+                self.failures.append({"row": row_num, "email": email, "error": str(error)})
+                return
             sent += 1
             if status_idx is not None:
-                self.sheet.update_cell(row_num, status_idx + 1, "Sent")
+                self._mark(row_num, status_idx + 1, job[4])
+
+        if self.concurrency == 1:
+            for job in jobs():
+                settle(job, self._deliver(*job[1:]))
+            return sent
+
+        # Keep only a few jobs queued per worker so rows stream through
+        # instead of being materialised up front.
+        pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        futures: Dict[Future, tuple] = {}
+        try:
+            for job in jobs():
+                futures[pool.submit(self._deliver, *job[1:])] = job
+                if len(futures) >= 4 * self.concurrency:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        settle(futures.pop(future), future.result())
+            for future in as_completed(futures):
+                settle(futures[future], future.result())
+        finally:
+            pool.shutdown(cancel_futures=True)
+        self.failures.sort(key=lambda failure: failure["row"])
         return sent
+
+
+class _Template:
+    """A ``str.format`` template parsed once against the sheet header.
+
+    Placeholders are resolved to column positions up front, so a template
+    naming a missing column fails before any email is sent and rendering a
+    row is a plain join over its values.
+    """
+
+    def __init__(self, template: str, header: List[str]) -> None:
+        self._parts: List[Tuple[str, Optional[int], str, Optional[str]]] = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if field is None:
+                self._parts.append((literal, None, "", None))
+                continue
+            if field not in header:
+                raise ValueError(f"Template {template!r} refers to missing column {field!r}")
+            if "{" in spec:
+                raise ValueError(f"Template {template!r} uses a nested format spec")
+            self._parts.append((literal, header.index(field), spec, conversion))
+
+    def render(self, values: List[str]) -> str:
+        out = []
+        for literal, index, spec, conversion in self._parts:
+            out.append(literal)
+            if index is None:
+                continue
+            value = values[index]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "a":
+                value = ascii(value)
+            elif conversion == "s":
+                value = str(value)
+            out.append(format(value, spec))
+        return "".join(out)
+
+
+def _quit(server: smtplib.SMTP) -> None:
+    """Ends a session, dropping the socket if the server does not answer."""
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def _column_letters(col: int) -> str:
+    """Converts a 1-based column number to its A1 letters."""
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def _a1(row: int, col: int) -> str:
+    """Converts 1-based row and column numbers to A1 notation."""
+    return f"{_column_letters(col)}{row}"
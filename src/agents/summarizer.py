@@ -1,14 +1,23 @@
 """Context summarization agent."""
-from typing import List
+from typing import List, Optional
 from langchain_openai import ChatOpenAI
 
 class SummarizerAgent:
     """Produces a concise summary from documents."""
-    def __init__(self, model: str = "gpt-3.5-turbo") -> None:
-        self.llm = ChatOpenAI(model=model)
+    def __init__(self, model: str = "gpt-3.5-turbo", llm: Optional[object] = None) -> None:
+        self.llm = llm if llm is not None else ChatOpenAI(model=model)
 
     def run(self, docs: List[str]) -> str:
         """Summarizes content from documents."""
-        content = "\n".join(docs)
-        result = self.llm.invoke(f"Summarize:\n{content}")
+        result = self.llm.invoke(self._prompt(docs))
+        return str(result.content)
+
+    async def arun(self, docs: List[str]) -> str:
+        """Async variant of ``run``."""
+        result = await self.llm.ainvoke(self._prompt(docs))
         return str(result.content)
+
+    @staticmethod
+    def _prompt(docs: List[str]) -> str:
+        content = "\n".join(docs)
+        return f"Summarize:\n{content}"
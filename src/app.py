@@ -1,32 +1,97 @@
-
+from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
+import os
+import shutil
 import tempfile
-from fastapi import FastAPI, UploadFile, File
-from agents.loader import load_and_chunk
-from agents.embedder import EmbeddingAgent
-from agents.query import QueryAgent
-from agents.summarizer import SummarizerAgent
-from graph import create_graph
-
-app = FastAPI()
-embedder = EmbeddingAgent()
-query_agent = QueryAgent(embedder)
-summarizer = SummarizerAgent()
-workflow = create_graph(query_agent, summarizer)
-
-@app.post("/upload")
-async def upload(file: UploadFile = File(...)):
-    """Ingests a document into the vector store."""
+import threading
+from typing import Optional
+from fastapi import Depends, FastAPI, HTTPException, Query, UploadFile, File
+from fastapi.responses import JSONResponse
+
+# Agents and the graph are built by the lifespan or on first use rather
+# than at import time.
+embedder = None
+workflow = None
+collections = {}
+_lock = threading.Lock()
+NAME_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_-]{1,62}[A-Za-z0-9]$"
+
+def startup():
+    """Builds the agents and compiles the graph once."""
+    global embedder, workflow
+    with _lock:
+        if workflow is not None:
+            return
+        from agents.embedder import EmbeddingAgent
+        from agents.query import QueryAgent
+        from agents.summarizer import SummarizerAgent
+        from graph import create_graph
+        embedder = EmbeddingAgent()
+        workflow = create_graph(QueryAgent(embedder), SummarizerAgent())
+
+def _collection(name: Optional[str], create: bool = False):
+    """Returns the embedder and graph of a collection, built by its first upload."""
+    if name is None or name == "documents":
+        return embedder, workflow
+    with _lock:
+        if name not in collections:
+            if not create:
+                raise HTTPException(status_code=404, detail=f"Unknown collection {name}")
+            from agents.embedder import EmbeddingAgent
+            from agents.query import QueryAgent
+            from agents.summarizer import SummarizerAgent
+            from graph import create_graph
+            agent = EmbeddingAgent(name)
+            collections[name] = (agent, create_graph(QueryAgent(agent), SummarizerAgent()))
+        return collections[name]
+
+async def services():
+    """Makes sure the agents exist before a request uses them."""
+    if workflow is None:
+        await asyncio.to_thread(startup)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Builds the agents before serving."""
+    await asyncio.to_thread(startup)
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+@app.get("/healthz")
+async def healthz():
+    """Reports that the process is alive."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Reports whether the agents are ready."""
+    if workflow is None:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready"}
+
+@app.post("/upload", dependencies=[Depends(services)])
+async def upload(file: UploadFile = File(...), collection: Optional[str] = Query(None, pattern=NAME_PATTERN)):
+    """Ingests a document into the vector store of a collection."""
+    from agents.loader import load_and_chunk
+    # Copy the spooled upload to disk in blocks and chunk it off the event
+    # loop; the copy is removed whatever happens.
     with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        data = await file.read()
-        tmp.write(data)
         path = Path(tmp.name)
-    chunks = load_and_chunk(str(path))
-    embedder.add(chunks)
+    try:
+        with open(path, "wb") as out:
+            await asyncio.to_thread(shutil.copyfileobj, file.file, out)
+        chunks = await asyncio.to_thread(load_and_chunk, str(path))
+    finally:
+        os.unlink(path)
+    target, _ = await asyncio.to_thread(_collection, collection, True)
+    await target.aadd(chunks)
     return {"status": "ok"}
 
-@app.get("/query")
-async def query(question: str):
-    """Queries the knowledge base."""
-    result = workflow.invoke({"question": question})
+@app.get("/query", dependencies=[Depends(services)])
+async def query(question: str, collection: Optional[str] = Query(None, pattern=NAME_PATTERN)):
+    """Queries the knowledge base of a collection."""
+    _, graph = await asyncio.to_thread(_collection, collection)
+    result = await graph.ainvoke({"question": question})
     return {"answer": result.get("answer"), "summary": result.get("summary"), "needs_human": result.get("needs_human")}
@@ -1,5 +1,6 @@
 """Agent workflow graph."""
 from typing import List, TypedDict
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 from agents.query import QueryAgent
 from agents.summarizer import SummarizerAgent
@@ -18,16 +19,24 @@ def create_graph(query_agent: QueryAgent, summarizer: SummarizerAgent):
         docs, answer, needs_human = query_agent.run(state["question"])
         return {"docs": [d.page_content for d in docs], "answer": answer, "needs_human": needs_human}
 
+    async def aquery_node(state: GraphState) -> GraphState:
+        docs, answer, needs_human = await query_agent.arun(state["question"])
+        return {"docs": [d.page_content for d in docs], "answer": answer, "needs_human": needs_human}
+
     def summarize_node(state: GraphState) -> GraphState:
         summary = summarizer.run(state["docs"])
         return {"summary": summary}
 
+    async def asummarize_node(state: GraphState) -> GraphState:
+        summary = await summarizer.arun(state["docs"])
+        return {"summary": summary}
+
     def human_node(state: GraphState) -> GraphState:
         return {"answer": human_response(state["question"])}
 
     graph = StateGraph(GraphState)
-    graph.add_node("query", query_node)
-    graph.add_node("summarize", summarize_node)
+    graph.add_node("query", RunnableLambda(query_node, afunc=aquery_node))
+    graph.add_node("summarize", RunnableLambda(summarize_node, afunc=asummarize_node))
     graph.add_node("human", human_node)
     graph.add_edge(START, "query")
     graph.add_conditional_edges("query", lambda s: "human" if s["needs_human"] else "summarize")
@@ -2,7 +2,10 @@
 
 The script expects environment variables with credentials for Google Sheets
 and SMTP. A very small set of templates is included for demonstration purposes.
+Dispatch options can be given on the command line or through the environment
+variables named in ``--help``.
 """
+import argparse
 import os
 from agents.job_hunt import JobHuntAgent
 
@@ -11,7 +14,31 @@ TEMPLATES = {
     "default": ("Job Application", "Hello {Name},\nPlease consider my application."),
 }
 
+
+def _env(name: str, cast, default):
+    value = os.environ.get(name)
+    return cast(value) if value not in (None, "") else default
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Email contacts listed in a Google Sheet.")
+    parser.add_argument("--concurrency", type=int, default=_env("SMTP_CONCURRENCY", int, 1),
+                        help="parallel SMTP sessions (SMTP_CONCURRENCY)")
+    parser.add_argument("--rate", type=float, default=_env("SMTP_RATE", float, None),
+                        help="emails per second (SMTP_RATE)")
+    parser.add_argument("--hourly-limit", type=float, default=_env("SMTP_HOURLY_LIMIT", float, None),
+                        help="emails per hour (SMTP_HOURLY_LIMIT)")
+    parser.add_argument("--domain-rate", type=float, default=_env("SMTP_DOMAIN_RATE", float, None),
+                        help="emails per second to one recipient domain (SMTP_DOMAIN_RATE)")
+    parser.add_argument("--retries", type=int, default=_env("SMTP_RETRIES", int, 3),
+                        help="retries for transient 4xx replies (SMTP_RETRIES)")
+    parser.add_argument("--backoff", type=float, default=_env("SMTP_BACKOFF", float, 1.0),
+                        help="initial retry delay in seconds (SMTP_BACKOFF)")
+    return parser
+
+
 def main() -> None:
+    args = _parser().parse_args()
     agent = JobHuntAgent(
         os.environ["GOOGLE_CREDS_FILE"],
         os.environ["SHEET_KEY"],
@@ -19,9 +46,21 @@ def main() -> None:
         int(os.environ.get("SMTP_PORT", 587)),
         os.environ["SMTP_USER"],
         os.environ["SMTP_PASSWORD"],
+        max_messages_per_connection=int(os.environ.get("SMTP_MAX_PER_CONNECTION", 100)),
+        flush_every=int(os.environ.get("STATUS_FLUSH_ROWS", 50)),
+        flush_interval=float(os.environ.get("STATUS_FLUSH_SECONDS", 10)),
+        journal_path=os.environ.get("STATUS_JOURNAL", "job_hunt.journal"),
+        concurrency=args.concurrency,
+        rate_per_second=args.rate,
+        rate_per_hour=args.hourly_limit,
+        domain_rate_per_second=args.domain_rate,
+        retries=args.retries,
+        backoff=args.backoff,
     )
     sent = agent.run(TEMPLATES)
     print(f"Sent {sent} emails.")
+    for failure in agent.failures:
+        print(f"Row {failure['row']} ({failure['email']}) failed: {failure['error']}")
 
 
 if __name__ == "__main__":  # pragma: no cover - simple script
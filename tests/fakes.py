@@ -0,0 +1,73 @@
+"""Offline stand-ins for the models and stores used by the workflow."""
+import asyncio
+import math
+import time
+import zlib
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+
+
+class SlowLLM:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def invoke(self, prompt):
+        time.sleep(self.delay)
+        return SimpleNamespace(content=f"reply to {prompt.splitlines()[0]}")
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(content=f"reply to {prompt.splitlines()[0]}")
+
+
+class CountingLLM(SlowLLM):
+    def __init__(self, delay=0.0):
+        super().__init__(delay)
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return super().invoke(prompt)
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        return await super().ainvoke(prompt)
+
+
+class DummyEmbedder:
+    def __init__(self, distance=0.1):
+        self.distance = distance
+
+    def search(self, query, k=4):
+        return [(Document(page_content=f"doc for {query}"), self.distance)]
+
+    async def asearch(self, query, k=4):
+        return self.search(query, k=k)
+
+
+class FakeEmbeddings:
+    """Bag-of-words hashing so texts sharing words embed close together.
+
+    Vectors have unit length, like those of real embedding models, so
+    distances fall in the range the query agent's threshold expects.
+    """
+
+    def __init__(self, dim=64):
+        self.dim = dim
+
+    def embed_query(self, text):
+        vector = [0.0] * self.dim
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % self.dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
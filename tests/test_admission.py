@@ -0,0 +1,168 @@
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+from fakes import CountingLLM, DummyEmbedder, FakeEmbeddings
+from workflow.admission import AdmissionController, Lane, Rejected
+from workflow.agents.embedder import EmbeddingAgent
+from workflow.agents.local_index import LocalIndex
+from workflow.agents.query import QueryAgent
+from workflow.agents.summarizer import SummarizerAgent
+from workflow.graph import create_graph
+
+
+def _controller(capacity=1, **queues):
+    return AdmissionController(
+        [
+            Lane("query", 0, limit=1, queue=queues.get("query", 4), timeout=queues.get("timeout", 1.0)),
+            Lane("upload", 2, limit=1, queue=queues.get("upload", 4), timeout=queues.get("timeout", 1.0)),
+        ],
+        capacity,
+    )
+
+
+def test_queries_overtake_queued_uploads():
+    async def run():
+        controller, order = _controller(), []
+        await controller.acquire("upload")
+
+        async def request(lane):
+            async with controller.admit(lane):
+                order.append(lane)
+
+        tasks = [asyncio.ensure_future(request(lane)) for lane in ("upload", "upload", "query")]
+        await asyncio.sleep(0.01)
+        assert controller.stats()["lanes"]["upload"]["waiting"] == 2
+        controller.release("upload")
+        await asyncio.gather(*tasks)
+        return order, controller.stats()
+
+    order, stats = asyncio.run(run())
+    assert order == ["query", "upload", "upload"]
+    assert stats["active"] == 0 and stats["lanes"]["upload"]["admitted"] == 3
+
+
+def test_lane_limit_leaves_room_for_other_lanes():
+    async def run():
+        controller = _controller(capacity=2)
+        await controller.acquire("upload")
+        second = asyncio.ensure_future(controller.acquire("upload"))
+        await asyncio.wait_for(controller.acquire("query"), 0.1)
+        await asyncio.sleep(0.01)
+        assert not second.done()
+        controller.release("upload")
+        await second
+
+    asyncio.run(run())
+
+
+def test_full_queue_and_timeout_are_rejected_with_retry_after():
+    async def run():
+        controller = _controller(query=1, timeout=0.05)
+        await controller.acquire("query")
+        waiter = asyncio.ensure_future(controller.acquire("query"))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as full:
+            await controller.acquire("query")
+        with pytest.raises(Rejected) as late:
+            await waiter
+        cancelled = asyncio.ensure_future(controller.acquire("query"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        return full.value, late.value, controller.stats()["lanes"]["query"]
+
+    full, late, stats = asyncio.run(run())
+    assert (full.status_code, late.status_code) == (429, 503)
+    assert full.retry_after >= 1 and late.retry_after >= 1
+    assert (stats["rejected"], stats["timed_out"], stats["waiting"], stats["active"]) == (1, 1, 0, 1)
+
+
+def test_load_spike_keeps_admitted_latency_bounded(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    delay, limit, queue = 0.05, 4, 8
+    llm = CountingLLM(delay=delay)
+    agent = QueryAgent(DummyEmbedder(), llm=llm)
+    controller = AdmissionController([Lane("query", 0, limit=limit, queue=queue, timeout=5.0)])
+    monkeypatch.setattr(app_module, "admission", controller)
+    monkeypatch.setattr(app_module, "workflow", create_graph(agent, SummarizerAgent(llm=llm)))
+    monkeypatch.setattr(app_module, "cache", None)
+    monkeypatch.setattr(app_module, "embedder", EmbeddingAgent(backend=LocalIndex(), embeddings=FakeEmbeddings()))
+    monkeypatch.setattr(app_module, "ingestion", None)
+    app_module.startup()
+
+    async def timed(client, i):
+        start = time.perf_counter()
+        resp = await client.get("/query", params={"question": f"question {i}"})
+        return resp, time.perf_counter() - start
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            results = await asyncio.gather(*(timed(client, i) for i in range(60)))
+            streamed = await client.get("/query/stream", params={"question": "streamed"})
+            stats = (await client.get("/stats")).json()
+        return results, streamed, stats
+
+    results, streamed, stats = asyncio.run(run())
+    admitted = [elapsed for resp, elapsed in results if resp.status_code == 200]
+    rejected = [resp for resp, _ in results if resp.status_code != 200]
+    assert len(admitted) == limit + queue
+    assert {resp.status_code for resp in rejected} == {429}
+    assert all(int(resp.headers["Retry-After"]) >= 1 for resp in rejected)
+    # Answer and summary per request: the queue drains in three rounds.
+    service = 2 * delay
+    assert max(admitted) < (queue // limit + 1) * service + 1.0
+    assert streamed.status_code == 200 and "event: done" in streamed.text
+    lane = stats["admission"]["lanes"]["query"]
+    assert (lane["admitted"], lane["rejected"], lane["active"], lane["waiting"]) == (13, 48, 0, 0)
+    assert lane["wait_seconds_max"] > 0
+
+
+class SlowEmbedder:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def aadd(self, texts, ids=None):
+        await asyncio.sleep(self.delay)
+
+    def known(self, ids):
+        return set()
+
+    def replace_document(self, document_id, ids):
+        return 0
+
+
+def test_upload_slot_is_held_until_the_document_is_indexed(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+    from workflow.ingest import IngestionQueue
+
+    controller = AdmissionController([Lane("upload", 2, limit=1, queue=0)])
+    monkeypatch.setattr(app_module, "admission", controller)
+    monkeypatch.setattr(app_module, "embedder", EmbeddingAgent(backend=LocalIndex(), embeddings=FakeEmbeddings()))
+    app_module.startup()
+
+    async def run():
+        queue = IngestionQueue(SlowEmbedder(0.2))
+        monkeypatch.setattr(app_module, "ingestion", queue)
+        await queue.start()
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/upload", files={"file": ("a.txt", b"some text")})
+            busy = await client.post("/upload", files={"file": ("b.txt", b"other text")})
+            await queue.join()
+            await asyncio.sleep(0.01)
+            again = await client.post("/upload", files={"file": ("b.txt", b"other text")})
+            await queue.join()
+        await queue.stop()
+        return first, busy, again
+
+    first, busy, again = asyncio.run(run())
+    assert first.json()["status"] == again.json()["status"] == "queued"
+    assert busy.status_code == 429 and "Retry-After" in busy.headers
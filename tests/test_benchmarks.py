@@ -0,0 +1,37 @@
+import json
+import subprocess
+import sys
+
+from benchmarks.run import compare
+
+
+def test_suite_emits_json_report(tmp_path):
+    output = tmp_path / "bench.json"
+    args = [
+        sys.executable, "-m", "benchmarks.run",
+        "--paragraphs", "50", "--requests", "20", "--clients", "4",
+        "--llm-latency", "0.001", "--graph-iterations", "5", "--emails", "3",
+        "--output", str(output),
+    ]
+    subprocess.run(args, check=True, capture_output=True)
+    report = json.loads(output.read_text())
+    results = report["results"]
+    assert set(results) == {"ingest", "query", "graph", "job_hunt"}
+    assert results["query"]["requests"] == 20
+    # Most random questions are close enough to some paragraph to be answered.
+    assert 0.0 <= results["query"]["escalation_rate"] < 0.5
+    assert results["job_hunt"]["emails"] == 3
+    assert results["ingest"]["total_per_s"] > 0
+
+    args[-2:] = ["--baseline", str(output), "--tolerance", "100"]
+    assert subprocess.run(args, capture_output=True).returncode == 0
+
+
+def test_compare_flags_regressions_in_both_directions():
+    baseline = {"results": {"query": {"p95_ms": 100.0, "requests_per_s": 50.0, "clients": 4}}}
+    current = {"results": {"query": {"p95_ms": 130.0, "requests_per_s": 35.0, "clients": 8}}}
+    assert compare(current, baseline, 0.2) == [
+        "query.p95_ms: 100 -> 130",
+        "query.requests_per_s: 50 -> 35",
+    ]
+    assert compare(baseline, baseline, 0.2) == []
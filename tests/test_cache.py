@@ -0,0 +1,167 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fakes import CountingLLM, DummyEmbedder, FakeEmbeddings
+from workflow.agents.query import QueryAgent
+from workflow.agents.summarizer import SummarizerAgent
+from workflow.cache import InMemoryCacheStore, SQLiteCacheStore, SemanticCache
+from workflow.graph import create_graph
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _store(backend, tmp_path, **kwargs):
+    if backend == "memory":
+        return InMemoryCacheStore(**kwargs)
+    return SQLiteCacheStore(str(tmp_path / "cache.db"), **kwargs)
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_paraphrase_hits_and_unrelated_misses(tmp_path, backend):
+    cache = SemanticCache(FakeEmbeddings(), _store(backend, tmp_path), threshold=0.8)
+    vector, cached = cache.lookup("how do I reset the router")
+    assert cached is None
+    cache.put("how do I reset the router", vector, {"answer": "unplug it"})
+
+    assert cache.lookup("how do I reset the router please")[1] == {"answer": "unplug it"}
+    assert cache.lookup("what is the refund policy")[1] is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 1}
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_lru_eviction_and_ttl(tmp_path, backend):
+    clock = Clock()
+    store = _store(backend, tmp_path, max_size=2, ttl=60, clock=clock)
+    cache = SemanticCache(FakeEmbeddings(), store, threshold=0.99)
+    for question in ["alpha", "beta"]:
+        vector, _ = cache.lookup(question)
+        cache.put(question, vector, {"answer": question})
+        clock.now += 1
+
+    assert cache.lookup("alpha")[1] == {"answer": "alpha"}
+    clock.now += 1
+    vector, _ = cache.lookup("gamma")
+    cache.put("gamma", vector, {"answer": "gamma"})
+    assert len(store) == 2
+    assert cache.lookup("beta")[1] is None
+    assert cache.lookup("alpha")[1] == {"answer": "alpha"}
+
+    clock.now += 120
+    assert cache.lookup("alpha")[1] is None
+    assert len(store) == 0
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = SemanticCache(FakeEmbeddings(), SQLiteCacheStore(path))
+    second = SemanticCache(FakeEmbeddings(), SQLiteCacheStore(path))
+    vector, _ = first.lookup("shared question")
+    first.put("shared question", vector, {"answer": "yes"})
+    assert asyncio.run(second.alookup("shared question"))[1] == {"answer": "yes"}
+    second.invalidate()
+    assert first.lookup("shared question")[1] is None
+
+
+def test_sqlite_generation_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = SemanticCache(FakeEmbeddings(), SQLiteCacheStore(path, ttl=None))
+    second = SemanticCache(FakeEmbeddings(), SQLiteCacheStore(path, ttl=None))
+    generation = first.generation
+    vector, _ = first.lookup("stale question")
+    second.invalidate()
+    # Computed before the other process invalidated, so it is not stored.
+    first.put("stale question", vector, {"answer": "old"}, generation)
+    assert len(first.store) == 0 and second.lookup("stale question")[1] is None
+    assert first.lookup("stale question")[1] is None and first.generation == 1
+
+    first.put("stale question", vector, {"answer": "new"}, first.generation)
+    assert second.lookup("stale question")[1] == {"answer": "new"}
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_lookups_score_a_prebuilt_matrix(tmp_path, backend):
+    store = _store(backend, tmp_path, max_size=40)
+    cache = SemanticCache(FakeEmbeddings(), store, threshold=0.99)
+    for i in range(100):
+        vector, _ = cache.lookup(f"question {i}")
+        cache.put(f"question {i}", vector, {"answer": i})
+    assert len(store) == 40
+    assert cache.lookup("question 99")[1] == {"answer": 99}
+    assert cache.lookup("question 0")[1] is None
+    # Rows freed by eviction are reused instead of growing the matrix.
+    assert store._vectors.matrix.shape[0] <= 128
+
+
+def test_query_endpoint_uses_and_invalidates_cache(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    llm = CountingLLM()
+    cache = SemanticCache(FakeEmbeddings(), threshold=0.8)
+    monkeypatch.setattr(app_module, "workflow", create_graph(QueryAgent(DummyEmbedder(), llm=llm), SummarizerAgent(llm=llm)))
+    monkeypatch.setattr(app_module, "cache", cache)
+    monkeypatch.setattr(app_module, "embedder", SimpleNamespace(clear=lambda: None, count=lambda: 0))
+    monkeypatch.setattr(app_module, "ingestion", None)
+    client = TestClient(app_module.app)
+
+    first = client.get("/query", params={"question": "where is the manual"}).json()
+    again = client.get("/query", params={"question": "where is the manual kept"}).json()
+    assert again == first
+    assert llm.calls == 2
+    assert client.get("/stats").json()["cache"] == {"hits": 1, "misses": 1, "size": 1}
+
+    client.post("/reset")
+    client.get("/query", params={"question": "where is the manual"})
+    assert llm.calls == 4
+
+
+def test_answers_computed_before_an_invalidation_are_not_cached(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    import httpx
+    from workflow import app as app_module
+
+    class Store(DummyEmbedder):
+        embeddings = FakeEmbeddings()
+
+        def clear(self):
+            pass
+
+        def count(self):
+            return 0
+
+        async def asearch_many(self, questions, k=4, vectors=None):
+            return [self.search(q, k) for q in questions]
+
+    llm = CountingLLM(delay=0.2)
+    cache = SemanticCache(FakeEmbeddings(), threshold=0.8)
+    agent = QueryAgent(Store(), llm=llm)
+    monkeypatch.setattr(app_module, "workflow", create_graph(agent, SummarizerAgent(llm=llm)))
+    monkeypatch.setattr(app_module, "query_agent", agent)
+    monkeypatch.setattr(app_module, "cache", cache)
+    monkeypatch.setattr(app_module, "embedder", agent.embedder)
+    monkeypatch.setattr(app_module, "ingestion", None)
+    app_module.startup()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            query = asyncio.ensure_future(client.get("/query", params={"question": "where is the manual"}))
+            batch = asyncio.ensure_future(client.post("/query/batch", json={"questions": ["refund policy"]}))
+            await asyncio.sleep(0.05)
+            await client.post("/reset")
+            return await query, await batch
+
+    query, batch = asyncio.run(run())
+    assert query.status_code == batch.status_code == 200
+    assert len(cache.store) == 0
+    assert cache.generation == 1
@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from fakes import CountingLLM, FakeEmbeddings
+from workflow.agents.embedder import EmbeddingAgent
+from workflow.agents.local_index import LocalIndex
+from workflow.agents.shards import ShardedBackend, shard_of
+from workflow.registry import CollectionRegistry
+
+
+def _data(rows=2000, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(rows, dim)).astype(np.float32), rng.normal(size=(20, dim)).astype(np.float32)
+
+
+def test_shard_routing_is_stable_and_spread():
+    counts = np.bincount([shard_of(f"chunk-{i}", 4) for i in range(4000)], minlength=4)
+    assert counts.min() > 800
+    assert shard_of("chunk-1", 4) == shard_of("chunk-1", 4)
+
+
+def test_scatter_gather_matches_a_single_index():
+    data, queries = _data()
+    texts, ids = [str(i) for i in range(len(data))], [f"id{i}" for i in range(len(data))]
+    single, sharded = LocalIndex(), ShardedBackend([LocalIndex() for _ in range(4)])
+    single.add(texts, data, ids)
+    sharded.add(texts, data, ids)
+
+    assert sharded.count() == len(data)
+    assert min(shard.count() for shard in sharded.shards) > 300
+    for query in queries:
+        expected = single.search(query, 10)
+        hits = sharded.search(query, 10)
+        assert [d.page_content for d, _ in hits] == [d.page_content for d, _ in expected]
+        assert np.allclose([s for _, s in hits], [s for _, s in expected], rtol=1e-5)
+    many = sharded.search_many(queries, 5)
+    assert [[d.page_content for d, _ in hits] for hits in many] == [
+        [d.page_content for d, _ in single.search(q, 5)] for q in queries
+    ]
+
+    sharded.delete(ids[:1000])
+    assert sharded.count() == 1000
+    assert all(int(d.page_content) >= 1000 for d, _ in sharded.search(queries[0], 20))
+    sharded.close()
+
+
+def test_registry_builds_each_collection_once():
+    built = []
+    registry = CollectionRegistry(lambda name: built.append(name) or name, limit=2)
+    assert registry.get("tenant-a") == registry.get("tenant-a") == "tenant-a"
+    registry.get("tenant-b")
+    with pytest.raises(LookupError):
+        registry.get("tenant-c")
+    with pytest.raises(ValueError):
+        registry.get("../etc")
+    assert built == ["tenant-a", "tenant-b"]
+
+
+def test_collections_are_isolated_and_sharded(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+    from workflow.agents.summarizer import SummarizerAgent
+    from workflow.registry import CollectionRegistry
+
+    built = {}
+
+    def build_embedder(name=None):
+        backend = ShardedBackend([LocalIndex() for _ in range(app_module._shards(name))])
+        built[name] = EmbeddingAgent(name, backend=backend, embeddings=FakeEmbeddings())
+        return built[name]
+
+    monkeypatch.setenv("VECTOR_SHARDS", "tenant-a=3,default=1")
+    monkeypatch.setattr(app_module, "_build_embedder", build_embedder)
+    monkeypatch.setattr(app_module, "collections", CollectionRegistry(app_module._build_collection))
+    monkeypatch.setattr(app_module, "embedder", EmbeddingAgent(backend=LocalIndex(), embeddings=FakeEmbeddings()))
+    monkeypatch.setattr(app_module, "summarizer", SummarizerAgent(llm=CountingLLM()))
+    monkeypatch.setattr(app_module, "query_agent", None)
+    monkeypatch.setattr(app_module, "workflow", None)
+    monkeypatch.setattr(app_module, "ingestion", None)
+    monkeypatch.setattr(app_module, "cache", None)
+
+    with TestClient(app_module.app) as client:
+        text = "\n\n".join(f"tenant a router manual part {i} " * 10 for i in range(30))
+        done = client.post(
+            "/upload?wait=true&collection=tenant-a", files={"file": ("manual.txt", text.encode())}
+        ).json()
+        assert done["status"] == "done" and done["embedded"] == done["total"]
+        assert client.get("/stats", params={"collection": "tenant-a"}).json()["count"] == done["total"]
+        default = client.get("/stats").json()
+        assert (default["count"], default["collections"]) == (0, ["tenant-a"])
+        assert client.get(f"/jobs/{done['id']}").json()["status"] == "done"
+        assert client.get("/query", params={"question": "x", "collection": "bad/name"}).status_code == 422
+        # Only uploads and snapshot imports create collections.
+        for path in ("/query", "/stats", "/snapshot"):
+            assert client.get(path, params={"question": "x", "collection": "nobody"}).status_code == 404
+        assert client.post("/reset", params={"collection": "nobody"}).status_code == 404
+        assert client.get("/stats").json()["collections"] == ["tenant-a"]
+
+    shards = built["tenant-a"].backend.shards
+    assert len(shards) == 3 and all(shard.count() for shard in shards)
+    docs, _ = app_module.collections.get("tenant-a").query_agent.retrieve("router manual part 3")
+    assert docs and "tenant a router manual" in docs[0].page_content
+    assert app_module.query_agent.retrieve("router manual part 3")[0] == []
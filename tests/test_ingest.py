@@ -0,0 +1,208 @@
+import asyncio
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+from fakes import FakeEmbeddings
+from workflow.agents.embedder import EmbeddingAgent
+from workflow.agents.local_index import LocalIndex
+from workflow.ingest import IngestionQueue
+
+
+class RecordingEmbedder:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    async def aadd(self, texts, ids=None):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("embedding backend unavailable")
+        self.batches.append(list(texts))
+
+
+def _spool(tmp_path, name, paragraphs):
+    path = tmp_path / name
+    path.write_text("\n\n".join(f"{name} paragraph {i}" for i in range(paragraphs)))
+    return str(path)
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.embedded = 0
+
+    async def aembed_documents(self, texts):
+        self.embedded += len(texts)
+        return self.embed_documents(texts)
+
+
+def _ingest(embedder, paths, document_ids=None, **kwargs):
+    async def run():
+        queue = IngestionQueue(embedder, backoff=0.01, **kwargs)
+        await queue.start()
+        jobs = [queue.submit(p, d) for p, d in zip(paths, document_ids or [None] * len(paths))]
+        await queue.join()
+        await queue.stop()
+        return jobs
+
+    return asyncio.run(run())
+
+
+def test_chunks_from_several_uploads_share_batches(tmp_path):
+    embedder = RecordingEmbedder()
+    paths = [_spool(tmp_path, f"doc{i}", 40) for i in range(3)]
+    jobs = _ingest(embedder, paths, batch_size=100, max_wait=0.2, workers=1)
+
+    assert len(embedder.batches) == 1
+    assert {job.status for job in jobs} == {"done"}
+    assert sum(job.total for job in jobs) == len(embedder.batches[0])
+    assert all(job.embedded == job.total for job in jobs)
+    assert not any(os.path.exists(p) for p in paths)
+
+
+def test_batches_respect_size_limit(tmp_path):
+    embedder = RecordingEmbedder()
+    [job] = _ingest(embedder, [_spool(tmp_path, "doc", 400)], batch_size=8, workers=3)
+    assert job.status == "done"
+    assert max(len(b) for b in embedder.batches) <= 8
+    assert sum(len(b) for b in embedder.batches) == job.total
+
+
+def test_failed_batches_are_retried(tmp_path):
+    embedder = RecordingEmbedder(failures=2)
+    [job] = _ingest(embedder, [_spool(tmp_path, "doc", 5)], retries=2)
+    assert job.status == "done"
+    assert job.embedded == job.total
+
+
+def test_job_fails_when_retries_are_exhausted(tmp_path):
+    embedder = RecordingEmbedder(failures=10)
+    [job] = _ingest(embedder, [_spool(tmp_path, "doc", 5)], retries=1)
+    assert job.status == "failed"
+    assert job.error == "embedding backend unavailable"
+
+
+def test_upload_returns_job_and_reports_progress(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    embedder = EmbeddingAgent(backend=LocalIndex(), embeddings=FakeEmbeddings())
+    monkeypatch.setattr(app_module, "embedder", embedder)
+    monkeypatch.setattr(app_module, "ingestion", None)
+    text = "\n\n".join(f"paragraph {i} " * 20 for i in range(50))
+
+    with TestClient(app_module.app) as client:
+        resp = client.post("/upload", files={"file": ("doc.txt", text.encode())})
+        assert resp.json()["status"] == "queued"
+        job_id = resp.json()["job_id"]
+        deadline = time.time() + 5
+        while (status := client.get(f"/jobs/{job_id}").json())["status"] != "done":
+            assert time.time() < deadline
+            time.sleep(0.01)
+        assert client.get("/jobs/unknown").status_code == 404
+
+        edited = text.replace("paragraph 7 ", "section 7 ")
+        again = client.post(
+            "/upload",
+            params={"wait": True, "document_id": resp.json()["document_id"]},
+            files={"file": ("doc.txt", edited.encode())},
+        ).json()
+        # Without an id, a file sharing the name is a new document.
+        other = client.post("/upload?wait=true", files={"file": ("doc.txt", b"unrelated notes")}).json()
+
+    assert status["document_id"] == resp.json()["document_id"] != other["document_id"]
+    assert status["embedded"] == status["total"]
+    assert again["status"] == "done"
+    assert again["embedded"] == again["deleted"] >= 1
+    assert again["skipped"] == again["total"] - again["embedded"]
+    assert embedder.count() == again["total"] + other["total"]
+
+
+def test_upload_works_without_the_lifespan(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    embedder = EmbeddingAgent(backend=LocalIndex(), embeddings=FakeEmbeddings())
+    monkeypatch.setattr(app_module, "embedder", embedder)
+    monkeypatch.setattr(app_module, "ingestion", None)
+    client = TestClient(app_module.app)
+    for name in ("a.txt", "b.txt"):
+        job = client.post("/upload?wait=true", files={"file": (name, f"{name} notes".encode())}).json()
+        assert job["status"] == "done"
+    assert embedder.count() == 2
+
+
+def test_reupload_embeds_only_changed_chunks(tmp_path):
+    embeddings = CountingEmbeddings()
+    embedder = EmbeddingAgent(backend=LocalIndex(), embeddings=embeddings)
+    paragraphs = [f"paragraph {i} " * 30 for i in range(40)]
+    (tmp_path / "v1").write_text("\n\n".join(paragraphs))
+    [first] = _ingest(embedder, [str(tmp_path / "v1")], ["manual"], batch_size=16)
+    assert (first.embedded, first.skipped, first.deleted) == (first.total, 0, 0)
+
+    paragraphs[3] = "a rewritten paragraph " * 20
+    del paragraphs[10]
+    (tmp_path / "v2").write_text("\n\n".join(paragraphs))
+    embeddings.embedded = 0
+    [second] = _ingest(embedder, [str(tmp_path / "v2")], ["manual"], batch_size=16)
+
+    assert second.status == "done"
+    assert embeddings.embedded == second.embedded
+    assert 1 <= second.embedded <= 3 and second.deleted >= 2
+    assert second.skipped == second.total - second.embedded
+    assert embedder.count() == second.total
+    hits = embedder.search("paragraph 10 " * 30, k=embedder.count())
+    assert all(doc.page_content != "paragraph 10 " * 30 for doc, _ in hits)
+
+
+def test_identical_chunks_are_embedded_once_across_documents(tmp_path):
+    embeddings = CountingEmbeddings()
+    embedder = EmbeddingAgent(backend=LocalIndex(), embeddings=embeddings)
+    shared = "\n\n".join(f"shared paragraph {i} " * 30 for i in range(10))
+    for name in ("a", "b"):
+        (tmp_path / name).write_text(shared)
+    jobs = _ingest(embedder, [str(tmp_path / "a"), str(tmp_path / "b")], ["a", "b"])
+
+    assert {job.status for job in jobs} == {"done"}
+    assert embeddings.embedded == jobs[0].total == embedder.count()
+    assert sum(job.skipped for job in jobs) == jobs[0].total
+
+    # Dropping one document keeps the chunks the other still uses.
+    (tmp_path / "empty").write_text("")
+    [job] = _ingest(embedder, [str(tmp_path / "empty")], ["a"])
+    assert job.deleted == 0 and embedder.count() == jobs[0].total
+
+
+def test_failed_upload_removes_the_chunks_it_stored(tmp_path):
+    class FlakyEmbeddings(CountingEmbeddings):
+        async def aembed_documents(self, texts):
+            if self.embedded >= 8:
+                raise RuntimeError("quota exceeded")
+            return await super().aembed_documents(texts)
+
+    embeddings = FlakyEmbeddings()
+    embedder = EmbeddingAgent(backend=LocalIndex(), embeddings=embeddings)
+    paragraphs = [f"paragraph {i} " * 30 for i in range(20)]
+    embedder.upsert("kept", paragraphs[:2])
+    (tmp_path / "doc").write_text("\n\n".join(paragraphs))
+    [job] = _ingest(embedder, [str(tmp_path / "doc")], ["doc"], batch_size=4, workers=1, retries=0)
+
+    assert job.status == "failed" and job.embedded > 0
+    # Only the chunks of the recorded document remain searchable.
+    assert embedder.count() == 2
+    assert embedder.documents() == {"kept": embedder.documents()["kept"]}
+
+
+def test_upsert_persists_the_document_manifest(tmp_path):
+    manifest = str(tmp_path / "documents.json")
+    index = LocalIndex(str(tmp_path / "index"))
+    embedder = EmbeddingAgent(backend=index, embeddings=FakeEmbeddings(), manifest_path=manifest)
+    assert embedder.upsert("doc", ["one", "two", "two"]) == {"embedded": 2, "skipped": 1, "deleted": 0}
+
+    reopened = EmbeddingAgent(
+        backend=LocalIndex(str(tmp_path / "index")), embeddings=FakeEmbeddings(), manifest_path=manifest
+    )
+    assert reopened.upsert("doc", ["two", "three"]) == {"embedded": 1, "skipped": 1, "deleted": 1}
+    assert reopened.count() == 2
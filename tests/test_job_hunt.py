@@ -83,3 +83,67 @@ def test_missing_columns_raise():
     agent = _agent_for(sheet)
     with pytest.raises(ValueError):
         agent.run({})
+
+
+def test_rows_are_read_in_pages():
+    from benchmarks.fakes import FakeSheet
+
+    sheet = FakeSheet(
+        ["Email", "Type", "Status", "Name"],
+        [[f"u{i}@example.com", "software", "", f"U{i}"] for i in range(25)],
+    )
+    agent = JobHuntAgent("c", "k", "smtp", 587, "u", "p", sheet=sheet, page_size=10, flush_every=100)
+    agent._send_email = Mock()
+    assert agent.run({"software": ("Hi {Name}", "")}) == 25
+    # header, three pages, one batched status update
+    assert sheet.requests == 5
+    agent._send_email.assert_any_call("u24@example.com", "Hi U24", "")
+
+
+def test_blank_rows_at_a_page_boundary_do_not_end_the_run():
+    from benchmarks.fakes import FakeSheet
+
+    class UnsizedSheet(FakeSheet):
+        row_count = None
+
+    rows = [[f"u{i}@example.com", "software", "", f"U{i}"] for i in range(13)]
+    rows[8:8] = [[""] * 4] * 3
+    for cls in (FakeSheet, UnsizedSheet):
+        sheet = cls(["Email", "Type", "Status", "Name"], rows)
+        agent = JobHuntAgent("c", "k", "smtp", 587, "u", "p", sheet=sheet, page_size=10)
+        agent._send_email = Mock()
+        assert agent.run({"software": ("Hi {Name}", "")}) == 13
+
+
+def test_templates_naming_missing_columns_fail_before_sending():
+    sheet = DummySheet(
+        ["Email", "Type", "Status"],
+        [{"Email": "frank@example.com", "Type": "Software"}],
+    )
+    agent = _agent_for(sheet)
+    agent._send_email = Mock()
+    with pytest.raises(ValueError, match="Name"):
+        agent.run({"software": ("S", "Hello {Name}"), "default": ("D", "B")})
+    agent._send_email.assert_not_called()
+
+
+def test_compiled_templates_match_str_format():
+    from agents.job_hunt import _Template
+
+    header = ["Name", "Role"]
+    text = "{Name!r} wants {Role:>8}|{{literal}} {Name}"
+    assert _Template(text, header).render(["Ann", "dev"]) == text.format(Name="Ann", Role="dev")
+
+
+def test_paged_rows_keep_numbers_numeric():
+    from benchmarks.fakes import FakeSheet
+
+    sheet = FakeSheet(
+        ["Email", "Type", "Status", "Salary"],
+        [["ann@example.com", "software", "", "85000"], ["bob@example.com", "software", "", "1234.5"]],
+    )
+    agent = JobHuntAgent("c", "k", "smtp", 587, "u", "p", sheet=sheet, page_size=1)
+    agent._send_email = Mock()
+    assert agent.run({"software": ("Offer", "Salary: {Salary:,}")}) == 2
+    agent._send_email.assert_any_call("ann@example.com", "Offer", "Salary: 85,000")
+    agent._send_email.assert_any_call("bob@example.com", "Offer", "Salary: 1,234.5")
@@ -0,0 +1,247 @@
+import time
+
+import pytest
+
+from agents.job_hunt import JobHuntAgent, SessionError
+from benchmarks.fakes import FakeSheet, SMTPSink
+
+TEMPLATES = {"software": ("Hello {Name}", "Dear {Name}, please consider me.")}
+
+
+def _sheet(rows):
+    return FakeSheet(
+        ["Email", "Type", "Status", "Name"],
+        [[f"user{i}@example.com", "software", "", f"User {i}"] for i in range(rows)],
+    )
+
+
+def _agent(sink, sheet, **kwargs):
+    return JobHuntAgent("creds.json", "key", sink.host, sink.port, "me", "pw", sheet=sheet, starttls=False, **kwargs)
+
+
+def test_one_session_is_reused_for_the_whole_run():
+    with SMTPSink() as sink:
+        sheet = _sheet(20)
+        agent = _agent(sink, sheet)
+        assert agent.run(TEMPLATES) == 20
+        assert agent._sessions == []
+    assert sink.connections == 1
+    assert sink.logins == 1
+    assert [m[1] for m in sink.messages] == [[f"user{i}@example.com"] for i in range(20)]
+    assert all(row[2] == "Sent" for row in sheet.rows)
+
+
+def test_connections_are_recycled_after_the_message_cap():
+    with SMTPSink() as sink:
+        assert _agent(sink, _sheet(12), max_messages_per_connection=5).run(TEMPLATES) == 12
+    assert sink.connections == 3
+    assert len(sink.messages) == 12
+
+
+def test_reconnects_transparently_when_the_server_drops_the_session():
+    with SMTPSink(drop_after=4) as sink:
+        assert _agent(sink, _sheet(10)).run(TEMPLATES) == 10
+    assert sink.connections == 3
+    assert len({m[1][0] for m in sink.messages}) == 10
+
+
+def test_session_reuse_is_faster_than_a_connection_per_email():
+    def elapsed(**kwargs):
+        with SMTPSink(latency=0.002) as sink:
+            start = time.perf_counter()
+            _agent(sink, _sheet(15), **kwargs).run(TEMPLATES)
+            return time.perf_counter() - start
+
+    per_email = elapsed(max_messages_per_connection=1)
+    reused = elapsed()
+    # Without TLS a new session costs the greeting, EHLO, AUTH and QUIT
+    # round trips on top of the four each message needs.
+    assert reused * 1.5 < per_email
+
+
+def test_status_marks_are_written_back_in_batches():
+    with SMTPSink() as sink:
+        sheet = _sheet(120)
+        assert _agent(sink, sheet, flush_every=50).run(TEMPLATES) == 120
+    # header, records, then three batch updates instead of 120 cell updates
+    assert sheet.requests == 5
+    assert all(row[2] == "Sent" for row in sheet.rows)
+
+
+def test_journal_recovers_marks_after_a_crash(tmp_path):
+    journal = str(tmp_path / "sent.journal")
+    sheet = _sheet(6)
+
+    class Crash(Exception):
+        pass
+
+    with SMTPSink() as sink:
+        agent = _agent(sink, sheet, flush_every=100, journal_path=journal)
+        send = agent._send_email
+        calls = []
+
+        def flaky(*args):
+            if len(calls) == 4:
+                raise Crash()
+            calls.append(args)
+            send(*args)
+
+        agent._send_email = flaky
+        agent.flush = lambda: None  # the process dies before flushing
+        try:
+            agent.run(TEMPLATES)
+        except Crash:
+            pass
+        assert all(row[2] == "" for row in sheet.rows)
+
+        restarted = _agent(sink, sheet, journal_path=journal)
+        assert restarted.run(TEMPLATES) == 2
+    recipients = [m[1][0] for m in sink.messages]
+    assert sorted(recipients) == sorted(set(recipients))
+    assert len(recipients) == 6
+    assert all(row[2] == "Sent" for row in sheet.rows)
+    assert open(journal).read() == ""
+
+
+def test_concurrent_dispatch_uses_one_session_per_worker():
+    def elapsed(**kwargs):
+        with SMTPSink(latency=0.01) as sink:
+            sheet = _sheet(24)
+            start = time.perf_counter()
+            assert _agent(sink, sheet, **kwargs).run(TEMPLATES) == 24
+            took = time.perf_counter() - start
+        assert len({m[1][0] for m in sink.messages}) == 24
+        assert all(row[2] == "Sent" for row in sheet.rows)
+        return took, sink.connections
+
+    serial, _ = elapsed()
+    parallel, connections = elapsed(concurrency=4)
+    assert connections <= 4
+    assert parallel * 1.5 < serial
+
+
+def test_transient_rejections_are_retried_and_permanent_ones_reported():
+    attempts = {}
+
+    def reject(recipient):
+        attempts[recipient] = attempts.get(recipient, 0) + 1
+        if recipient == "user1@example.com" and attempts[recipient] < 3:
+            return 451
+        if recipient == "user2@example.com":
+            return 550
+        return None
+
+    with SMTPSink(reject=reject) as sink:
+        sheet = _sheet(4)
+        agent = _agent(sink, sheet, backoff=0.001)
+        assert agent.run(TEMPLATES) == 3
+    assert attempts["user1@example.com"] == 3
+    assert attempts["user2@example.com"] == 1
+    assert [(f["row"], f["email"]) for f in agent.failures] == [(4, "user2@example.com")]
+    assert [row[2] for row in sheet.rows] == ["Sent", "Sent", "", "Sent"]
+
+
+def test_session_failures_stop_the_run_instead_of_failing_each_row():
+    with SMTPSink(refuse_login=True) as sink:
+        sheet = _sheet(5)
+        agent = _agent(sink, sheet, backoff=0.001, concurrency=3)
+        with pytest.raises(SessionError):
+            agent.run(TEMPLATES)
+    assert sink.connections <= 3 and sink.messages == []
+    assert agent.failures == [] and agent._sessions == []
+    assert all(row[2] == "" for row in sheet.rows)
+
+    with SMTPSink(refuse_login=True) as sink:
+        with pytest.raises(SessionError):
+            _agent(sink, _sheet(5), backoff=0.001).run(TEMPLATES)
+    assert sink.connections == 1
+
+    # The sink does not offer STARTTLS, which the agent requires by default.
+    with SMTPSink() as sink:
+        with pytest.raises(SessionError):
+            JobHuntAgent("creds.json", "key", sink.host, sink.port, "me", "pw", sheet=_sheet(2)).run(TEMPLATES)
+
+    with SMTPSink() as sink:
+        pass
+    with pytest.raises(SessionError):
+        _agent(sink, _sheet(5), backoff=0.001).run(TEMPLATES)
+
+
+def test_token_bucket_paces_acquisitions():
+    from agents.job_hunt import _TokenBucket
+
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    bucket = _TokenBucket(rate=2.0, capacity=2.0, clock=lambda: now[0], sleep=sleep)
+    for _ in range(6):
+        bucket.acquire()
+    assert waits == [0.5, 0.5, 0.5, 0.5]
+
+
+def test_recipient_domains_are_throttled_independently():
+    sheet = FakeSheet(
+        ["Email", "Type", "Status", "Name"],
+        [[f"user{i}@{domain}", "software", "", "X"] for i in range(3) for domain in ("a.test", "b.test")],
+    )
+    with SMTPSink() as sink:
+        agent = _agent(sink, sheet, concurrency=2, domain_rate_per_second=20)
+        start = time.perf_counter()
+        assert agent.run(TEMPLATES) == 6
+        took = time.perf_counter() - start
+    # three emails per domain at 20/s need two 50 ms gaps, paid in parallel
+    assert 0.09 < took < 0.5
+
+
+def test_rows_sharing_an_address_are_sent_separately(tmp_path):
+    refused = []
+
+    def reject(recipient):
+        if not refused:
+            refused.append(recipient)
+            return 550
+        return None
+
+    sheet = FakeSheet(
+        ["Email", "Type", "Status", "Name"],
+        [["a@x.test", "software", "", "A"], ["a@x.test", "default", "", "A"]],
+    )
+    templates = {**TEMPLATES, "default": ("Hi {Name}", "Any role")}
+    with SMTPSink(reject=reject) as sink:
+        agent = _agent(sink, sheet, journal_path=str(tmp_path / "sent.journal"))
+        assert agent.run(templates) == 1
+        assert [f["row"] for f in agent.failures] == [2]
+        assert [row[2] for row in sheet.rows] == ["", "Sent"]
+
+        # The second vacancy of a contact is not skipped as already sent.
+        assert _agent(sink, sheet).run(templates) == 1
+    assert len(sink.messages) == 2
+
+
+def test_flush_keeps_journal_entries_whose_marks_are_not_buffered(tmp_path):
+    journal = str(tmp_path / "sent.journal")
+    agent = _agent(SMTPSink(), _sheet(3), journal_path=journal)
+    agent._journal("2:user0@example.com")
+    agent._journal("3:user1@example.com")  # delivered by a worker, not settled yet
+    agent._mark(2, 3, "2:user0@example.com")
+    agent.flush()
+    assert open(journal).read() == "3:user1@example.com\n"
+
+
+def test_journal_is_keyed_by_row(tmp_path):
+    journal = tmp_path / "sent.journal"
+    journal.write_text("2:a@x.test\n")  # row 2 was delivered before a crash
+    sheet = FakeSheet(
+        ["Email", "Type", "Status", "Name"],
+        [["a@x.test", "software", "", "A"], ["a@x.test", "default", "", "A"]],
+    )
+    templates = {**TEMPLATES, "default": ("Hi {Name}", "Any role")}
+    with SMTPSink() as sink:
+        assert _agent(sink, sheet, journal_path=str(journal)).run(templates) == 1
+    assert [m[1] for m in sink.messages] == [["a@x.test"]]
+    assert [row[2] for row in sheet.rows] == ["Sent", "Sent"]
+    assert journal.read_text() == ""
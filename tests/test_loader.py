@@ -0,0 +1,67 @@
+import asyncio
+import random
+import tracemalloc
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from workflow.agents.loader import aiter_chunks, iter_chunks, load_and_chunk
+
+
+def _document(paragraphs, seed=0):
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "error", "é", "数据"]
+    parts = []
+    for _ in range(paragraphs):
+        sentences = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(3, 40))) + "."
+            for _ in range(rng.randint(1, 6))
+        ]
+        parts.append(" ".join(sentences) + rng.choice(["\n", "\n\n"]))
+    return "".join(parts)
+
+
+def _blocks(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def test_streaming_split_matches_whole_document_split(tmp_path):
+    text = _document(1500)
+    expected = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50).split_text(text)
+    data = text.encode()
+    for size in (7, 4096, 1 << 16):
+        assert list(iter_chunks(_blocks(data, size))) == expected
+
+    path = tmp_path / "doc.txt"
+    path.write_bytes(data)
+    assert load_and_chunk(str(path)) == expected
+
+
+def test_async_split_matches_sync_split():
+    data = _document(300).encode()
+
+    async def ablocks():
+        for block in _blocks(data, 1000):
+            yield block
+
+    async def collect():
+        return [c async for c in aiter_chunks(ablocks(), chunk_size=200, chunk_overlap=20)]
+
+    assert asyncio.run(collect()) == list(iter_chunks(_blocks(data, 1000), 200, 20))
+
+
+def test_peak_memory_is_independent_of_document_size():
+    block = _document(200).encode()
+
+    def peak(repeats):
+        tracemalloc.start()
+        for _ in iter_chunks(block for _ in range(repeats)):
+            pass
+        _, top = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return top
+
+    small = peak(4)
+    large = peak(32)
+    assert large < 1.5 * small
+    assert large < 8 * len(block)
+
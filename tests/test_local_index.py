@@ -0,0 +1,179 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from fakes import FakeEmbeddings
+from workflow.agents.embedder import EmbeddingAgent
+from workflow.agents.local_index import LocalIndex
+from workflow.agents.query import QueryAgent
+
+
+def _data(rows=3000, dim=16, clusters=30, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    data = centers[rng.integers(0, clusters, rows)] + 0.2 * rng.normal(size=(rows, dim))
+    queries = centers[rng.integers(0, clusters, 50)] + 0.2 * rng.normal(size=(50, dim))
+    return data.astype(np.float32), queries.astype(np.float32)
+
+
+def _brute_force(data, query, k):
+    distances = ((data - query) ** 2).sum(axis=1)
+    order = np.argsort(distances)[:k]
+    return [str(i) for i in order], distances[order]
+
+
+@pytest.mark.parametrize("persist", [False, True])
+def test_exact_search_matches_brute_force(tmp_path, persist):
+    data, queries = _data()
+    index = LocalIndex(str(tmp_path) if persist else None, block_rows=500)
+    for s in range(0, len(data), 700):
+        index.add([str(i) for i in range(s, min(s + 700, len(data)))], data[s:s + 700])
+    assert index.count() == len(data)
+
+    for query in queries[:10]:
+        ids, distances = _brute_force(data, query, 5)
+        hits = index.search(query, 5)
+        assert [doc.page_content for doc, _ in hits] == ids
+        assert np.allclose([score for _, score in hits], distances, rtol=1e-4, atol=1e-4)
+
+
+def test_reopening_a_persisted_index_restores_it(tmp_path):
+    data, queries = _data()
+    index = LocalIndex(str(tmp_path))
+    index.add([str(i) for i in range(len(data))], data)
+    index.train(nlist=20)
+    expected = index.search(queries[0], 4)
+
+    reopened = LocalIndex(str(tmp_path))
+    assert reopened.count() == len(data)
+    assert reopened.search(queries[0], 4) == expected
+    reopened.add(["extra"], [queries[0]])
+    assert reopened.search(queries[0], 1)[0][0].page_content == "extra"
+
+    reopened.clear()
+    assert reopened.count() == 0
+    assert LocalIndex(str(tmp_path)).count() == 0
+
+
+def test_ivf_recall_against_exact():
+    data, queries = _data()
+    index = LocalIndex(nprobe=4)
+    index.add([str(i) for i in range(len(data))], data)
+    exact = [{doc.page_content for doc, _ in index.search(q, 10)} for q in queries]
+    index.train(nlist=30)
+    ivf = [{doc.page_content for doc, _ in index.search(q, 10)} for q in queries]
+    recall = np.mean([len(a & b) / 10 for a, b in zip(ivf, exact)])
+    assert recall >= 0.95
+
+
+def test_float16_storage_keeps_neighbours():
+    data, queries = _data()
+    index = LocalIndex(dtype="float16")
+    index.add([str(i) for i in range(len(data))], data)
+    for query in queries[:10]:
+        assert index.search(query, 1)[0][0].page_content == _brute_force(data, query, 1)[0][0]
+
+
+def test_query_agent_runs_on_local_backend():
+    embedder = EmbeddingAgent(backend=LocalIndex(), embeddings=FakeEmbeddings())
+    asyncio.run(embedder.aadd(["reset the router by unplugging it", "refunds take five days"]))
+    agent = QueryAgent(embedder, llm=object())
+    docs, needs_human = asyncio.run(agent.aretrieve("how do I reset the router"))
+    assert docs[0].page_content == "reset the router by unplugging it"
+    assert embedder.count() == 2
+
+
+def test_deleted_rows_are_never_returned_and_stay_deleted(tmp_path):
+    data, queries = _data(rows=500)
+    index = LocalIndex(str(tmp_path), block_rows=128)
+    ids = [f"id{i}" for i in range(len(data))]
+    index.add([str(i) for i in range(len(data))], data, ids)
+    index.add(["dup"], data[:1], ids[:1])
+    assert index.count() == len(data)
+
+    nearest = [doc.page_content for doc, _ in index.search(queries[0], 20)]
+    index.delete([f"id{i}" for i in nearest[:10]] + ["unknown"])
+    assert index.count() == len(data) - 10
+
+    for reopened in (index, LocalIndex(str(tmp_path), block_rows=128)):
+        hits = [doc.page_content for doc, _ in reopened.search(queries[0], 10)]
+        assert hits == nearest[10:20]
+        assert [doc.page_content for doc, _ in reopened.search_many([queries[0]], 10)[0]] == hits
+    small = LocalIndex()
+    small.add(["a", "b"], data[:2], ["a", "b"])
+    small.delete(["a"])
+    assert [doc.page_content for doc, _ in small.search(queries[0], 5)] == ["b"]
+
+
+def test_lines_appended_before_a_crash_are_dropped_on_reopen(tmp_path):
+    index = LocalIndex(str(tmp_path))
+    index.add(["a", "b"], [[1.0, 0.0], [0.0, 1.0]], ["id-a", "id-b"])
+    # The process died after appending a row's text and id but before
+    # meta.json recorded it.
+    with open(tmp_path / "texts.jsonl", "a") as handle:
+        handle.write('"lost"\n')
+    with open(tmp_path / "ids.jsonl", "a") as handle:
+        handle.write('"id-lost"\n')
+
+    reopened = LocalIndex(str(tmp_path))
+    reopened.add(["c"], [[1.0, 1.0]], ["id-c"])
+    again = LocalIndex(str(tmp_path))
+    assert again.count() == 3
+    assert [d.page_content for d, _ in again.search([1.0, 1.0], 1)] == ["c"]
+    assert [d.page_content for d, _ in again.search([1.0, 0.0], 1)] == ["a"]
+    again.delete(["id-c"])
+    assert again.count() == 2 and "id-lost" not in again._rows
+
+
+@pytest.mark.parametrize("persist", [False, True])
+def test_tombstones_are_compacted_past_the_ratio(tmp_path, persist):
+    data, queries = _data(rows=400)
+    path = str(tmp_path / "index") if persist else None
+    index = LocalIndex(path, compact_ratio=0.25)
+    index.add([str(i) for i in range(len(data))], data, [f"id{i}" for i in range(len(data))])
+    index.train(nlist=10)
+    index.delete([f"id{i}" for i in range(90)])
+    assert len(index._deleted) == 90 and index._count == 400
+
+    index.delete([f"id{i}" for i in range(90, 120)])
+    assert index._deleted == set() and index._count == index.count() == 280
+    assert index._centroids is not None
+    expected = _brute_force(data[120:], queries[0], 5)[0]
+    hits = [doc.page_content for doc, _ in index.search(queries[0], 5)]
+    assert hits == [str(int(i) + 120) for i in expected]
+    index.delete(["id120"])
+    assert "id121" in index._rows and "id120" not in index._rows
+    if persist:
+        reopened = LocalIndex(path)
+        assert reopened.count() == 279 and reopened._centroids is not None
+        assert [doc.page_content for doc, _ in reopened.search(queries[0], 5)] == [
+            doc.page_content for doc, _ in index.search(queries[0], 5)
+        ]
+
+
+def test_ivf_is_trained_once_enough_rows_arrive(tmp_path):
+    data, queries = _data(rows=2000)
+    index = LocalIndex(str(tmp_path), nlist=10, nprobe=4)
+    index.add([str(i) for i in range(300)], data[:300])
+    assert index._centroids is None
+    index.add([str(i) for i in range(300, 800)], data[300:800])
+    assert len(index._centroids) == 10 and index._trained == 800
+    index.add([str(i) for i in range(800, 1200)], data[800:1200])
+    assert index._trained == 800
+    index.add([str(i) for i in range(1200, 2000)], data[1200:])
+    assert index._trained == 2000
+    assert LocalIndex(str(tmp_path), nlist=10)._trained == 2000
+
+
+def test_app_configures_ivf_from_the_environment(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    monkeypatch.delenv("VECTOR_INDEX_PATH", raising=False)
+    monkeypatch.setenv("VECTOR_INDEX_NLIST", "16")
+    monkeypatch.setenv("VECTOR_INDEX_NPROBE", "3")
+    backend = app_module._build_embedder("ivf").backend
+    assert (backend.nlist, backend.nprobe) == (16, 3)
@@ -0,0 +1,113 @@
+import asyncio
+import os
+
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from fakes import FakeEmbeddings, SlowLLM
+from workflow.agents.embedder import EmbeddingAgent
+from workflow.agents.local_index import LocalIndex
+from workflow.agents.query import QueryAgent
+from workflow.agents.summarizer import SummarizerAgent
+from workflow.graph import create_graph
+from workflow.memo import NodeMemo
+
+
+class PromptLLM(SlowLLM):
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return super().invoke(prompt)
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return await super().ainvoke(prompt)
+
+    def summaries(self):
+        return sum(prompt.startswith("Summarize") for prompt in self.prompts)
+
+
+class FixedEmbedder:
+    """Retrieves the same chunks whatever the question."""
+
+    def search(self, query, k=4):
+        return [(Document(page_content=f"chunk {i}"), 0.1) for i in range(2)]
+
+    async def asearch(self, query, k=4):
+        return self.search(query, k=k)
+
+
+def _graph(llm, memo, model="gpt-3.5-turbo"):
+    return create_graph(QueryAgent(FixedEmbedder(), llm=llm), SummarizerAgent(model, llm=llm), memo)
+
+
+def test_summary_is_shared_by_questions_retrieving_the_same_chunks():
+    llm, memo = PromptLLM(), NodeMemo()
+    graph = _graph(llm, memo)
+    first = graph.invoke({"question": "where is the manual?"})
+    second = graph.invoke({"question": "how do I reset it?"})
+    assert first["summary"] == second["summary"]
+    assert first["answer"] != second["answer"]
+    assert llm.summaries() == 1 and len(llm.prompts) == 3
+    assert memo.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    # Another model does not reuse the summary, nor does the async path
+    # once the memo was invalidated.
+    _graph(llm, memo, model="gpt-4o").invoke({"question": "q"})
+    assert llm.summaries() == 2
+    memo.invalidate()
+    asyncio.run(graph.ainvoke({"question": "q"}))
+    asyncio.run(graph.ainvoke({"question": "other"}))
+    assert llm.summaries() == 3
+
+
+def test_memo_evicts_least_recently_used_and_persists(tmp_path):
+    memo = NodeMemo(max_size=2)
+    memo.put("a", {"summary": "A"})
+    memo.put("b", {"summary": "B"})
+    memo.get("a")
+    memo.put("c", {"summary": "C"})
+    assert (memo.get("a"), memo.get("b"), len(memo)) == ({"summary": "A"}, None, 2)
+
+    ticks = iter(range(100))
+    path = str(tmp_path / "memo.sqlite")
+    disk = NodeMemo(max_size=2, path=path, clock=lambda: next(ticks))
+    disk.put("a", {"summary": "A"})
+    disk.put("b", {"summary": "B"})
+    disk.get("a")
+    disk.put("c", {"summary": "C"})
+    reopened = NodeMemo(max_size=2, path=path)
+    assert reopened.get("a") == {"summary": "A"} and reopened.get("b") is None
+    assert NodeMemo.key("summarize", "m", ["x"]) == NodeMemo.key("summarize", "m", ["x"])
+    assert NodeMemo.key("summarize", "m", ["x"]) != NodeMemo.key("summarize", "n", ["x"])
+
+
+def test_upload_and_reset_invalidate_the_memo(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    llm = PromptLLM()
+    monkeypatch.setenv("NODE_MEMO", "memory")
+    monkeypatch.setattr(app_module, "embedder", EmbeddingAgent(backend=LocalIndex(), embeddings=FakeEmbeddings()))
+    monkeypatch.setattr(app_module, "query_agent", QueryAgent(FixedEmbedder(), llm=llm))
+    monkeypatch.setattr(app_module, "summarizer", SummarizerAgent(llm=llm))
+    monkeypatch.setattr(app_module, "workflow", None)
+    monkeypatch.setattr(app_module, "ingestion", None)
+    monkeypatch.setattr(app_module, "cache", None)
+    monkeypatch.setattr(app_module, "memo", app_module._UNSET)
+
+    with TestClient(app_module.app) as client:
+        client.get("/query", params={"question": "one"})
+        client.get("/query", params={"question": "two"})
+        assert llm.summaries() == 1
+        assert client.get("/stats").json()["memo"]["hits"] == 1
+
+        client.post("/upload?wait=true", files={"file": ("a.txt", b"new router manual")})
+        client.get("/query", params={"question": "three"})
+        assert llm.summaries() == 2
+
+        client.post("/reset")
+        assert client.get("/stats").json()["memo"]["size"] == 0
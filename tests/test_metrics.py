@@ -0,0 +1,115 @@
+import asyncio
+import os
+import re
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+
+from fakes import FakeEmbeddings
+from workflow.agents.embedder import EmbeddingAgent
+from workflow.agents.local_index import LocalIndex
+from workflow.agents.query import QueryAgent
+from workflow.agents.summarizer import SummarizerAgent
+from workflow.graph import create_graph
+from workflow.metrics import Metrics, metrics
+
+
+class UsageLLM:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    async def ainvoke(self, prompt):
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return AIMessage("ok", usage_metadata={"input_tokens": 7, "output_tokens": 3, "total_tokens": 10})
+
+
+@pytest.fixture
+def enabled():
+    metrics.reset()
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = False
+    metrics.reset()
+
+
+def _sample(text, name, **labels):
+    selector = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    series = f"{name}{{{selector}}}" if labels else name
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def _workflow(llm, threshold_docs):
+    embedder = EmbeddingAgent(backend=LocalIndex(), embeddings=FakeEmbeddings())
+    asyncio.run(embedder.aadd(threshold_docs))
+    return create_graph(QueryAgent(embedder, llm=llm), SummarizerAgent(llm=llm))
+
+
+def test_nodes_agents_tokens_and_escalations_are_recorded(enabled):
+    workflow = _workflow(UsageLLM(), ["router manual", "billing policy"])
+    asyncio.run(workflow.ainvoke({"question": "nothing related at all"}))
+    asyncio.run(workflow.ainvoke({"question": "router manual"}))
+    text = metrics.render()
+
+    assert _sample(text, "workflow_duration_seconds_count", operation="node.retrieve") == 2
+    assert _sample(text, "workflow_duration_seconds_count", operation="node.answer") == 1
+    assert _sample(text, "workflow_duration_seconds_count", operation="node.human") == 1
+    assert _sample(text, "workflow_duration_seconds_count", operation="embedder.search") == 2
+    assert _sample(text, "workflow_duration_seconds_count", operation="summarizer.run") == 1
+    assert _sample(text, "workflow_escalations_total") == 1
+    assert _sample(text, "workflow_llm_tokens_total", operation="query.answer", type="prompt") == 7
+    assert _sample(text, "workflow_llm_tokens_total", operation="summarizer.run", type="completion") == 3
+    assert _sample(text, "workflow_in_flight", operation="node.answer") == 0
+
+
+def test_errors_are_counted_and_reraised(enabled):
+    workflow = _workflow(UsageLLM(fail=True), ["router manual"])
+    with pytest.raises(RuntimeError):
+        asyncio.run(workflow.ainvoke({"question": "router manual"}))
+    text = metrics.render()
+    assert _sample(text, "workflow_errors_total", operation="query.answer") == 1
+    assert _sample(text, "workflow_in_flight", operation="query.answer") == 0
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Metrics(enabled=True, buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        registry.observe("workflow_duration_seconds", value, operation="x")
+    text = registry.render()
+    assert _sample(text, "workflow_duration_seconds_bucket", operation="x", le="0.1") == 1
+    assert _sample(text, "workflow_duration_seconds_bucket", operation="x", le="1") == 2
+    assert _sample(text, "workflow_duration_seconds_bucket", operation="x", le="+Inf") == 3
+    assert _sample(text, "workflow_duration_seconds_sum", operation="x") == 5.55
+
+
+def test_disabled_instrumentation_is_cheap():
+    registry = Metrics(enabled=False)
+
+    def bare(x):
+        return x
+
+    wrapped = registry.timed("bare")(bare)
+    calls = 200_000
+    start = time.perf_counter()
+    for i in range(calls):
+        bare(i)
+    baseline = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(calls):
+        wrapped(i)
+    overhead = (time.perf_counter() - start - baseline) / calls
+    assert overhead < 2e-6
+    assert registry.render().count("\n") == 12
+
+
+def test_metrics_endpoint(enabled):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    metrics.observe("workflow_duration_seconds", 0.2, operation="node.answer")
+    resp = TestClient(app_module.app).get("/metrics")
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'workflow_duration_seconds_count{operation="node.answer"} 1' in resp.text
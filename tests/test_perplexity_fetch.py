@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from perplexity.fetch import PageCache, PageFetcher, UnsafeURLError  # noqa: E402
+
+ARTICLE = (
+    "<html><head><title>T</title><script>var x = 1;</script></head><body>"
+    "<nav>menu</nav><h1>Heading</h1><p>First &amp; foremost.</p><p>Second   part.</p>"
+    "<style>p {}</style></body></html>"
+)
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _public_dns(host):
+    return ["93.184.216.34"]
+
+
+def test_pages_are_fetched_concurrently_and_extracted():
+    async def handler(request):
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, html=ARTICLE)
+
+    async def run():
+        fetcher = PageFetcher(transport=httpx.MockTransport(handler), resolver=_public_dns)
+        start = time.perf_counter()
+        pages = await fetcher.fetch_all([f"https://site{i}.test/" for i in range(5)])
+        await fetcher.aclose()
+        return pages, time.perf_counter() - start
+
+    pages, took = _run(run())
+    assert list(pages) == [f"https://site{i}.test/" for i in range(5)]
+    assert pages["https://site0.test/"] == "Heading\nFirst & foremost.\nSecond part."
+    assert took < 0.35
+
+
+def test_deadline_returns_the_pages_that_arrived():
+    async def handler(request):
+        if request.url.host == "slow.test":
+            await asyncio.sleep(5)
+        return httpx.Response(200, html=ARTICLE)
+
+    async def run():
+        fetcher = PageFetcher(deadline=0.2, transport=httpx.MockTransport(handler), resolver=_public_dns)
+        start = time.perf_counter()
+        pages = await fetcher.fetch_all(["https://slow.test/", "https://fast.test/", "/relative"])
+        await fetcher.aclose()
+        return pages, time.perf_counter() - start
+
+    pages, took = _run(run())
+    assert list(pages) == ["https://fast.test/"]
+    assert took < 1
+
+
+def test_per_host_limit_and_size_cap():
+    active, peak = [0], [0]
+
+    async def handler(request):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        active[0] -= 1
+        return httpx.Response(200, text="word " * 10000, headers={"content-type": "text/plain"})
+
+    async def run():
+        fetcher = PageFetcher(
+            max_per_host=2, max_bytes=100, transport=httpx.MockTransport(handler), resolver=_public_dns
+        )
+        pages = await fetcher.fetch_all([f"https://one.test/{i}" for i in range(6)])
+        assert fetcher._hosts == {}  # idle hosts are not kept
+        await fetcher.aclose()
+        return pages
+
+    pages = _run(run())
+    assert len(pages) == 6 and peak[0] == 2
+    assert all(len(text) <= 100 for text in pages.values())
+
+
+def test_cache_revalidates_with_etag():
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, html=ARTICLE, headers={"etag": '"v1"'})
+
+    now = [0.0]
+    cache = PageCache(ttl=60, clock=lambda: now[0])
+
+    async def run():
+        fetcher = PageFetcher(cache=cache, transport=httpx.MockTransport(handler), resolver=_public_dns)
+        first = await fetcher.fetch("https://a.test/")
+        assert await fetcher.fetch("https://a.test/") == first  # fresh, no request
+        now[0] = 120
+        assert await fetcher.fetch("https://a.test/") == first  # revalidated
+        await fetcher.aclose()
+
+    _run(run())
+    assert seen == [None, '"v1"']
+
+
+def test_graph_passes_page_text_to_the_summarizer():
+    from benchmarks.fakes import FakeChatModel
+    from perplexity.graph import create_graph
+    from perplexity.planner import QueryPlanner
+    from perplexity.search import SearchClient
+    from perplexity.summarizer import Summarizer
+
+    serp = "<div class='g'><a href='https://a.test/'><h3>A</h3></a></div>"
+    prompts = []
+
+    class RecordingModel(FakeChatModel):
+        async def ainvoke(self, prompt, *args, **kwargs):
+            prompts.append(prompt)
+            return await super().ainvoke(prompt, *args, **kwargs)
+
+    def handler(request):
+        if request.url.host == "a.test":
+            return httpx.Response(200, html=ARTICLE)
+        return httpx.Response(200, html=serp)
+
+    transport = httpx.MockTransport(handler)
+    graph = create_graph(
+        client=SearchClient(transport=transport),
+        fetcher=PageFetcher(transport=transport, resolver=_public_dns),
+        summarizer=Summarizer(llm=RecordingModel()),
+        planner=QueryPlanner(llm=RecordingModel(), max_queries=1),
+    )
+    result = _run(graph.ainvoke({"question": "q"}))
+    assert result["pages"] == {"https://a.test/": "Heading\nFirst & foremost.\nSecond part."}
+    assert "First & foremost." in prompts[0]
+
+
+def test_private_hosts_and_redirects_to_them_are_refused():
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        if request.url.host == "hop.test":
+            return httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data"})
+        if request.url.host == "loop.test":
+            return httpx.Response(301, headers={"location": "/again"})
+        return httpx.Response(200, html=ARTICLE)
+
+    async def dns(host):
+        return {"intranet.test": ["10.0.0.5"], "six.test": ["::1"]}.get(host, ["93.184.216.34"])
+
+    async def run():
+        fetcher = PageFetcher(transport=httpx.MockTransport(handler), resolver=dns, max_redirects=2)
+        results = {}
+        for url in ("http://127.0.0.1:8000/", "http://intranet.test/", "http://six.test/",
+                    "https://hop.test/", "file:///etc/passwd", "https://loop.test/"):
+            try:
+                results[url] = await fetcher.fetch(url)
+            except (UnsafeURLError, httpx.TooManyRedirects) as exc:
+                results[url] = type(exc).__name__
+        await fetcher.aclose()
+        return results
+
+    results = _run(run())
+    assert set(results.values()) == {"UnsafeURLError", "TooManyRedirects"}
+    assert results["https://loop.test/"] == "TooManyRedirects"
+    # Only the redirecting public hosts were contacted.
+    assert requested[0] == "https://hop.test/"
+    assert all(url.startswith("https://loop.test/") for url in requested[1:])
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import time
+
+import httpx
+from langchain_core.messages import AIMessage
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from perplexity.fetch import PageFetcher  # noqa: E402
+from perplexity.graph import canonical_url, create_graph, merge_results  # noqa: E402
+from perplexity.planner import QueryPlanner  # noqa: E402
+from perplexity.search import SearchClient  # noqa: E402
+from perplexity.summarizer import Summarizer  # noqa: E402
+
+
+class ScriptedLLM:
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return AIMessage(content=self.reply)
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+
+def _serp(links):
+    return "".join(f"<div class='g'><a href='{link}'><h3>{link}</h3></a></div>" for link in links)
+
+
+SERPS = {
+    "compare a and b": ["https://www.shared.test/page/?utm_source=x", "https://main.test/"],
+    "what is a": ["https://a.test/", "https://shared.test/page"],
+    "what is b": ["https://b.test/", "/url?q=https://shared.test/page&sa=U"],
+}
+
+
+def test_canonical_url_unwraps_and_normalises():
+    assert canonical_url("/url?q=https://WWW.Example.test/a/&sa=U") == "https://example.test/a"
+    assert canonical_url("https://example.test/a?utm_medium=x&b=2&a=1#top") == "https://example.test/a?a=1&b=2"
+
+
+def test_planner_caps_the_searches_including_the_question():
+    llm = ScriptedLLM("one\ntwo\nthree\nfour")
+    assert QueryPlanner(llm=llm, max_queries=3).run("q") == ["q", "one", "two"]
+    assert "at most 2 " in llm.prompts[0]
+    assert QueryPlanner(llm=llm, max_queries=1).run("q") == ["q"]
+
+
+def test_merge_deduplicates_and_ranks_by_fusion():
+    hits = [
+        dict(title=link, link=link, snippet="", position=p, rank=r)
+        for p, links in enumerate(SERPS.values())
+        for r, link in enumerate(links, start=1)
+    ]
+    merged = merge_results(hits)
+    assert [s["link"] for s in merged] == [
+        "https://www.shared.test/page/?utm_source=x",
+        "https://a.test/",
+        "https://b.test/",
+        "https://main.test/",
+    ]
+
+
+def test_sub_queries_are_searched_in_parallel_and_merged():
+    calls = []
+
+    async def handler(request):
+        if request.url.path != "/search":
+            return httpx.Response(404)
+        calls.append(request.url.params["q"])
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, html=_serp(SERPS[request.url.params["q"].lower()]))
+
+    transport = httpx.MockTransport(handler)
+    answerer = ScriptedLLM("final answer")
+    graph = create_graph(
+        client=SearchClient(transport=transport),
+        fetcher=PageFetcher(transport=transport),
+        summarizer=Summarizer(llm=answerer),
+        planner=QueryPlanner(llm=ScriptedLLM("1. What is A\n- what is b\n"), max_queries=3),
+        pages=0,
+    )
+    start = time.perf_counter()
+    result = asyncio.run(graph.ainvoke({"question": "compare a and b"}))
+    took = time.perf_counter() - start
+
+    assert sorted(q.lower() for q in calls) == sorted(SERPS)
+    assert took < 0.4  # three 200 ms searches ran side by side
+    assert result["queries"] == ["compare a and b", "What is A", "what is b"]
+    assert len(result["sources"]) == 4
+    assert result["answer"] == "final answer"
+    assert "https://main.test/" in answerer.prompts[0]
+
+
+def test_graph_runs_synchronously_and_survives_a_failing_search():
+    def handler(request):
+        if request.url.params["q"].lower() == "what is b":
+            return httpx.Response(503)
+        return httpx.Response(200, html=_serp(SERPS[request.url.params["q"].lower()]))
+
+    def build():
+        transport = httpx.MockTransport(handler)
+        return create_graph(
+            client=SearchClient(transport=transport),
+            fetcher=PageFetcher(transport=transport),
+            summarizer=Summarizer(llm=ScriptedLLM("final answer")),
+            planner=QueryPlanner(llm=ScriptedLLM("what is a\nwhat is b"), max_queries=3),
+            pages=0,
+        )
+
+    for result in (build().invoke({"question": "compare a and b"}),
+                   asyncio.run(build().ainvoke({"question": "compare a and b"}))):
+        assert result["answer"] == "final answer"
+        assert [s["link"] for s in result["sources"]] == [
+            "https://www.shared.test/page/?utm_source=x",
+            "https://a.test/",
+            "https://main.test/",
+        ]
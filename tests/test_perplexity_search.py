@@ -0,0 +1,144 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from perplexity.search import SearchCache, SearchClient, parse_results  # noqa: E402
+
+PAGE = (
+    "<html><body><div class='nav'><a href='/home'>Home</a></div>"
+    + "".join(
+        f"<div class='g'><div><a href='https://site{i}.test/'><h3>Result <b>{i}</b></h3></a></div>"
+        f"<div><span class='aCOpRe'>About {{q}} &amp; {i}</span></div></div>"
+        for i in range(8)
+    )
+    + "<div class='g'><h3>No link</h3></div></body></html>"
+)
+
+
+@pytest.fixture
+def server():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)["q"][0]
+            hits.append((query, self.client_address))
+            body = PAGE.replace("{q}", query).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/search", hits
+    httpd.shutdown()
+
+
+def test_parse_results_extracts_titles_links_and_snippets():
+    results = parse_results(PAGE.replace("{q}", "x"), num=3)
+    assert results == [
+        {"title": f"Result {i}", "link": f"https://site{i}.test/", "snippet": f"About x & {i}"}
+        for i in range(3)
+    ]
+    assert len(parse_results(PAGE, num=20)) == 8
+
+
+def test_client_reuses_connections_and_caches_normalized_queries(server):
+    url, hits = server
+    client = SearchClient(url=url)
+    first = client.search("Router  Reset")
+    assert first[0]["snippet"] == "About Router  Reset & 0"
+    assert client.search("router reset") == first
+    client.search("firmware")
+    client.close()
+    assert [q for q, _ in hits] == ["Router  Reset", "firmware"]
+    # both requests travelled over the same keep-alive connection
+    assert hits[0][1] == hits[1][1]
+
+
+def test_concurrent_identical_queries_are_coalesced():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.params["q"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, text=PAGE)
+
+    async def run():
+        client = SearchClient(transport=httpx.MockTransport(handler))
+        results = await asyncio.gather(*(client.asearch("same question") for _ in range(10)))
+        await asyncio.gather(client.asearch("other"), client.asearch("Same   Question"))
+        await client.aclose()
+        return results
+
+    results = asyncio.run(run())
+    assert calls == ["same question", "other"]
+    assert all(r == results[0] and len(r) == 5 for r in results)
+
+
+def test_errors_are_not_cached():
+    status = [503]
+
+    def handler(request):
+        return httpx.Response(status[0], text=PAGE)
+
+    client = SearchClient(transport=httpx.MockTransport(handler))
+    with pytest.raises(httpx.HTTPStatusError):
+        client.search("q")
+    status[0] = 200
+    assert len(client.search("q")) == 5
+    assert client.requests == 2
+
+
+def test_cache_expires_evicts_and_persists(tmp_path):
+    now = [0.0]
+    path = str(tmp_path / "search.db")
+    cache = SearchCache(max_size=2, ttl=10, path=path, clock=lambda: now[0])
+    for key in "abc":
+        cache.put(key, [{"title": key}])
+    assert len(cache) == 2
+    assert cache.get("a") is None  # trimmed from the file as well
+    reopened = SearchCache(ttl=10, path=path, clock=lambda: now[0])
+    assert reopened.get("c") == [{"title": "c"}]
+    now[0] = 11
+    assert reopened.get("c") is None
+    assert cache.get("b") is None
+
+
+def test_sqlite_cache_is_trimmed_on_put(tmp_path):
+    import sqlite3
+
+    now = [0.0]
+    path = str(tmp_path / "search.db")
+    cache = SearchCache(max_size=3, ttl=10, path=path, clock=lambda: now[0])
+    for i, key in enumerate("abcd"):
+        now[0] = i
+        cache.put(key, [{"title": key}])
+    now[0] = 4
+    assert cache.get("b") == [{"title": "b"}]
+    now[0] = 5
+    cache.put("e", [{"title": "e"}])
+
+    def keys():
+        with sqlite3.connect(path) as db:
+            return sorted(row[0] for row in db.execute("SELECT key FROM results"))
+
+    assert keys() == ["b", "d", "e"]
+    now[0] = 14.5
+    cache.put("f", [{"title": "f"}])
+    assert keys() == ["e", "f"]
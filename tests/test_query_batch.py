@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from fakes import CountingLLM, FakeEmbeddings
+from workflow.agents.embedder import EmbeddingAgent
+from workflow.agents.local_index import LocalIndex
+from workflow.agents.query import QueryAgent
+from workflow.agents.summarizer import SummarizerAgent
+from workflow.cache import SemanticCache
+from workflow.graph import create_graph
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def aembed_query(self, text):
+        self.calls.append(1)
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts):
+        self.calls.append(len(texts))
+        return self.embed_documents(texts)
+
+
+def _app(monkeypatch, cache=None):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    embeddings = CountingEmbeddings()
+    embedder = EmbeddingAgent(backend=LocalIndex(), embeddings=embeddings)
+    embedder.add(["reset the router by holding the button", "refunds take five days", "update the firmware"])
+    llm = CountingLLM()
+    agent = QueryAgent(embedder, llm=llm)
+    monkeypatch.setattr(app_module, "embedder", embedder)
+    monkeypatch.setattr(app_module, "query_agent", agent)
+    monkeypatch.setattr(app_module, "workflow", create_graph(agent, SummarizerAgent(llm=llm)))
+    monkeypatch.setattr(app_module, "cache", cache)
+    embeddings.calls.clear()
+    return TestClient(app_module.app), embeddings, llm
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_local_index_search_many_matches_search():
+    rng = np.random.default_rng(0)
+    index = LocalIndex(block_rows=7)
+    index.add([str(i) for i in range(50)], rng.normal(size=(50, 8)).tolist())
+    queries = rng.normal(size=(5, 8)).tolist()
+    many = index.search_many(queries, k=4)
+    for query, results in zip(queries, many):
+        single = index.search(query, k=4)
+        assert [d.page_content for d, _ in results] == [d.page_content for d, _ in single]
+        assert np.allclose([s for _, s in results], [s for _, s in single], atol=1e-4)
+
+
+def test_batch_embeds_once_and_streams_every_answer(monkeypatch):
+    client, embeddings, llm = _app(monkeypatch)
+    questions = ["how do I reset the router", "when do refunds arrive", "firmware update steps"]
+    response = client.post("/query/batch", json={"questions": questions})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = _lines(response)
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    by_index = {line["index"]: line for line in lines}
+    single = client.get("/query", params={"question": questions[1]}).json()
+    assert {k: by_index[1][k] for k in single} == single
+    # one batched embedding call for the three questions, then one for /query
+    assert embeddings.calls == [3, 1]
+
+
+def test_batch_reuses_and_fills_the_cache(monkeypatch):
+    cache = SemanticCache(FakeEmbeddings(), threshold=0.99)
+    client, embeddings, llm = _app(monkeypatch, cache)
+    client.post("/query/batch", json={"questions": ["reset the router"]})
+    calls = llm.calls
+    lines = _lines(client.post("/query/batch", json={"questions": ["reset the router", "do refunds take five days"]}))
+    assert len(lines) == 2
+    assert llm.calls == calls + 2  # only the new question reached the models
+    assert cache.stats()["hits"] == 1
+
+
+def test_batch_size_is_limited(monkeypatch):
+    from workflow import app as app_module
+
+    client, _, _ = _app(monkeypatch)
+    monkeypatch.setattr(app_module, "batch_limit", 2)
+    assert client.post("/query/batch", json={"questions": ["a", "b", "c"]}).status_code == 413
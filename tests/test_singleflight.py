@@ -0,0 +1,117 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from fakes import CountingLLM, DummyEmbedder
+from workflow.agents.query import QueryAgent
+from workflow.agents.summarizer import SummarizerAgent
+from workflow.graph import create_graph
+from workflow.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"value": 42}
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        later = await flight.do("k", work)
+        return flight, results, later
+
+    flight, results, later = asyncio.run(run())
+    assert results == [{"value": 42}] * 5
+    assert later == {"value": 42} and len(calls) == 2
+    assert (flight.executed, flight.shared, len(flight)) == (2, 4, 0)
+
+
+def test_errors_reach_every_waiter():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def run():
+        flight = SingleFlight()
+        finished = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            finished.set()
+            return "done"
+
+        leader = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await follower == "done"
+
+        # With nobody left waiting the shared call is cancelled too.
+        alone = asyncio.ensure_future(flight.do("other", work))
+        await asyncio.sleep(0.01)
+        finished.clear()
+        alone.cancel()
+        await asyncio.sleep(0.08)
+        return finished.is_set(), len(flight)
+
+    finished, pending = asyncio.run(run())
+    assert not finished and pending == 0
+
+
+def test_caller_arriving_during_a_cancellation_starts_a_fresh_call():
+    async def run():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        await asyncio.sleep(0)
+        second = await flight.do("k", work)
+        return second, flight.executed, len(flight)
+
+    assert asyncio.run(run()) == ("done", 2, 0)
+
+
+def test_query_endpoint_coalesces_identical_questions(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    llm = CountingLLM(delay=0.1)
+    agent = QueryAgent(DummyEmbedder(), llm=llm)
+    monkeypatch.setattr(app_module, "workflow", create_graph(agent, SummarizerAgent(llm=llm)))
+    monkeypatch.setattr(app_module, "cache", None)
+    monkeypatch.setattr(app_module, "embedder", DummyEmbedder())
+    monkeypatch.setattr(app_module, "ingestion", None)
+    app_module.startup()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            questions = ["Where is the manual?"] * 5 + ["where is  the MANUAL?", "something else"]
+            return await asyncio.gather(*(client.get("/query", params={"question": q}) for q in questions))
+
+    responses = asyncio.run(run())
+    bodies = [r.json() for r in responses]
+    assert all(body == bodies[0] for body in bodies[:6])
+    assert llm.calls == 4  # answer and summary for two distinct questions
@@ -0,0 +1,116 @@
+import os
+import uuid
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from fakes import FakeEmbeddings
+from workflow.agents.embedder import ChromaBackend, EmbeddingAgent
+from workflow.agents.local_index import LocalIndex
+from workflow.snapshot import Snapshot, export_snapshot, import_snapshot
+
+
+class NoEmbeddings(FakeEmbeddings):
+    def embed_documents(self, texts):
+        raise AssertionError("documents must not be re-embedded")
+
+
+def _source(backend):
+    embedder = EmbeddingAgent(backend=backend, embeddings=FakeEmbeddings())
+    embedder.upsert("manual", [f"router firmware step {i}" for i in range(50)])
+    embedder.add(["refund policy for invoices"])
+    return embedder
+
+
+def _hits(embedder, query, k=5):
+    return [doc.page_content for doc, _ in embedder.search(query, k)]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_local_index_round_trip_without_embedding(tmp_path, dtype):
+    source = _source(LocalIndex())
+    path = str(tmp_path / "index.snap")
+    info = export_snapshot(source, path, dtype)
+    assert (info["count"], info["dim"], info["dtype"]) == (51, 64, dtype)
+    assert Snapshot(path).vectors.dtype == np.dtype(dtype)
+
+    replica = EmbeddingAgent(backend=LocalIndex(), embeddings=NoEmbeddings())
+    assert import_snapshot(replica, path) == {"count": 51, "documents": 1}
+    assert isinstance(replica.backend._vectors, np.memmap)
+    assert replica.count() == 51
+    for query in ("router firmware step 7", "refund policy"):
+        assert _hits(replica, query) == _hits(source, query)
+
+    # The manifest travels with the vectors, so re-uploads stay incremental.
+    counts = replica.upsert("manual", [f"router firmware step {i}" for i in range(50)])
+    assert counts == {"embedded": 0, "skipped": 50, "deleted": 0}
+
+
+def test_snapshot_moves_between_backends(tmp_path):
+    source = _source(ChromaBackend(f"snapshot-{uuid.uuid4().hex[:8]}"))
+    path = str(tmp_path / "chroma.snap")
+    export_snapshot(source, path)
+
+    local = EmbeddingAgent(backend=LocalIndex(str(tmp_path / "index")), embeddings=NoEmbeddings())
+    import_snapshot(local, path)
+    assert local.count() == 51
+    assert _hits(local, "router firmware step 7", 1) == ["router firmware step 7"]
+
+    export_snapshot(local, path, "float16")
+    chroma = EmbeddingAgent(
+        backend=ChromaBackend(f"snapshot-{uuid.uuid4().hex[:8]}"), embeddings=NoEmbeddings()
+    )
+    import_snapshot(chroma, path)
+    assert chroma.count() == 51
+    assert _hits(chroma, "refund policy", 1) == ["refund policy for invoices"]
+
+
+def test_snapshot_endpoints_and_startup_restore(tmp_path, monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    source = _source(LocalIndex())
+    monkeypatch.setattr(app_module, "embedder", source)
+    monkeypatch.setattr(app_module, "cache", None)
+    client = TestClient(app_module.app)
+    resp = client.get("/snapshot", params={"dtype": "float16"})
+    assert resp.status_code == 200
+    assert client.get("/snapshot", params={"dtype": "int8"}).status_code == 422
+
+    replica = EmbeddingAgent(backend=LocalIndex(), embeddings=NoEmbeddings())
+    monkeypatch.setattr(app_module, "embedder", replica)
+    restored = client.post("/snapshot", files={"file": ("vectors.snap", resp.content)})
+    assert restored.json() == {"status": "restored", "count": 51, "documents": 1}
+    assert client.get("/stats").json()["count"] == 51
+    assert client.post("/snapshot", files={"file": ("bad.snap", b"nonsense")}).status_code == 400
+
+    path = tmp_path / "boot.snap"
+    path.write_bytes(resp.content)
+    monkeypatch.setenv("VECTOR_SNAPSHOT", str(path))
+    fresh = EmbeddingAgent(backend=LocalIndex(), embeddings=NoEmbeddings())
+    app_module._restore_snapshot(fresh)
+    assert _hits(fresh, "router firmware step 7") == _hits(source, "router firmware step 7")
+
+
+def test_command_line_requires_a_persisted_store(tmp_path, monkeypatch, capsys):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    import sys
+    from workflow import snapshot
+
+    path = str(tmp_path / "index.snap")
+    monkeypatch.delenv("VECTOR_BACKEND", raising=False)
+    monkeypatch.setattr(sys, "argv", ["snapshot", "export", path])
+    with pytest.raises(SystemExit):
+        snapshot.main()
+    assert "not persisted" in capsys.readouterr().err
+
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    monkeypatch.setenv("VECTOR_INDEX_PATH", str(tmp_path / "index"))
+    source = EmbeddingAgent(
+        backend=LocalIndex(str(tmp_path / "index" / "collections" / "manuals")), embeddings=FakeEmbeddings()
+    )
+    source.add(["router firmware step 1", "refund policy for invoices"])
+    monkeypatch.setattr(sys, "argv", ["snapshot", "export", path, "--collection", "manuals"])
+    snapshot.main()
+    assert Snapshot(path).count == 2
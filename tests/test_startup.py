@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("langchain", "langchain_core", "langchain_openai", "langgraph", "chromadb", "openai", "numpy")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def _import(module, cwd=ROOT):
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+        cwd=cwd, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "module, cwd",
+    [("workflow.app", ROOT), ("perplexity", ROOT), ("perplexity.app", ROOT), ("app", os.path.join(ROOT, "src"))],
+)
+def test_importing_the_apps_is_cheap(module, cwd):
+    # No API key is needed and no model, vector store or graph library is
+    # loaded until the application starts.
+    report = _import(module, cwd)
+    assert report["heavy"] == []
+    assert report["seconds"] < 3
+
+
+def test_readiness_follows_the_lifespan(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from fakes import CountingLLM, DummyEmbedder
+    from workflow import app as app_module
+    from workflow.agents.query import QueryAgent
+    from workflow.agents.summarizer import SummarizerAgent
+    from workflow.graph import create_graph
+
+    llm = CountingLLM()
+    agent = QueryAgent(DummyEmbedder(), llm=llm)
+    for name, value in [
+        ("embedder", DummyEmbedder()),
+        ("query_agent", agent),
+        ("summarizer", None),
+        ("workflow", create_graph(agent, SummarizerAgent(llm=llm))),
+        ("cache", None),
+        ("ingestion", None),
+        ("ready", False),
+    ]:
+        monkeypatch.setattr(app_module, name, value)
+
+    client = TestClient(app_module.app)
+    assert client.get("/healthz").json() == {"status": "ok"}
+    assert client.get("/readyz").status_code == 503
+    with TestClient(app_module.app) as client:
+        deadline = time.time() + 10
+        while client.get("/readyz").status_code != 200:
+            assert time.time() < deadline
+            time.sleep(0.01)
+        assert client.get("/query", params={"question": "q"}).status_code == 200
+    assert app_module.summarizer is not None  # built during startup, provided ones kept
+    assert app_module.query_agent is agent
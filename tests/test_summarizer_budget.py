@@ -0,0 +1,79 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from workflow.agents.budget import fit, pack, truncate
+from workflow.agents.query import QueryAgent
+from workflow.agents.summarizer import SummarizerAgent
+
+from fakes import DummyEmbedder
+
+
+def words(text):
+    return len(text.split())
+
+
+class RecordingLLM:
+    """Replies with a three-word summary and records every prompt."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        time.sleep(self.delay)
+        return SimpleNamespace(content=f"summary {len(self.prompts)} done")
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(content=f"summary {len(self.prompts)} done")
+
+
+def test_pack_and_fit_respect_the_budget():
+    docs = ["a b c", "d e", "f g h i", "j " * 12]
+    assert pack(docs, 5, words) == [["a b c", "d e"], ["f g h i"], ["j j j j j"]]
+    assert fit(docs, 7, words) == ["a b c", "d e", "f g"]
+    assert truncate("one two three", 2, words) == "one two"
+
+
+def test_small_context_uses_a_single_call():
+    llm = RecordingLLM()
+    agent = SummarizerAgent(llm=llm, context_tokens=100, count_tokens=words)
+    assert agent.run(["alpha beta", "gamma"]) == "summary 1 done"
+    assert llm.prompts == ["Summarize:\nalpha beta\ngamma"]
+
+
+def test_large_context_is_mapped_concurrently_then_reduced():
+    docs = [("word " * 40).strip() for _ in range(8)]
+    llm = RecordingLLM(delay=0.1)
+    agent = SummarizerAgent(llm=llm, context_tokens=100, max_concurrency=4, count_tokens=words)
+
+    start = time.perf_counter()
+    result = asyncio.run(agent.arun(docs))
+    took = time.perf_counter() - start
+
+    map_prompts, reduce_prompt = llm.prompts[:-1], llm.prompts[-1]
+    assert len(map_prompts) == 4
+    assert all(words(p) <= 101 for p in llm.prompts)
+    assert reduce_prompt.startswith("Combine these partial summaries")
+    assert result == "summary 5 done"
+    assert took < 0.35  # four map calls in parallel plus one reduce
+
+
+def test_reduction_is_hierarchical_when_summaries_do_not_fit():
+    docs = [("word " * 9).strip() for _ in range(12)]
+    llm = RecordingLLM()
+    agent = SummarizerAgent(llm=llm, context_tokens=10, count_tokens=words)
+    agent.run(docs)
+    # 12 single-doc groups, 4 groups of three summaries, 2 groups, then reduce
+    assert len(llm.prompts) == 12 + 4 + 2 + 1
+    assert all(words(p.split("\n", 1)[1]) <= 10 for p in llm.prompts)
+
+
+def test_query_agent_packs_context_by_rank():
+    llm = RecordingLLM()
+    agent = QueryAgent(DummyEmbedder(), llm=llm, context_tokens=4, count_tokens=words)
+    agent.answer("q", ["one two three", "four five", "six"])
+    assert llm.prompts == ["Question: q\nContext:\none two three\nfour"]
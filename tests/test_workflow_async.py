@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from fakes import CountingLLM, DummyEmbedder, SlowLLM
+from workflow.agents.query import QueryAgent
+from workflow.agents.summarizer import SummarizerAgent
+from workflow.graph import create_graph
+
+
+def _workflow(delay=0.0, distance=0.1):
+    llm = SlowLLM(delay)
+    query_agent = QueryAgent(DummyEmbedder(distance), llm=llm)
+    summarizer = SummarizerAgent(llm=llm)
+    return create_graph(query_agent, summarizer)
+
+
+def test_ainvoke_matches_invoke():
+    workflow = _workflow()
+    sync_result = workflow.invoke({"question": "q"})
+    async_result = asyncio.run(workflow.ainvoke({"question": "q"}))
+    assert sync_result == async_result
+    assert async_result["answer"] == "reply to Question: q"
+    assert async_result["summary"] == "reply to Summarize:"
+    assert async_result["needs_human"] is False
+
+
+def test_ainvoke_escalates_low_confidence():
+    workflow = _workflow(distance=0.9)
+    result = asyncio.run(workflow.ainvoke({"question": "q"}))
+    assert result["needs_human"] is True
+    assert "summary" not in result
+    assert result["answer"] == "Further review required for question: q"
+
+
+def test_concurrent_queries_overlap():
+    delay = 0.2
+    workflow = _workflow(delay=delay)
+
+    async def run_many(n):
+        start = time.perf_counter()
+        await asyncio.gather(*(workflow.ainvoke({"question": str(i)}) for i in range(n)))
+        return time.perf_counter() - start
+
+    single = asyncio.run(run_many(1))
+    many = asyncio.run(run_many(50))
+    # Fifty serial queries would take 50x as long; concurrent ones share the wait.
+    assert single >= delay
+    assert many < single * 3
+
+
+def test_answer_and_summary_run_concurrently():
+    delay = 0.3
+    workflow = _workflow(delay=delay)
+
+    start = time.perf_counter()
+    asyncio.run(workflow.ainvoke({"question": "q"}))
+    async_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    workflow.invoke({"question": "q"})
+    sync_elapsed = time.perf_counter() - start
+
+    # Serial execution of the two model calls would take at least 2 * delay.
+    assert async_elapsed < 1.6 * delay
+    assert sync_elapsed < 1.6 * delay
+
+
+def test_escalation_skips_model_calls():
+    llm = CountingLLM()
+    workflow = create_graph(QueryAgent(DummyEmbedder(0.9), llm=llm), SummarizerAgent(llm=llm))
+    asyncio.run(workflow.ainvoke({"question": "q"}))
+    workflow.invoke({"question": "q"})
+    assert llm.calls == 0
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from fakes import DummyEmbedder
+from workflow.agents.query import QueryAgent
+from workflow.agents.summarizer import SummarizerAgent
+from workflow.graph import astream_query, create_graph
+
+
+def _workflow(distance=0.1):
+    query_agent = QueryAgent(
+        DummyEmbedder(distance),
+        llm=GenericFakeChatModel(messages=iter([AIMessage("alpha beta")])),
+    )
+    summarizer = SummarizerAgent(
+        llm=GenericFakeChatModel(messages=iter([AIMessage("short gist")]))
+    )
+    return create_graph(query_agent, summarizer)
+
+
+def _collect(workflow, question="q"):
+    async def run():
+        return [event async for event in astream_query(workflow, question)]
+
+    return asyncio.run(run())
+
+
+def test_stream_yields_tokens_before_node_completion():
+    events = _collect(_workflow())
+    kinds = [e for e, _ in events]
+    first_token = kinds.index("token")
+    answer_done = next(i for i, (e, d) in enumerate(events) if e == "node" and d["node"] == "answer")
+    assert first_token < answer_done
+
+    answer = "".join(d["content"] for e, d in events if e == "token" and d["node"] == "answer")
+    summary = "".join(d["content"] for e, d in events if e == "token" and d["node"] == "summarize")
+    assert answer == "alpha beta"
+    assert summary == "short gist"
+    assert events[0] == ("node", {"node": "retrieve", "needs_human": False, "docs": 1})
+    assert events[answer_done][1] == {"node": "answer", "answer": "alpha beta"}
+    assert events[-1] == ("done", {"answer": "alpha beta", "summary": "short gist", "needs_human": False})
+
+
+def test_stream_reports_escalation():
+    events = _collect(_workflow(distance=0.9))
+    nodes = [d["node"] for e, d in events if e == "node"]
+    assert nodes == ["retrieve", "human"]
+    assert events[-1][1]["needs_human"] is True
+    assert events[-1][1]["answer"] == "Further review required for question: q"
+
+
+def test_stream_endpoint_emits_sse(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    from workflow import app as app_module
+
+    monkeypatch.setattr(app_module, "workflow", _workflow())
+    client = TestClient(app_module.app)
+    with client.stream("GET", "/query/stream", params={"question": "q"}) as resp:
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        body = "".join(resp.iter_text())
+
+    blocks = [b for b in body.split("\n\n") if b]
+    parsed = []
+    for block in blocks:
+        event_line, data_line = block.split("\n")
+        parsed.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    assert parsed[0] == ("node", {"node": "retrieve", "needs_human": False, "docs": 1})
+    assert "token" in [event for event, _ in parsed]
+    assert parsed[-1] == ("done", {"answer": "alpha beta", "summary": "short gist", "needs_human": False})
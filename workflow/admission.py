@@ -0,0 +1,213 @@
+"""Admission control for the HTTP endpoints.
+
+Requests are grouped into lanes, e.g. interactive queries and bulk
+uploads. Each lane runs at most ``limit`` requests at once and all lanes
+share a global ``capacity``, which models the model and embedding quotas
+they compete for. Requests beyond that wait in a bounded queue ordered by
+lane priority, so a query overtakes uploads queued before it. A request
+is turned away at once when its lane's queue is full and after
+``timeout`` seconds in the queue, with an estimate of when to retry.
+"""
+import asyncio
+import bisect
+from contextlib import asynccontextmanager
+import itertools
+import math
+import time
+from typing import Dict, List, Optional
+
+
+class Rejected(Exception):
+    """A request was not admitted.
+
+    Attributes
+    ----------
+    status_code: int
+        ``429`` when the queue was full, ``503`` when waiting timed out.
+    retry_after: int
+        Seconds after which a retry is likely to be admitted.
+    """
+
+    def __init__(self, status_code: int, retry_after: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class Lane:
+    """Limits and counters of one class of requests."""
+
+    def __init__(
+        self,
+        name: str,
+        priority: int = 0,
+        limit: int = 8,
+        queue: int = 32,
+        timeout: float = 10.0,
+    ) -> None:
+        """Configure the lane.
+
+        Parameters
+        ----------
+        name: str
+            Identifier used by :meth:`AdmissionController.admit`.
+        priority: int
+            Lower values are admitted first when slots free up.
+        limit: int
+            Requests of this lane running at once.
+        queue: int
+            Requests of this lane allowed to wait for a slot.
+        timeout: float
+            Seconds a request may wait before it is rejected.
+        """
+        self.name = name
+        self.priority = priority
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.service_time: Optional[float] = None
+
+    def stats(self) -> dict:
+        """Serialise the lane's state for ``/stats``."""
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "limit": self.limit,
+            "queue": self.queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_seconds_avg": self.wait_total / self.admitted if self.admitted else 0.0,
+            "wait_seconds_max": self.wait_max,
+        }
+
+
+class AdmissionController:
+    """Admit requests into lanes sharing a global number of slots."""
+
+    def __init__(self, lanes: List[Lane], capacity: Optional[int] = None) -> None:
+        """Set up the lanes.
+
+        Parameters
+        ----------
+        lanes: List[Lane]
+            Request classes served.
+        capacity: int, optional
+            Requests running at once over all lanes; the sum of the lane
+            limits when omitted.
+        """
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes}
+        self.capacity = capacity if capacity is not None else sum(lane.limit for lane in lanes)
+        self.active = 0
+        self._waiters: List[tuple] = []
+        self._order = itertools.count()
+
+    async def acquire(self, name: str) -> float:
+        """Wait for a slot in lane ``name``.
+
+        Returns
+        -------
+        float
+            Seconds spent waiting.
+
+        Raises
+        ------
+        Rejected
+            When the lane's queue is full or the wait timed out.
+        """
+        lane = self.lanes[name]
+        if lane.waiting >= lane.queue and not self._can_run(lane):
+            lane.rejected += 1
+            raise Rejected(429, self._retry_after(lane), f"Too many pending {name} requests")
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        entry = (lane.priority, next(self._order), lane, future)
+        bisect.insort(self._waiters, entry, key=lambda item: item[:2])
+        lane.waiting += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), lane.timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._forget(entry)
+                lane.timed_out += 1
+                raise Rejected(503, self._retry_after(lane), f"Timed out waiting for a {name} slot")
+        except asyncio.CancelledError:
+            if future.done():
+                self.release(name)
+            else:
+                self._forget(entry)
+            raise
+        waited = time.monotonic() - start
+        lane.admitted += 1
+        lane.wait_total += waited
+        lane.wait_max = max(lane.wait_max, waited)
+        return waited
+
+    def release(self, name: str, held: Optional[float] = None) -> None:
+        """Free a slot of lane ``name`` and admit the next waiter.
+
+        Parameters
+        ----------
+        name: str
+            Lane the slot was acquired in.
+        held: float, optional
+            Seconds the slot was held, used to estimate retry delays.
+        """
+        lane = self.lanes[name]
+        lane.active -= 1
+        self.active -= 1
+        if held is not None:
+            previous = lane.service_time
+            lane.service_time = held if previous is None else 0.8 * previous + 0.2 * held
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, name: str):
+        """Hold a slot of lane ``name`` for the duration of the block."""
+        await self.acquire(name)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(name, time.monotonic() - start)
+
+    def stats(self) -> dict:
+        """Return the queue depth, waits and counters of every lane."""
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
+
+    def _can_run(self, lane: Lane) -> bool:
+        return self.active < self.capacity and lane.active < lane.limit
+
+    def _dispatch(self) -> None:
+        index = 0
+        while index < len(self._waiters) and self.active < self.capacity:
+            _, _, lane, future = entry = self._waiters[index]
+            if lane.active >= lane.limit:
+                index += 1
+                continue
+            self._forget(entry)
+            lane.active += 1
+            self.active += 1
+            future.set_result(None)
+
+    def _forget(self, entry: tuple) -> None:
+        self._waiters.remove(entry)
+        entry[2].waiting -= 1
+
+    def _retry_after(self, lane: Lane) -> int:
+        # Time for the requests ahead to drain through the lane's slots.
+        service = lane.service_time if lane.service_time is not None else 1.0
+        return max(1, math.ceil((lane.waiting + 1) * service / max(1, lane.limit)))
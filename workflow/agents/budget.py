@@ -0,0 +1,139 @@
+"""Token counting and budgeted packing of context documents.
+
+Prompts built from retrieved documents grow with ``k`` and chunk size.
+These helpers measure documents in model tokens and pack them into
+groups that each fit a budget, so callers can bound the size of every
+model call.
+"""
+import functools
+from typing import Callable, List
+
+TokenCounter = Callable[[str], int]
+
+
+def _approximate(text: str) -> int:
+    # Roughly four characters per token for English text.
+    return (len(text) + 3) // 4
+
+
+@functools.lru_cache(maxsize=None)
+def token_counter(model: str = "gpt-3.5-turbo") -> TokenCounter:
+    """Return a function counting the tokens of a text for ``model``.
+
+    Parameters
+    ----------
+    model: str
+        Identifier for the chat model.
+
+    Returns
+    -------
+    Callable[[str], int]
+        Exact ``tiktoken`` count when the encoding is available, otherwise
+        an approximation from the text length.
+    """
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:  # tiktoken missing or its encoding cannot be loaded offline
+        return _approximate
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate(text: str, budget: int, count: TokenCounter) -> str:
+    """Cut ``text`` to the longest prefix of at most ``budget`` tokens.
+
+    Parameters
+    ----------
+    text: str
+        Text to shorten.
+    budget: int
+        Maximum number of tokens to keep.
+    count: Callable[[str], int]
+        Token counter.
+
+    Returns
+    -------
+    str
+        ``text`` itself when it already fits.
+    """
+    if count(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low].rstrip()
+
+
+def pack(docs: List[str], budget: int, count: TokenCounter) -> List[List[str]]:
+    """Group consecutive documents so that each group fits ``budget`` tokens.
+
+    Parameters
+    ----------
+    docs: List[str]
+        Documents in priority order.
+    budget: int
+        Maximum tokens per group.
+    count: Callable[[str], int]
+        Token counter.
+
+    Returns
+    -------
+    List[List[str]]
+        Groups in document order; a document larger than the budget is
+        truncated and placed in a group of its own.
+    """
+    groups: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for doc in docs:
+        size = count(doc)
+        if size > budget:
+            doc, size = truncate(doc, budget, count), budget
+        if current and used + size > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(doc)
+        used += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def fit(docs: List[str], budget: int, count: TokenCounter) -> List[str]:
+    """Keep the leading documents that fit ``budget`` tokens together.
+
+    Parameters
+    ----------
+    docs: List[str]
+        Documents in priority order.
+    budget: int
+        Maximum total tokens.
+    count: Callable[[str], int]
+        Token counter.
+
+    Returns
+    -------
+    List[str]
+        Documents kept in order; the first one that overflows is truncated
+        to the remaining budget and the rest are dropped.
+    """
+    kept: List[str] = []
+    left = budget
+    for doc in docs:
+        size = count(doc)
+        if size > left:
+            doc = truncate(doc, left, count)
+            if doc:
+                kept.append(doc)
+            break
+        kept.append(doc)
+        left -= size
+    return kept
@@ -1,40 +1,359 @@
-"""Embedder backed by a Chroma vector store.
+"""Embedder backed by a pluggable vector store.
 
 This agent converts text fragments into vector representations and
 persists them so that future queries can be answered through similarity
-search.
+search. Storage is delegated to a backend: a Chroma collection by
+default, or the in-process :class:`~workflow.agents.local_index.LocalIndex`.
+
+Documents added under an id are stored by content: each chunk is keyed
+by the hash of its text, so unchanged chunks are never embedded twice
+and re-uploading a document only pays for what changed.
 """
-from typing import List
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+import uuid
+from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain.vectorstores import Chroma
+from ..metrics import metrics
+
+
+def chunk_id(text: str) -> str:
+    """Return the content address of a chunk of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChromaBackend:
+    """Vector storage in a Chroma collection.
+
+    Backends store precomputed vectors and expose ``add``, ``delete``,
+    ``search``, ``clear`` and ``count``; ``search`` returns
+    ``(Document, distance)`` pairs ordered from closest to farthest.
+    ``dump`` and ``restore`` are only needed for snapshots.
+    """
+
+    def __init__(self, collection: str = "documents") -> None:
+        """Open the collection.
+
+        Parameters
+        ----------
+        collection: str
+            Name of the vector collection.
+        """
+        self.collection = collection
+        self.store = Chroma(collection_name=collection)
+
+    def add(
+        self, texts: List[str], vectors: List[List[float]], ids: Optional[List[str]] = None
+    ) -> None:
+        """Store text fragments together with their embeddings.
+
+        Parameters
+        ----------
+        texts: List[str]
+            Content produced by the loader.
+        vectors: List[List[float]]
+            Embedding of each fragment.
+        ids: List[str], optional
+            Identifier of each fragment; fragments whose id is already
+            stored are overwritten. Random ids are used when omitted.
+        """
+        if texts:
+            ids = ids or [uuid.uuid4().hex for _ in texts]
+            self.store._collection.upsert(ids=ids, embeddings=vectors, documents=texts)
+
+    def delete(self, ids: List[str]) -> None:
+        """Remove the fragments with the given ids."""
+        if ids:
+            self.store._collection.delete(ids=ids)
+
+    def search(self, vector: List[float], k: int = 4):
+        """Return the ``k`` stored fragments closest to ``vector``.
+
+        Parameters
+        ----------
+        vector: List[float]
+            Query embedding.
+        k: int
+            Number of results to return.
+
+        Returns
+        -------
+        list
+            Matched documents paired with distances.
+        """
+        return self.store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+
+    def search_many(self, vectors: List[List[float]], k: int = 4):
+        """Return the ``k`` closest fragments for each of several queries.
+
+        Parameters
+        ----------
+        vectors: List[List[float]]
+            Query embeddings.
+        k: int
+            Number of results per query.
+
+        Returns
+        -------
+        list
+            One list of ``(Document, distance)`` pairs per query.
+        """
+        if not vectors:
+            return []
+        found = self.store._collection.query(
+            query_embeddings=vectors, n_results=k, include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(page_content=text, metadata=meta or {}), distance)
+                for text, meta, distance in zip(texts, metas, distances)
+            ]
+            for texts, metas, distances in zip(
+                found["documents"], found["metadatas"], found["distances"]
+            )
+        ]
+
+    def dump(self, batch_size: int = 4096):
+        """Yield the stored fragments in batches.
+
+        Parameters
+        ----------
+        batch_size: int
+            Fragments per batch.
+
+        Yields
+        ------
+        tuple
+            ``(ids, texts, metadatas, vectors)`` of one batch.
+        """
+        for offset in range(0, self.count(), batch_size):
+            found = self.store._collection.get(
+                include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset
+            )
+            yield found["ids"], found["documents"], [m or {} for m in found["metadatas"]], found["embeddings"]
+
+    def restore(self, ids, texts, metadatas, vectors, batch_size: int = 4096) -> None:
+        """Store fragments with precomputed vectors, e.g. from a snapshot.
+
+        Parameters
+        ----------
+        ids: List[Optional[str]]
+            Identifier of each fragment; random ids replace missing ones.
+        texts: List[str]
+            Content of each fragment.
+        metadatas: List[dict]
+            Metadata of each fragment.
+        vectors: array
+            Matrix with one embedding per row.
+        batch_size: int
+            Fragments written per call to Chroma.
+        """
+        for s in range(0, len(texts), batch_size):
+            e = min(s + batch_size, len(texts))
+            metas = [m or None for m in metadatas[s:e]]
+            self.store._collection.upsert(
+                ids=[i or uuid.uuid4().hex for i in ids[s:e]],
+                embeddings=vectors[s:e].astype("float32"),
+                documents=texts[s:e],
+                metadatas=metas if any(metas) else None,
+            )
+
+    def clear(self) -> None:
+        """Remove all stored vectors."""
+        self.store.delete_collection()
+        self.store = Chroma(collection_name=self.collection)
+
+    def count(self) -> int:
+        """Return the number of stored vectors."""
+        return self.store._collection.count()
+
 
 class EmbeddingAgent:
     """Persist and retrieve vector embeddings."""
 
-    def __init__(self, collection: str = "documents") -> None:
+    def __init__(
+        self,
+        collection: str = "documents",
+        backend: Optional[object] = None,
+        embeddings: Optional[object] = None,
+        manifest_path: Optional[str] = None,
+    ) -> None:
         """Initialise the embedding model and storage backend.
 
         Parameters
         ----------
         collection: str
             Name of the vector collection.
+        backend: object, optional
+            Vector store implementing ``add``, ``delete``, ``search``,
+            ``clear`` and ``count``; a :class:`ChromaBackend` is created
+            when omitted.
+        embeddings: object, optional
+            Embedding model; ``OpenAIEmbeddings`` is used when omitted.
+        manifest_path: str, optional
+            JSON file recording the chunks of every document added with
+            :meth:`upsert`; kept in memory when omitted.
         """
 
         self.collection = collection
 
-        self.embeddings = OpenAIEmbeddings()
-        self.store = Chroma(collection_name=collection, embedding_function=self.embeddings)
+        self.embeddings = embeddings if embeddings is not None else OpenAIEmbeddings()
+        self.backend = backend if backend is not None else ChromaBackend(collection)
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._documents: Dict[str, List[str]] = {}
+        self._refs: Dict[str, int] = {}
+        if manifest_path is not None and os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as handle:
+                self._index_documents(json.load(handle))
 
-    def add(self, texts: List[str]) -> None:
+    @metrics.timed("embedder.add")
+    def add(self, texts: List[str], ids: Optional[List[str]] = None) -> None:
         """Add a batch of text fragments to the store.
 
         Parameters
         ----------
         texts: List[str]
             Content produced by the loader.
+        ids: List[str], optional
+            Identifier of each fragment, e.g. from :func:`chunk_id`.
+        """
+        self.backend.add(texts, self.embeddings.embed_documents(texts), ids)
+
+    @metrics.timed("embedder.add")
+    async def aadd(self, texts: List[str], ids: Optional[List[str]] = None) -> None:
+        """Asynchronously add a batch of text fragments to the store.
+
+        Parameters
+        ----------
+        texts: List[str]
+            Content produced by the loader.
+        ids: List[str], optional
+            Identifier of each fragment, e.g. from :func:`chunk_id`.
+        """
+        vectors = await self.embeddings.aembed_documents(texts)
+        await asyncio.to_thread(self.backend.add, texts, vectors, ids)
+
+    def known(self, ids: Iterable[str]) -> Set[str]:
+        """Return the chunk ids already stored for some document."""
+        with self._lock:
+            return {i for i in ids if i in self._refs}
+
+    def replace_document(self, document_id: str, ids: List[str]) -> int:
+        """Record the chunks making up a document and drop orphaned ones.
+
+        Every chunk in ``ids`` must already be stored. Chunks of the
+        previous version that no document references any more are deleted
+        from the backend.
+
+        Parameters
+        ----------
+        document_id: str
+            Key of the document.
+        ids: List[str]
+            Content addresses of the document's chunks.
+
+        Returns
+        -------
+        int
+            Number of chunks deleted.
+        """
+        ids = list(dict.fromkeys(ids))
+        with self._lock:
+            old = self._documents.get(document_id, [])
+            for i in ids:
+                self._refs[i] = self._refs.get(i, 0) + 1
+            orphans = []
+            for i in old:
+                self._refs[i] -= 1
+                if not self._refs[i]:
+                    del self._refs[i]
+                    orphans.append(i)
+            self._documents[document_id] = ids
+            self.backend.delete(orphans)
+            self._save_manifest()
+        return len(orphans)
+
+    def discard(self, ids: Iterable[str]) -> int:
+        """Delete stored chunks that no document references.
+
+        Used to drop the chunks of an upload that failed before its
+        document was recorded.
+
+        Parameters
+        ----------
+        ids: Iterable[str]
+            Content addresses of candidate chunks.
+
+        Returns
+        -------
+        int
+            Number of chunks deleted.
+        """
+        with self._lock:
+            orphans = [i for i in dict.fromkeys(ids) if i not in self._refs]
+            if orphans:
+                self.backend.delete(orphans)
+        return len(orphans)
+
+    @metrics.timed("embedder.upsert")
+    def upsert(self, document_id: str, texts: List[str]) -> Dict[str, int]:
+        """Add or replace a document, embedding only new chunks.
+
+        Parameters
+        ----------
+        document_id: str
+            Key of the document; a previous version is replaced.
+        texts: List[str]
+            Chunks of the document in order.
+
+        Returns
+        -------
+        Dict[str, int]
+            Number of chunks ``embedded``, ``skipped`` because an identical
+            chunk was already stored, and ``deleted`` from the old version.
         """
-        self.store.add_texts(texts)
+        ids = [chunk_id(text) for text in texts]
+        fresh = dict(zip(ids, texts))
+        for i in self.known(ids):
+            del fresh[i]
+        if fresh:
+            self.add(list(fresh.values()), list(fresh))
+        deleted = self.replace_document(document_id, ids)
+        return {"embedded": len(fresh), "skipped": len(texts) - len(fresh), "deleted": deleted}
 
+    def documents(self) -> Dict[str, List[str]]:
+        """Return the chunk ids of every document added with an id."""
+        with self._lock:
+            return {key: list(ids) for key, ids in self._documents.items()}
+
+    def load_documents(self, documents: Dict[str, List[str]]) -> None:
+        """Replace the document manifest, e.g. with one from a snapshot."""
+        with self._lock:
+            self._index_documents(documents)
+            self._save_manifest()
+
+    def _index_documents(self, documents: Dict[str, List[str]]) -> None:
+        self._documents = {key: list(ids) for key, ids in documents.items()}
+        self._refs = {}
+        for ids in self._documents.values():
+            for i in ids:
+                self._refs[i] = self._refs.get(i, 0) + 1
+
+    def _save_manifest(self) -> None:
+        if self.manifest_path is None:
+            return
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as handle:
+            json.dump(self._documents, handle)
+        os.replace(tmp, self.manifest_path)
+
+    @metrics.timed("embedder.search")
     def search(self, query: str, k: int = 4):
         """Retrieve documents most relevant to a query.
 
@@ -50,15 +369,70 @@ class EmbeddingAgent:
         list
             Matched documents paired with similarity scores.
         """
-        return self.store.similarity_search_with_score(query, k=k)
- 
+        return self.backend.search(self.embeddings.embed_query(query), k=k)
+
+    @metrics.timed("embedder.search")
+    async def asearch(self, query: str, k: int = 4):
+        """Asynchronously retrieve documents most relevant to a query.
+
+        Parameters
+        ----------
+        query: str
+            Natural language prompt.
+        k: int
+            Number of results to return.
+
+        Returns
+        -------
+        list
+            Matched documents paired with similarity scores.
+        """
+        vector = await self.embeddings.aembed_query(query)
+        return await asyncio.to_thread(self.backend.search, vector, k)
+
+    @metrics.timed("embedder.search_many")
+    def search_many(self, queries: List[str], k: int = 4, vectors: Optional[List[List[float]]] = None):
+        """Retrieve documents for many queries with one embedding call.
+
+        Parameters
+        ----------
+        queries: List[str]
+            Natural language prompts.
+        k: int
+            Number of results per query.
+        vectors: List[List[float]], optional
+            Precomputed query embeddings, e.g. shared with the answer
+            cache; the queries are embedded in one batch when omitted.
+
+        Returns
+        -------
+        list
+            One list of matched documents and scores per query.
+        """
+        if vectors is None:
+            vectors = self.embeddings.embed_documents(queries)
+        return self._search_many(vectors, k)
+
+    @metrics.timed("embedder.search_many")
+    async def asearch_many(self, queries: List[str], k: int = 4, vectors: Optional[List[List[float]]] = None):
+        """Asynchronous counterpart of :meth:`search_many`."""
+        if vectors is None:
+            vectors = await self.embeddings.aembed_documents(queries)
+        return await asyncio.to_thread(self._search_many, vectors, k)
+
+    def _search_many(self, vectors, k: int):
+        if hasattr(self.backend, "search_many"):
+            return self.backend.search_many(vectors, k)
+        return [self.backend.search(vector, k) for vector in vectors]
 
     def clear(self) -> None:
         """Remove all stored vectors."""
-        self.store.delete_collection()
-        self.store = Chroma(collection_name=self.collection, embedding_function=self.embeddings)
+        self.backend.clear()
+        with self._lock:
+            self._documents.clear()
+            self._refs.clear()
+            self._save_manifest()
 
     def count(self) -> int:
         """Return the number of stored vectors."""
-        return self.store._collection.count()
-
+        return self.backend.count()
@@ -1,12 +1,132 @@
 """Utilities for ingesting source documents and producing chunks.
 
-The loader reads raw text from disk using LangChain helpers and splits
-it into manageable pieces ready for embedding or other downstream work.
+The loader reads raw text incrementally and splits it into manageable
+pieces ready for embedding or other downstream work. Text is consumed
+in blocks so arbitrarily large documents are chunked with bounded
+memory.
 """
-from typing import List
-from langchain.document_loaders import TextLoader
+import codecs
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from ..metrics import metrics
 
+BLOCK_SIZE = 1 << 16
+
+
+class _ChunkBuffer:
+    """Accumulate decoded text and release chunks that are final."""
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, encoding: str) -> None:
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            add_start_index=True,
+        )
+        self.chunk_size = chunk_size
+        # Split only once enough text is buffered for the cut at the end
+        # not to influence the chunks that are released.
+        self.window = max(BLOCK_SIZE, 8 * chunk_size)
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.text = ""
+
+    def feed(self, block: bytes) -> List[str]:
+        self.text += self.decoder.decode(block)
+        if len(self.text) < self.window:
+            return []
+        docs = self.splitter.create_documents([self.text])
+        horizon = len(self.text) - 2 * self.chunk_size
+        # Resume from the start of a chunk that opens a paragraph when
+        # possible: the splitter's state resets there, so the remaining
+        # chunks come out exactly as if the document was split whole.
+        cut = None
+        for i, doc in enumerate(docs):
+            start = doc.metadata["start_index"]
+            if start + len(doc.page_content) > horizon:
+                if cut is None:
+                    cut = (i, start)
+                break
+            if i and self.text[start - 2:start] == "\n\n":
+                cut = (i, start - 2)
+        if cut is None or cut[0] == 0:
+            return []
+        index, offset = cut
+        self.text = self.text[offset:]
+        return [doc.page_content for doc in docs[:index]]
+
+    def flush(self) -> List[str]:
+        self.text += self.decoder.decode(b"", final=True)
+        chunks = self.splitter.split_text(self.text)
+        self.text = ""
+        return chunks
+
+
+def iter_chunks(
+    blocks: Iterable[bytes],
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+    encoding: str = "utf-8",
+) -> Iterator[str]:
+    """Split a stream of raw blocks into overlapping segments lazily.
+
+    Parameters
+    ----------
+    blocks: Iterable[bytes]
+        Consecutive pieces of the encoded document.
+    chunk_size: int
+        Target size for each chunk.
+    chunk_overlap: int
+        Number of characters shared between neighbours.
+    encoding: str
+        Text encoding of the document.
+
+    Yields
+    ------
+    str
+        Text fragments in document order.
+    """
+    buffer = _ChunkBuffer(chunk_size, chunk_overlap, encoding)
+    for block in blocks:
+        yield from buffer.feed(block)
+    yield from buffer.flush()
+
+
+async def aiter_chunks(
+    blocks: AsyncIterable[bytes],
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+    encoding: str = "utf-8",
+) -> AsyncIterator[str]:
+    """Asynchronous counterpart of :func:`iter_chunks`."""
+    buffer = _ChunkBuffer(chunk_size, chunk_overlap, encoding)
+    async for block in blocks:
+        for chunk in buffer.feed(block):
+            yield chunk
+    for chunk in buffer.flush():
+        yield chunk
+
+
+def iter_file_chunks(path: str, chunk_size: int = 500, chunk_overlap: int = 50) -> Iterator[str]:
+    """Lazily chunk a text file without reading it into memory at once.
+
+    Parameters
+    ----------
+    path: str
+        Location of the text file on disk.
+    chunk_size: int
+        Target size for each chunk.
+    chunk_overlap: int
+        Number of characters shared between neighbours.
+
+    Yields
+    ------
+    str
+        Text fragments in document order.
+    """
+    with open(path, "rb") as handle:
+        yield from iter_chunks(iter(lambda: handle.read(BLOCK_SIZE), b""), chunk_size, chunk_overlap)
+
+
+@metrics.timed("loader.load_and_chunk")
 def load_and_chunk(path: str, chunk_size: int = 500, chunk_overlap: int = 50) -> List[str]:
     """Load a file and break it into overlapping segments.
 
@@ -24,11 +144,4 @@ def load_and_chunk(path: str, chunk_size: int = 500, chunk_overlap: int = 50) ->
     List[str]
         Collection of text fragments extracted from the document.
     """
-    loader = TextLoader(path)
-    documents = loader.load()
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-    )
-    chunks = splitter.split_documents(documents)
-    return [c.page_content for c in chunks]
+    return list(iter_file_chunks(path, chunk_size, chunk_overlap))
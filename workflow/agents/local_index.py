@@ -0,0 +1,580 @@
+"""In-process vector index backed by NumPy.
+
+Vectors live in one contiguous float32 or float16 matrix which, when a
+directory is given, is a memory-mapped file so indexes larger than RAM
+can be searched and reopened without loading them. Search is exact by
+default; after :meth:`LocalIndex.train` an inverted-file (IVF) layout
+restricts each query to the vectors of its ``nprobe`` closest k-means
+clusters for sub-linear search. Given ``nlist``, the index trains itself
+once it holds enough vectors and retrains whenever they doubled since.
+Deleted rows are tombstoned: their norm is set to infinity so that no
+query ever ranks them. Once tombstones make up ``compact_ratio`` of the
+rows, the live rows are rewritten without them.
+"""
+import json
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Set
+import numpy as np
+from langchain_core.documents import Document
+
+# k-means needs a few dozen points per cluster to place its centroids.
+MIN_ROWS_PER_LIST = 39
+
+
+class LocalIndex:
+    """Flat or IVF nearest-neighbour index over squared L2 distance.
+
+    Distances match Chroma's default ``l2`` space, so results can be used
+    wherever ``similarity_search_with_score`` output is expected.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        dtype: str = "float32",
+        nprobe: int = 8,
+        block_rows: int = 65536,
+        nlist: Optional[int] = None,
+        compact_ratio: Optional[float] = 0.25,
+    ) -> None:
+        """Open an index, loading any data already stored under ``path``.
+
+        Parameters
+        ----------
+        path: str, optional
+            Directory holding the memory-mapped files; the index is kept
+            in memory when omitted.
+        dtype: str
+            Storage precision, ``float32`` or ``float16``.
+        nprobe: int
+            Clusters visited per query once the index is trained.
+        block_rows: int
+            Rows scored per matrix multiplication during a scan.
+        nlist: int, optional
+            Clusters of the IVF layout trained automatically, ``0`` for
+            ``4 * sqrt(count)``; search stays exact when omitted.
+        compact_ratio: float, optional
+            Share of deleted rows that triggers :meth:`compact`; ``None``
+            never compacts automatically.
+        """
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.nprobe = nprobe
+        self.block_rows = block_rows
+        self.nlist = nlist
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        if path is not None:
+            # A crash while compacting may leave the previous files aside.
+            if not os.path.exists(path) and os.path.exists(path + ".old"):
+                os.rename(path + ".old", path)
+            for leftover in (path + ".old", path + ".compact"):
+                if os.path.exists(leftover):
+                    shutil.rmtree(leftover)
+            os.makedirs(path, exist_ok=True)
+        self._load()
+        self._maybe_train()
+
+    # ------------------------------------------------------------------
+    # Backend interface
+
+    def add(
+        self, texts: List[str], vectors: List[List[float]], ids: Optional[List[str]] = None
+    ) -> None:
+        """Append text fragments together with their embeddings.
+
+        Parameters
+        ----------
+        texts: List[str]
+            Content produced by the loader.
+        vectors: List[List[float]]
+            Embedding of each fragment.
+        ids: List[str], optional
+            Identifier of each fragment, or ``None`` for fragments without
+            one; fragments whose id is already stored are skipped.
+        """
+        if not texts:
+            return
+        with self._lock:
+            if ids is not None:
+                keep, seen = [], set()
+                for i, key in enumerate(ids):
+                    if key is None or (key not in self._rows and key not in seen):
+                        seen.add(key)
+                        keep.append(i)
+                texts = [texts[i] for i in keep]
+                vectors = [vectors[i] for i in keep]
+                ids = [ids[i] for i in keep]
+                if not texts:
+                    return
+            batch = np.asarray(vectors, dtype=np.float32)
+            if self.dim is None:
+                self.dim = batch.shape[1]
+            start, end = self._count, self._count + len(texts)
+            self._reserve(end)
+            self._vectors[start:end] = batch.astype(self.dtype)
+            stored = self._vectors[start:end].astype(np.float32)
+            self._norms[start:end] = np.einsum("ij,ij->i", stored, stored)
+            if self._centroids is not None:
+                assign = self._nearest(stored, self._centroids)
+                self._assign[start:end] = assign
+                self._lists = self._extend_lists(self._lists, assign, start)
+            if self.path is not None:
+                with open(self._file("texts.jsonl"), "a", encoding="utf-8") as handle:
+                    handle.writelines(json.dumps(t) + "\n" for t in texts)
+                with open(self._file("ids.jsonl"), "a", encoding="utf-8") as handle:
+                    handle.writelines(json.dumps(key) + "\n" for key in ids or [None] * len(texts))
+                self._vectors.flush()
+                self._assign.flush()
+            self._texts.extend(texts)
+            for row, key in enumerate(ids or [], start=start):
+                if key is not None:
+                    self._rows[key] = row
+            self._count = end
+            self._save_meta()
+            self._maybe_train()
+
+    def delete(self, ids: List[str]) -> None:
+        """Remove the fragments with the given ids.
+
+        Parameters
+        ----------
+        ids: List[str]
+            Identifiers passed to :meth:`add`; unknown ids are ignored.
+        """
+        with self._lock:
+            rows = [self._rows.pop(key) for key in ids if key in self._rows]
+            if not rows:
+                return
+            self._tombstone(rows)
+            if self.path is not None:
+                with open(self._file("deleted.txt"), "a", encoding="utf-8") as handle:
+                    handle.writelines(f"{row}\n" for row in rows)
+            if self.compact_ratio is not None:
+                self.compact(self.compact_ratio)
+
+    def compact(self, ratio: float = 0.0) -> bool:
+        """Rewrite the live rows without the tombstoned ones.
+
+        Tombstones still cost a scan and their storage until they are
+        dropped. A persisted index is rebuilt beside its directory, which
+        is then swapped in. Trained centroids are kept.
+
+        Parameters
+        ----------
+        ratio: float
+            Compact only when more than this share of rows is deleted.
+
+        Returns
+        -------
+        bool
+            Whether the index was rewritten.
+        """
+        with self._lock:
+            if not self._deleted or len(self._deleted) <= ratio * self._count:
+                return False
+            target = None if self.path is None else self.path + ".compact"
+            fresh = LocalIndex(target, self.dtype.name, self.nprobe, self.block_rows, compact_ratio=None)
+            fresh._trained = self._trained
+            if self._centroids is not None:
+                fresh._centroids = self._centroids
+                fresh._lists = [np.empty(0, np.int64)] * len(self._centroids)
+                if target is not None:
+                    np.save(fresh._file("centroids.npy"), self._centroids)
+            for ids, texts, _, vectors in self.dump(self.block_rows):
+                fresh.add(texts, vectors, ids)
+            fresh._save_meta()
+            if self.path is None:
+                for name in (
+                    "dim", "_count", "_capacity", "_vectors", "_norms", "_assign",
+                    "_texts", "_rows", "_deleted", "_centroids", "_lists",
+                ):
+                    setattr(self, name, getattr(fresh, name))
+                return True
+            os.rename(self.path, self.path + ".old")
+            os.rename(target, self.path)
+            shutil.rmtree(self.path + ".old")
+            self._load()
+            return True
+
+    def search(self, vector: List[float], k: int = 4):
+        """Return the ``k`` stored fragments closest to ``vector``.
+
+        Parameters
+        ----------
+        vector: List[float]
+            Query embedding.
+        k: int
+            Number of results to return.
+
+        Returns
+        -------
+        list
+            Matched documents paired with squared L2 distances, closest
+            first.
+        """
+        with self._lock:
+            count, vectors, norms, texts = self._count, self._vectors, self._norms, self._texts
+            centroids, lists = self._centroids, self._lists
+        if count == 0 or k <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        rows = None
+        if centroids is not None and self.nprobe < len(centroids):
+            probe = self._top_k(np.sum(centroids * centroids, axis=1) - 2 * centroids @ query, self.nprobe)
+            rows = np.sort(np.concatenate([lists[c] for c in probe]))
+            rows = rows[rows < count]
+        ids, distances = self._scan(query, vectors, norms, count, k, rows)
+        distances = np.maximum(distances + float(query @ query), 0.0)
+        return [
+            (Document(page_content=texts[i]), float(d))
+            for i, d in zip(ids, distances)
+            if d != np.inf
+        ]
+
+    def search_many(self, vectors: List[List[float]], k: int = 4):
+        """Return the ``k`` closest fragments for each of several queries.
+
+        Exact searches score every block of stored vectors against all
+        queries with a single matrix product; IVF searches probe each
+        query's lists in turn.
+
+        Parameters
+        ----------
+        vectors: List[List[float]]
+            Query embeddings.
+        k: int
+            Number of results per query.
+
+        Returns
+        -------
+        list
+            One result list per query, as returned by :meth:`search`.
+        """
+        with self._lock:
+            count, stored, norms, texts = self._count, self._vectors, self._norms, self._texts
+            centroids = self._centroids
+        if count == 0 or k <= 0 or not len(vectors):
+            return [[] for _ in vectors]
+        if centroids is not None and self.nprobe < len(centroids):
+            return [self.search(v, k) for v in vectors]
+        queries = np.asarray(vectors, dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), np.int64)
+        best = np.empty((len(queries), 0), np.float32)
+        for s in range(0, count, self.block_rows):
+            e = min(s + self.block_rows, count)
+            scores = norms[s:e][None, :] - 2 * (queries @ stored[s:e].astype(np.float32, copy=False).T)
+            ids = np.broadcast_to(np.arange(s, e), scores.shape)
+            candidates = np.concatenate([best, scores], axis=1)
+            candidate_ids = np.concatenate([best_ids, ids], axis=1)
+            if candidates.shape[1] > k:
+                keep = np.argpartition(candidates, k, axis=1)[:, :k]
+                candidates = np.take_along_axis(candidates, keep, axis=1)
+                candidate_ids = np.take_along_axis(candidate_ids, keep, axis=1)
+            best, best_ids = candidates, candidate_ids
+        order = np.argsort(best, axis=1, kind="stable")
+        best = np.take_along_axis(best, order, axis=1)
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+        best = np.maximum(best + np.sum(queries * queries, axis=1)[:, None], 0.0)
+        return [
+            [(Document(page_content=texts[i]), float(d)) for i, d in zip(row_ids, row) if d != np.inf]
+            for row_ids, row in zip(best_ids, best)
+        ]
+
+    def clear(self) -> None:
+        """Remove all stored vectors."""
+        with self._lock:
+            if self.path is not None:
+                names = (
+                    "meta.json", "texts.jsonl", "ids.jsonl", "deleted.txt",
+                    "vectors.bin", "assign.bin", "centroids.npy",
+                )
+                for name in names:
+                    if os.path.exists(self._file(name)):
+                        os.remove(self._file(name))
+            self._load()
+
+    def count(self) -> int:
+        """Return the number of stored vectors."""
+        return self._count - len(self._deleted)
+
+    def dump(self, batch_size: int = 4096):
+        """Yield the live fragments in batches.
+
+        Parameters
+        ----------
+        batch_size: int
+            Fragments per batch.
+
+        Yields
+        ------
+        tuple
+            ``(ids, texts, metadatas, vectors)`` of one batch; ids are
+            ``None`` for fragments added without one.
+        """
+        with self._lock:
+            count, vectors, norms, texts = self._count, self._vectors, self._norms, self._texts
+            names = {row: key for key, row in self._rows.items()}
+        live = np.flatnonzero(norms[:count] != np.inf)
+        for s in range(0, len(live), batch_size):
+            rows = live[s:s + batch_size]
+            yield (
+                [names.get(int(row)) for row in rows],
+                [texts[row] for row in rows],
+                [{} for _ in rows],
+                vectors[rows].astype(np.float32),
+            )
+
+    def restore(self, ids, texts, metadatas, vectors) -> None:
+        """Store fragments with precomputed vectors, e.g. from a snapshot.
+
+        An empty in-memory index adopts ``vectors`` as its storage without
+        copying, so a memory-mapped snapshot is searched in place and
+        pages in on demand; its dtype replaces the configured one.
+
+        Parameters
+        ----------
+        ids: List[Optional[str]]
+            Identifier of each fragment, ``None`` when it has none.
+        texts: List[str]
+            Content of each fragment.
+        metadatas: List[dict]
+            Ignored; the index keeps no metadata.
+        vectors: array
+            Matrix with one embedding per row.
+        """
+        with self._lock:
+            if self.path is None and self._count == 0 and self._centroids is None and len(texts):
+                rows = len(texts)
+                self.dtype = np.dtype(vectors.dtype.name)
+                self.dim = vectors.shape[1]
+                self._vectors = vectors
+                self._assign = np.zeros(rows, np.int32)
+                self._norms = np.empty(rows, np.float32)
+                for s in range(0, rows, self.block_rows):
+                    block = vectors[s:s + self.block_rows].astype(np.float32)
+                    self._norms[s:s + len(block)] = np.einsum("ij,ij->i", block, block)
+                self._texts = list(texts)
+                self._rows = {key: row for row, key in enumerate(ids) if key is not None}
+                self._capacity = self._count = rows
+                return
+        for s in range(0, len(texts), self.block_rows):
+            e = min(s + self.block_rows, len(texts))
+            self.add(texts[s:e], vectors[s:e], ids[s:e])
+
+    # ------------------------------------------------------------------
+    # IVF
+
+    def train(
+        self,
+        nlist: Optional[int] = None,
+        iterations: int = 20,
+        sample: int = 100_000,
+        seed: int = 0,
+    ) -> None:
+        """Cluster the stored vectors and switch to IVF search.
+
+        Parameters
+        ----------
+        nlist: int, optional
+            Number of clusters; defaults to ``4 * sqrt(count)``.
+        iterations: int
+            Rounds of Lloyd's algorithm.
+        sample: int
+            Maximum number of vectors used to fit the centroids.
+        seed: int
+            Seed for sampling and initialisation.
+        """
+        with self._lock:
+            count = self._count
+            live = np.flatnonzero(self._norms[:count] != np.inf)
+            if len(live) == 0:
+                raise ValueError("Cannot train an empty index")
+            nlist = min(len(live), nlist or int(4 * np.sqrt(len(live))) or 1)
+            rng = np.random.default_rng(seed)
+            picked = np.sort(rng.choice(live, min(len(live), sample), replace=False))
+            data = self._vectors[picked].astype(np.float32)
+            centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = self._nearest(data, centroids)
+                sizes = np.bincount(assign, minlength=nlist)
+                order = np.argsort(assign, kind="stable")
+                filled = np.flatnonzero(sizes)
+                starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])[filled]
+                sums = np.add.reduceat(data[order], starts, axis=0)
+                centroids[filled] = sums / sizes[filled, None]
+                empty = np.flatnonzero(sizes == 0)
+                if len(empty):
+                    centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+            assign = np.concatenate([
+                self._nearest(self._vectors[s:min(s + self.block_rows, count)].astype(np.float32), centroids)
+                for s in range(0, count, self.block_rows)
+            ])
+            self._assign[:count] = assign
+            self._centroids = centroids
+            self._lists = self._extend_lists([np.empty(0, np.int64)] * nlist, assign, 0)
+            self._trained = len(live)
+            if self.path is not None:
+                self._assign.flush()
+                np.save(self._file("centroids.npy"), centroids)
+            self._save_meta()
+
+    def _maybe_train(self) -> None:
+        # Retraining whenever the data doubled keeps the total training
+        # cost proportional to the rows added.
+        if self.nlist is None:
+            return
+        live = self.count()
+        nlist = self.nlist or int(4 * np.sqrt(live))
+        if live >= MIN_ROWS_PER_LIST * max(nlist, 1) and live >= 2 * self._trained:
+            self.train(self.nlist or None)
+
+    # ------------------------------------------------------------------
+    # Internals
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        meta = {}
+        if self.path is not None and os.path.exists(self._file("meta.json")):
+            with open(self._file("meta.json"), encoding="utf-8") as handle:
+                meta = json.load(handle)
+            self.dtype = np.dtype(meta["dtype"])
+        self.dim = meta.get("dim")
+        self._count = meta.get("count", 0)
+        self._capacity = 0
+        self._vectors = np.empty((0, self.dim or 0), self.dtype)
+        self._norms = np.empty(0, np.float32)
+        self._assign = np.empty(0, np.int32)
+        self._texts: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._deleted: Set[int] = set()
+        self._centroids = None
+        self._lists = None
+        self._trained = meta.get("trained", 0)
+        if self.path is None:
+            return
+        # Lines are appended before meta.json records the new count, so a
+        # crash in between leaves extra lines that later rows would follow.
+        texts = self._lines("texts.jsonl", self._count)
+        ids = self._lines("ids.jsonl", self._count)
+        if not self._count:
+            return
+        self._reserve(meta["capacity"])
+        self._texts = [json.loads(line) for line in texts]
+        for row, line in enumerate(ids):
+            key = json.loads(line)
+            if key is not None:
+                self._rows[key] = row
+        for s in range(0, self._count, self.block_rows):
+            block = self._vectors[s:min(s + self.block_rows, self._count)].astype(np.float32)
+            self._norms[s:s + len(block)] = np.einsum("ij,ij->i", block, block)
+        if os.path.exists(self._file("deleted.txt")):
+            with open(self._file("deleted.txt"), encoding="utf-8") as handle:
+                rows = [int(line) for line in handle if line.strip()]
+            dead = {row for row in rows if row < self._count}
+            self._rows = {key: row for key, row in self._rows.items() if row not in dead}
+            self._tombstone(sorted(dead))
+        if meta.get("nlist"):
+            self._centroids = np.load(self._file("centroids.npy"))
+            self._lists = self._extend_lists(
+                [np.empty(0, np.int64)] * len(self._centroids), self._assign[: self._count], 0
+            )
+
+    def _lines(self, name: str, count: int) -> List[bytes]:
+        """Read the first ``count`` lines of a file, dropping any after them."""
+        if not os.path.exists(self._file(name)):
+            return []
+        with open(self._file(name), "r+b") as handle:
+            lines = [handle.readline() for _ in range(count)]
+            handle.truncate(handle.tell())
+        return [line for line in lines if line]
+
+    def _tombstone(self, rows: List[int]) -> None:
+        self._deleted.update(rows)
+        self._norms[rows] = np.inf
+
+    def _save_meta(self) -> None:
+        if self.path is None:
+            return
+        meta = {
+            "dim": self.dim,
+            "count": self._count,
+            "capacity": self._capacity,
+            "dtype": self.dtype.name,
+            "nlist": 0 if self._centroids is None else len(self._centroids),
+            "trained": self._trained,
+        }
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as handle:
+            json.dump(meta, handle)
+        os.replace(tmp, self._file("meta.json"))
+
+    def _reserve(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, 2 * self._capacity, 1024)
+        self._vectors = self._grow(self._vectors, "vectors.bin", self.dtype, (capacity, self.dim))
+        self._assign = self._grow(self._assign, "assign.bin", np.dtype(np.int32), (capacity,))
+        norms = np.zeros(capacity, np.float32)
+        norms[: len(self._norms)] = self._norms
+        self._norms = norms
+        self._capacity = capacity
+
+    def _grow(self, array, name: str, dtype, shape):
+        if self.path is None:
+            grown = np.zeros(shape, dtype)
+            if len(array):
+                grown[: len(array)] = array
+            return grown
+        file = self._file(name)
+        size = int(np.prod(shape)) * dtype.itemsize
+        with open(file, "ab") as handle:
+            if handle.tell() < size:
+                handle.truncate(size)
+        return np.memmap(file, dtype=dtype, mode="r+", shape=shape)
+
+    def _scan(self, query, vectors, norms, count, k, rows=None):
+        total = count if rows is None else len(rows)
+        best_ids = np.empty(0, np.int64)
+        best = np.empty(0, np.float32)
+        for s in range(0, total, self.block_rows):
+            if rows is None:
+                ids = np.arange(s, min(s + self.block_rows, total))
+                block = vectors[s:s + len(ids)]
+            else:
+                ids = rows[s:s + self.block_rows]
+                block = vectors[ids]
+            scores = norms[ids] - 2 * (block.astype(np.float32, copy=False) @ query)
+            keep = self._top_k(scores, k)
+            best_ids = np.concatenate([best_ids, ids[keep]])
+            best = np.concatenate([best, scores[keep]])
+            keep = self._top_k(best, k)
+            best_ids, best = best_ids[keep], best[keep]
+        order = np.argsort(best, kind="stable")
+        return best_ids[order], best[order]
+
+    @staticmethod
+    def _top_k(scores, k: int):
+        if len(scores) <= k:
+            return np.arange(len(scores))
+        return np.argpartition(scores, k)[:k]
+
+    def _nearest(self, data, centroids):
+        sq = np.sum(centroids * centroids, axis=1)
+        return np.concatenate([
+            np.argmin(sq - 2 * data[s:s + self.block_rows] @ centroids.T, axis=1)
+            for s in range(0, len(data), self.block_rows)
+        ]).astype(np.int32)
+
+    @staticmethod
+    def _extend_lists(lists, assign, offset: int):
+        order = np.argsort(assign, kind="stable")
+        sizes = np.bincount(assign, minlength=len(lists))
+        groups = np.split(order + offset, np.cumsum(sizes)[:-1])
+        return [
+            np.concatenate([lst, grp]) if len(grp) else lst for lst, grp in zip(lists, groups)
+        ]
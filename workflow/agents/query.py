@@ -4,13 +4,23 @@ It searches the vector store for context and asks a language model to
 craft an answer. A simple threshold determines when a question should be
 escalated for human review.
 """
+from typing import Callable, List, Optional
 from langchain_openai import ChatOpenAI
+from .budget import fit, token_counter
 from .embedder import EmbeddingAgent
+from ..metrics import metrics
 
 class QueryAgent:
     """Combine retrieval with language model reasoning."""
 
-    def __init__(self, embedder: EmbeddingAgent, model: str = "gpt-3.5-turbo") -> None:
+    def __init__(
+        self,
+        embedder: EmbeddingAgent,
+        model: str = "gpt-3.5-turbo",
+        llm: Optional[object] = None,
+        context_tokens: Optional[int] = None,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ) -> None:
         """Configure the agent.
 
         Parameters
@@ -19,10 +29,105 @@ class QueryAgent:
             Vector store interface.
         model: str
             Identifier for the chat model.
+        llm: object, optional
+            Pre-built chat model; a ``ChatOpenAI`` client is created when
+            omitted.
+        context_tokens: int, optional
+            Maximum document tokens placed in the prompt; lower-ranked
+            documents are dropped once the budget is used up.
+        count_tokens: Callable[[str], int], optional
+            Token counter; the model's ``tiktoken`` encoding by default.
         """
         self.embedder = embedder
-        self.llm = ChatOpenAI(model=model)
+        self.model = model
+        self.llm = llm if llm is not None else ChatOpenAI(model=model)
+        self.context_tokens = context_tokens
+        if count_tokens is None and context_tokens is not None:
+            count_tokens = token_counter(model)
+        self.count_tokens = count_tokens
 
+    @metrics.timed("query.retrieve")
+    def retrieve(self, question: str, k: int = 4, threshold: float = 0.5):
+        """Fetch context for a question and decide whether to escalate.
+
+        Parameters
+        ----------
+        question: str
+            User query.
+        k: int
+            Number of documents to retrieve.
+        threshold: float
+            Maximum distance before escalation.
+
+        Returns
+        -------
+        tuple
+            Retrieved documents and escalation flag.
+        """
+        return self._split(self.embedder.search(question, k=k), threshold)
+
+    @metrics.timed("query.retrieve")
+    async def aretrieve(self, question: str, k: int = 4, threshold: float = 0.5):
+        """Asynchronous counterpart of :meth:`retrieve`."""
+        return self._split(await self.embedder.asearch(question, k=k), threshold)
+
+    @metrics.timed("query.retrieve_many")
+    def retrieve_many(self, questions: List[str], k: int = 4, threshold: float = 0.5, vectors=None):
+        """Fetch context for several questions with batched embedding and search.
+
+        Parameters
+        ----------
+        questions: List[str]
+            User queries.
+        k: int
+            Number of documents to retrieve per question.
+        threshold: float
+            Maximum distance before escalation.
+        vectors: list, optional
+            Precomputed question embeddings.
+
+        Returns
+        -------
+        list
+            ``(documents, needs_human)`` per question, as :meth:`retrieve`.
+        """
+        found = self.embedder.search_many(questions, k=k, vectors=vectors)
+        return [self._split(docs_scores, threshold) for docs_scores in found]
+
+    @metrics.timed("query.retrieve_many")
+    async def aretrieve_many(self, questions: List[str], k: int = 4, threshold: float = 0.5, vectors=None):
+        """Asynchronous counterpart of :meth:`retrieve_many`."""
+        found = await self.embedder.asearch_many(questions, k=k, vectors=vectors)
+        return [self._split(docs_scores, threshold) for docs_scores in found]
+
+    @metrics.timed("query.answer")
+    def answer(self, question: str, docs: List[str]) -> str:
+        """Ask the language model to answer from retrieved context.
+
+        Parameters
+        ----------
+        question: str
+            User query.
+        docs: List[str]
+            Text of the retrieved documents.
+
+        Returns
+        -------
+        str
+            Generated answer.
+        """
+        response = self.llm.invoke(self._prompt(question, docs))
+        metrics.record_usage("query.answer", response)
+        return str(response.content)
+
+    @metrics.timed("query.answer")
+    async def aanswer(self, question: str, docs: List[str]) -> str:
+        """Asynchronous counterpart of :meth:`answer`."""
+        response = await self.llm.ainvoke(self._prompt(question, docs))
+        metrics.record_usage("query.answer", response)
+        return str(response.content)
+
+    @metrics.timed("query.run")
     def run(self, question: str, k: int = 4, threshold: float = 0.5):
         """Answer a question and flag low-confidence results.
 
@@ -40,10 +145,42 @@ class QueryAgent:
         tuple
             Retrieved documents, generated answer, and escalation flag.
         """
-        docs_scores = self.embedder.search(question, k=k)
+        documents, needs_human = self.retrieve(question, k=k, threshold=threshold)
+        answer = self.answer(question, [d.page_content for d in documents])
+        return documents, answer, needs_human
+
+    @metrics.timed("query.run")
+    async def arun(self, question: str, k: int = 4, threshold: float = 0.5):
+        """Asynchronous counterpart of :meth:`run`.
+
+        Parameters
+        ----------
+        question: str
+            User query.
+        k: int
+            Number of documents to retrieve.
+        threshold: float
+            Maximum distance before escalation.
+
+        Returns
+        -------
+        tuple
+            Retrieved documents, generated answer, and escalation flag.
+        """
+        documents, needs_human = await self.aretrieve(question, k=k, threshold=threshold)
+        answer = await self.aanswer(question, [d.page_content for d in documents])
+        return documents, answer, needs_human
+
+    @staticmethod
+    def _split(docs_scores, threshold: float):
         documents = [doc for doc, _ in docs_scores]
-        scores = [score for _, score in docs_scores]
-        context = "\n".join(d.page_content for d in documents)
-        response = self.llm.invoke(f"Question: {question}\nContext:\n{context}")
-        top = scores[0] if scores else 0.0
-        return documents, str(response.content), top < threshold
+        # Scores are distances: escalate when even the closest document is
+        # too far away, or when nothing was found.
+        closest = docs_scores[0][1] if docs_scores else float("inf")
+        return documents, closest > threshold
+
+    def _prompt(self, question: str, docs: List[str]) -> str:
+        if self.context_tokens is not None:
+            docs = fit(docs, self.context_tokens, self.count_tokens)
+        context = "\n".join(docs)
+        return f"Question: {question}\nContext:\n{context}"
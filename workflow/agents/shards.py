@@ -0,0 +1,159 @@
+"""Hash-sharded vector storage with scatter-gather search.
+
+A :class:`ShardedBackend` spreads one collection over several backends.
+Every fragment lives on the shard picked by a stable hash of its id (or
+of its text when it has none); searches run on all shards at once and
+the per-shard results are merged into a global top-k. Each shard only
+scans its share of the vectors, so latency tracks the shard size rather
+than the size of the whole collection.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import heapq
+import itertools
+from typing import Dict, List, Optional
+import uuid
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Return the shard, stable across processes, that stores ``key``."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+class ShardedBackend:
+    """Backend spreading fragments over several backends by hash.
+
+    All shards must measure distance the same way, e.g. all Chroma
+    collections or all local indexes, for the merged order to be correct.
+    """
+
+    def __init__(self, shards: List[object]) -> None:
+        """Wrap the shard backends.
+
+        Parameters
+        ----------
+        shards: List[object]
+            Backends implementing ``add``, ``delete``, ``search``,
+            ``clear`` and ``count``; their order fixes the routing and
+            must not change once data is stored.
+        """
+        if not shards:
+            raise ValueError("At least one shard is required")
+        self.shards = shards
+        self._pool = ThreadPoolExecutor(len(shards), thread_name_prefix="shard")
+
+    def add(self, texts: List[str], vectors: List[List[float]], ids: Optional[List[str]] = None) -> None:
+        """Store fragments on their shards.
+
+        Parameters
+        ----------
+        texts: List[str]
+            Content produced by the loader.
+        vectors: List[List[float]]
+            Embedding of each fragment.
+        ids: List[str], optional
+            Identifier of each fragment, used for routing; random ids are
+            assigned when omitted so fragments can be deleted later.
+        """
+        ids = ids if ids is not None else [uuid.uuid4().hex for _ in texts]
+        groups = self._route(texts, ids)
+        self._gather([
+            (shard.add, [texts[i] for i in rows], [vectors[i] for i in rows], [ids[i] for i in rows])
+            for shard, rows in groups
+        ])
+
+    def delete(self, ids: List[str]) -> None:
+        """Remove the fragments with the given ids."""
+        groups = self._route(ids, ids)
+        self._gather([(shard.delete, [ids[i] for i in rows]) for shard, rows in groups])
+
+    def search(self, vector: List[float], k: int = 4):
+        """Return the ``k`` closest fragments over all shards.
+
+        Parameters
+        ----------
+        vector: List[float]
+            Query embedding.
+        k: int
+            Number of results to return.
+
+        Returns
+        -------
+        list
+            Matched documents paired with distances, closest first.
+        """
+        results = self._gather([(shard.search, vector, k) for shard in self.shards])
+        return heapq.nsmallest(k, itertools.chain.from_iterable(results), key=lambda hit: hit[1])
+
+    def search_many(self, vectors: List[List[float]], k: int = 4):
+        """Return the ``k`` closest fragments for each of several queries.
+
+        Parameters
+        ----------
+        vectors: List[List[float]]
+            Query embeddings.
+        k: int
+            Number of results per query.
+
+        Returns
+        -------
+        list
+            One result list per query, as returned by :meth:`search`.
+        """
+        per_shard = self._gather([
+            (shard.search_many, vectors, k) if hasattr(shard, "search_many") else (self._each, shard, vectors, k)
+            for shard in self.shards
+        ])
+        return [
+            heapq.nsmallest(k, itertools.chain.from_iterable(hits), key=lambda hit: hit[1])
+            for hits in zip(*per_shard)
+        ]
+
+    def dump(self, batch_size: int = 4096):
+        """Yield the fragments of every shard in batches."""
+        for shard in self.shards:
+            yield from shard.dump(batch_size)
+
+    def restore(self, ids, texts, metadatas, vectors) -> None:
+        """Store fragments with precomputed vectors on their shards."""
+        groups = self._route(texts, ids)
+        self._gather([
+            (
+                shard.restore,
+                [ids[i] for i in rows],
+                [texts[i] for i in rows],
+                [metadatas[i] for i in rows],
+                vectors[rows],
+            )
+            for shard, rows in groups
+        ])
+
+    def clear(self) -> None:
+        """Remove all stored vectors."""
+        self._gather([(shard.clear,) for shard in self.shards])
+
+    def count(self) -> int:
+        """Return the number of stored vectors."""
+        return sum(shard.count() for shard in self.shards)
+
+    def close(self) -> None:
+        """Stop the search threads."""
+        self._pool.shutdown(wait=False)
+
+    def _route(self, texts: List[str], ids: List[Optional[str]]):
+        rows: Dict[int, List[int]] = {}
+        for i, text in enumerate(texts):
+            key = ids[i] if ids[i] is not None else text
+            rows.setdefault(shard_of(key, len(self.shards)), []).append(i)
+        return [(self.shards[s], group) for s, group in sorted(rows.items())]
+
+    def _gather(self, calls):
+        if len(calls) == 1:
+            func, *args = calls[0]
+            return [func(*args)]
+        return [future.result() for future in [self._pool.submit(*call) for call in calls]]
+
+    @staticmethod
+    def _each(shard, vectors, k):
+        return [shard.search(vector, k) for vector in vectors]
@@ -1,24 +1,54 @@
 """Agent that distils retrieved context into a short synopsis.
 
 It relies on a chat model to compress multiple documents into a concise
-summary for downstream consumption.
+summary for downstream consumption. With a token budget, context that
+does not fit one call is summarised in budgeted groups concurrently and
+the partial summaries are combined, level by level if needed.
 """
-from typing import List
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 from langchain_openai import ChatOpenAI
+from .budget import fit, pack, token_counter
+from ..metrics import metrics
 
 class SummarizerAgent:
     """Produce concise summaries from document lists."""
 
-    def __init__(self, model: str = "gpt-3.5-turbo") -> None:
+    def __init__(
+        self,
+        model: str = "gpt-3.5-turbo",
+        llm: Optional[object] = None,
+        context_tokens: Optional[int] = None,
+        max_concurrency: int = 4,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ) -> None:
         """Initialise the chat model used for summarisation.
 
         Parameters
         ----------
         model: str
             Identifier for the chat model.
+        llm: object, optional
+            Pre-built chat model; a ``ChatOpenAI`` client is created when
+            omitted.
+        context_tokens: int, optional
+            Maximum document tokens sent in one call. Without a budget all
+            documents go into a single prompt.
+        max_concurrency: int
+            Number of group summaries requested at the same time.
+        count_tokens: Callable[[str], int], optional
+            Token counter; the model's ``tiktoken`` encoding by default.
         """
-        self.llm = ChatOpenAI(model=model)
+        self.model = model
+        self.llm = llm if llm is not None else ChatOpenAI(model=model)
+        self.context_tokens = context_tokens
+        self.max_concurrency = max_concurrency
+        if count_tokens is None and context_tokens is not None:
+            count_tokens = token_counter(model)
+        self.count_tokens = count_tokens
 
+    @metrics.timed("summarizer.run")
     def run(self, docs: List[str]) -> str:
         """Create a natural language synopsis.
 
@@ -32,6 +62,80 @@ class SummarizerAgent:
         str
             Summary generated by the model.
         """
-        content = "\n".join(docs)
-        result = self.llm.invoke(f"Summarize:\n{content}")
+        if self._fits(docs):
+            return self._call(self._prompt(docs))
+        parts, level = docs, 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            while True:
+                groups = self._groups(parts, level)
+                if len(groups) == 1:
+                    break
+                parts = list(pool.map(lambda group: self._call(self._prompt(group)), groups))
+                level += 1
+        return self._call(self._reduce_prompt(groups[0], level))
+
+    @metrics.timed("summarizer.run")
+    async def arun(self, docs: List[str]) -> str:
+        """Asynchronous counterpart of :meth:`run`.
+
+        Parameters
+        ----------
+        docs: List[str]
+            Text fragments that compose the context.
+
+        Returns
+        -------
+        str
+            Summary generated by the model.
+        """
+        if self._fits(docs):
+            return await self._acall(self._prompt(docs))
+        limit = asyncio.Semaphore(self.max_concurrency)
+
+        async def summarize(group: List[str]) -> str:
+            async with limit:
+                return await self._acall(self._prompt(group))
+
+        parts, level = docs, 0
+        while True:
+            groups = self._groups(parts, level)
+            if len(groups) == 1:
+                break
+            parts = list(await asyncio.gather(*(summarize(group) for group in groups)))
+            level += 1
+        return await self._acall(self._reduce_prompt(groups[0], level))
+
+    def _fits(self, docs: List[str]) -> bool:
+        if self.context_tokens is None:
+            return True
+        return sum(self.count_tokens(doc) for doc in docs) <= self.context_tokens
+
+    def _groups(self, parts: List[str], level: int) -> List[List[str]]:
+        groups = pack(parts, self.context_tokens, self.count_tokens)
+        if level and len(groups) >= len(parts):
+            # Summaries stopped shrinking; keep what fits in a final call.
+            return [fit(parts, self.context_tokens, self.count_tokens)]
+        return groups
+
+    def _call(self, prompt: str) -> str:
+        result = self.llm.invoke(prompt)
+        metrics.record_usage("summarizer.run", result)
         return str(result.content)
+
+    async def _acall(self, prompt: str) -> str:
+        result = await self.llm.ainvoke(prompt)
+        metrics.record_usage("summarizer.run", result)
+        return str(result.content)
+
+    @staticmethod
+    def _prompt(docs: List[str]) -> str:
+        content = "\n".join(docs)
+        return f"Summarize:\n{content}"
+
+    @classmethod
+    def _reduce_prompt(cls, parts: List[str], level: int) -> str:
+        if not level:
+            return cls._prompt(parts)
+        content = "\n".join(parts)
+        return f"Combine these partial summaries into one summary:\n{content}"
+
@@ -3,73 +3,787 @@
 A FastAPI application exposes endpoints for uploading documents and
 issuing queries against the shared knowledge base.
 """
-from pathlib import Path
+import asyncio
+from contextlib import asynccontextmanager
+import json
+import logging
+import os
 import tempfile
-from fastapi import FastAPI, UploadFile, File
-from .agents.loader import load_and_chunk
-from .agents.embedder import EmbeddingAgent
-from .agents.query import QueryAgent
-from .agents.summarizer import SummarizerAgent
-from .graph import create_graph
-
-app = FastAPI()
-embedder = EmbeddingAgent()
-query_agent = QueryAgent(embedder)
-summarizer = SummarizerAgent()
-workflow = create_graph(query_agent, summarizer)
-
-@app.post("/upload")
-async def upload(file: UploadFile = File(...)):
-    """Persist a document and index its contents.
+import threading
+import time
+import uuid
+from typing import List, Optional
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, UploadFile, File
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from .admission import AdmissionController, Lane, Rejected
+from .metrics import metrics
+from .registry import NAME_PATTERN, Collection, CollectionRegistry
+from .singleflight import SingleFlight
+
+# Model clients, vector stores and the graph are built on first use or by
+# the lifespan, never at import, so importing this module stays cheap and
+# every forked worker opens its own connections.
+
+logger = logging.getLogger(__name__)
+_UNSET = object()
+
+
+def _build_embedder(name: Optional[str] = None):
+    """Create the embedder of a collection, the default one when unnamed.
+
+    ``VECTOR_BACKEND`` selects the backend: ``chroma`` (the default)
+    stores vectors in Chroma; ``local`` uses the in-process NumPy index,
+    memory-mapped under ``VECTOR_INDEX_PATH`` when set and stored as
+    ``VECTOR_INDEX_DTYPE`` (``float32`` or ``float16``). Setting
+    ``VECTOR_INDEX_NLIST`` switches it to IVF search over that many
+    clusters (``0`` picks the count from the data), trained once enough
+    vectors are stored; ``VECTOR_INDEX_NPROBE`` clusters are searched per
+    query.
+    With ``VECTOR_SHARDS`` above one the collection is hash-sharded over
+    that many backends which are searched concurrently.
+    """
+    from .agents.embedder import ChromaBackend, EmbeddingAgent
+
+    name = name or default_collection
+    shards = _shards(name)
+    path = _index_path(name)
+    if os.environ.get("VECTOR_BACKEND", "chroma") == "local":
+        from .agents.local_index import LocalIndex
+
+        nlist = os.environ.get("VECTOR_INDEX_NLIST")
+
+        def backend(suffix: str):
+            return LocalIndex(
+                path and os.path.join(path, suffix) if suffix else path,
+                dtype=os.environ.get("VECTOR_INDEX_DTYPE", "float32"),
+                nprobe=int(os.environ.get("VECTOR_INDEX_NPROBE", 8)),
+                nlist=int(nlist) if nlist else None,
+            )
+    else:
+        def backend(suffix: str):
+            return ChromaBackend(f"{name}-{suffix}" if suffix else name)
+
+    if shards > 1:
+        from .agents.shards import ShardedBackend
+
+        store = ShardedBackend([backend(f"shard{i}") for i in range(shards)])
+    else:
+        store = backend("")
+    return EmbeddingAgent(name, backend=store, manifest_path=_manifest_path(name))
+
+
+def _shards(name: str) -> int:
+    """Return the shard count of a collection from ``VECTOR_SHARDS``.
+
+    The variable holds either one count for every collection or
+    comma-separated ``name=count`` pairs, e.g. ``manuals=8,default=1``.
+    The count of a collection must not change once it holds data.
+    """
+    value = os.environ.get("VECTOR_SHARDS", "1")
+    if "=" not in value:
+        return int(value)
+    counts = dict(item.strip().split("=") for item in value.split(",") if item.strip())
+    return int(counts.get(name, counts.get("default", 1)))
+
+
+def _index_path(name: str) -> Optional[str]:
+    """Return the directory of a collection's local index, if persisted."""
+    root = os.environ.get("VECTOR_INDEX_PATH")
+    if not root or name == default_collection:
+        return root
+    return os.path.join(root, "collections", name)
+
+
+def _manifest_path(name: Optional[str] = None) -> Optional[str]:
+    """Return where the manifest of uploaded documents is stored.
+
+    ``VECTOR_MANIFEST_PATH`` when set, with the collection name added
+    before the extension for collections other than the default,
+    otherwise ``documents.json`` beside a persistent local index; ``None``
+    keeps the manifest in memory.
+    """
+    name = name or default_collection
+    path = os.environ.get("VECTOR_MANIFEST_PATH")
+    if path is not None:
+        if name == default_collection:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}.{name}{ext}"
+    index = _index_path(name)
+    return os.path.join(index, "documents.json") if index else None
+
+
+def _build_cache(embedder, name: Optional[str] = None):
+    """Create the semantic answer cache selected by ``QUERY_CACHE``.
+
+    ``QUERY_CACHE`` is unset to disable caching, ``memory`` for a
+    process-local cache, or a file path for a SQLite cache shared between
+    workers; collections other than the default get their own file.
+    ``QUERY_CACHE_THRESHOLD``, ``QUERY_CACHE_SIZE`` and
+    ``QUERY_CACHE_TTL`` tune similarity, capacity and lifetime.
+    """
+    backend = os.environ.get("QUERY_CACHE")
+    if not backend:
+        return None
+    from .cache import InMemoryCacheStore, SQLiteCacheStore, SemanticCache
+
+    size = int(os.environ.get("QUERY_CACHE_SIZE", 1024))
+    ttl = float(os.environ.get("QUERY_CACHE_TTL", 3600))
+    if backend == "memory":
+        store = InMemoryCacheStore(size, ttl)
+    else:
+        if name is not None and name != default_collection:
+            root, ext = os.path.splitext(backend)
+            backend = f"{root}.{name}{ext}"
+        store = SQLiteCacheStore(backend, size, ttl)
+    threshold = float(os.environ.get("QUERY_CACHE_THRESHOLD", 0.95))
+    return SemanticCache(embedder.embeddings, store, threshold)
+
+
+def _build_memo(name: Optional[str] = None):
+    """Create the node memo selected by ``NODE_MEMO``.
+
+    ``NODE_MEMO`` is unset to run every node each time, ``memory`` for a
+    process-local memo, or a file path for a SQLite memo shared between
+    workers; collections other than the default get their own file.
+    ``NODE_MEMO_SIZE`` bounds the remembered outputs and
+    ``NODE_MEMO_NODES`` lists the memoised nodes, ``summarize`` by default.
+    """
+    backend = os.environ.get("NODE_MEMO")
+    if not backend:
+        return None
+    from .memo import NodeMemo
+
+    path = None
+    if backend != "memory":
+        path = backend
+        if name is not None and name != default_collection:
+            root, ext = os.path.splitext(backend)
+            path = f"{root}.{name}{ext}"
+    return NodeMemo(int(os.environ.get("NODE_MEMO_SIZE", 1024)), path)
+
+
+def _memoized_nodes() -> List[str]:
+    """Return the nodes listed in ``NODE_MEMO_NODES``."""
+    return [n.strip() for n in os.environ.get("NODE_MEMO_NODES", "summarize").split(",") if n.strip()]
+
+
+def _build_collection(name: str):
+    """Create the services of a collection other than the default.
+
+    The summariser is shared, everything holding documents or answers is
+    specific to the collection.
+    """
+    from .agents.query import QueryAgent
+    from .graph import create_graph
+    from .registry import Collection
+
+    startup()
+    collection_embedder = _build_embedder(name)
+    agent = QueryAgent(collection_embedder, context_tokens=_tokens("QUERY_CONTEXT_TOKENS"))
+    collection_memo = _build_memo(name)
+    collection = Collection(
+        name,
+        collection_embedder,
+        agent,
+        create_graph(agent, summarizer, collection_memo, _memoized_nodes()),
+        None,
+        _build_cache(collection_embedder, name),
+        collection_memo,
+    )
+    collection.ingestion = _ingestion_queue(collection_embedder, collection.invalidate)
+    return collection
+
+
+def _ingestion_queue(embedder, on_change):
+    """Create an ingestion queue configured from the environment."""
+    from .ingest import IngestionQueue
+
+    return IngestionQueue(
+        embedder,
+        batch_size=int(os.environ.get("EMBED_BATCH_SIZE", 64)),
+        max_wait=float(os.environ.get("INGEST_MAX_WAIT", 0.05)),
+        workers=int(os.environ.get("INGEST_WORKERS", 2)),
+        retries=int(os.environ.get("INGEST_RETRIES", 3)),
+        on_change=on_change,
+    )
+
+
+def _restore_snapshot(embedder) -> None:
+    """Load ``VECTOR_SNAPSHOT`` into an empty store.
+
+    Replicas started from a snapshot serve queries without re-embedding
+    any document; a store that already holds vectors is left untouched.
+    """
+    path = os.environ.get("VECTOR_SNAPSHOT")
+    if path and embedder.count() == 0:
+        from .snapshot import import_snapshot
+
+        logger.info("restored snapshot %s: %s", path, import_snapshot(embedder, path))
+
+
+def _tokens(name: str) -> Optional[int]:
+    """Read an optional token budget from the environment."""
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def _payload(result: dict) -> dict:
+    """Select the fields returned to clients from a graph result."""
+    return {
+        "answer": result.get("answer"),
+        "summary": result.get("summary"),
+        "needs_human": result.get("needs_human"),
+    }
+
+
+def _invalidate_cache() -> None:
+    if cache is not None and cache is not _UNSET:
+        cache.invalidate()
+    if memo is not None and memo is not _UNSET:
+        memo.invalidate()
+
+
+def _build_admission() -> AdmissionController:
+    """Configure admission control from the environment.
+
+    Interactive queries (``/query``, ``/query/stream``) outrank batch
+    queries, which outrank uploads. ``ADMIT_<LANE>_LIMIT``,
+    ``ADMIT_<LANE>_QUEUE`` and ``ADMIT_<LANE>_TIMEOUT`` set the running
+    requests, queued requests and queueing seconds of the ``QUERY``,
+    ``BATCH`` and ``UPLOAD`` lanes; ``ADMIT_CAPACITY`` bounds the requests
+    running over all lanes.
+    """
+    defaults = (("query", 0, 16, 64, 10.0), ("batch", 1, 2, 8, 30.0), ("upload", 2, 4, 32, 30.0))
+    lanes = []
+    for name, priority, limit, queue, timeout in defaults:
+        prefix = f"ADMIT_{name.upper()}_"
+        lanes.append(Lane(
+            name,
+            priority,
+            limit=int(os.environ.get(prefix + "LIMIT", limit)),
+            queue=int(os.environ.get(prefix + "QUEUE", queue)),
+            timeout=float(os.environ.get(prefix + "TIMEOUT", timeout)),
+        ))
+    return AdmissionController(lanes, int(os.environ.get("ADMIT_CAPACITY", 16)))
+
+
+def _reject(exc: Rejected) -> HTTPException:
+    """Translate a rejected admission into a response with ``Retry-After``."""
+    return HTTPException(exc.status_code, exc.detail, headers={"Retry-After": str(exc.retry_after)})
+
+
+def _admitted(lane: str):
+    """Build a dependency holding a slot of ``lane`` during the request.
+
+    The slot stays held while a streaming response is being sent.
+    """
+    async def hold():
+        try:
+            await admission.acquire(lane)
+        except Rejected as exc:
+            raise _reject(exc)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            admission.release(lane, time.monotonic() - start)
+
+    return hold
+
+
+async def _release_when_finished(target, job, start: float) -> None:
+    try:
+        await target.ingestion.wait(job)
+    finally:
+        admission.release("upload", time.monotonic() - start)
+
+
+def _count_coalesced() -> None:
+    if metrics.enabled:
+        metrics.inc("workflow_coalesced_total")
+
+
+def _missing() -> bool:
+    services = (embedder, query_agent, summarizer, workflow, ingestion)
+    return any(service is None for service in services) or cache is _UNSET or memo is _UNSET
+
+
+def startup() -> None:
+    """Construct every service that has not been provided yet.
+
+    Services assigned beforehand, e.g. by tests or embedding scripts, are
+    kept. Safe to call repeatedly and from several threads.
+    """
+    global embedder, query_agent, summarizer, workflow, cache, memo, ingestion, ready
+    with _lock:
+        if not _missing():
+            ready = True
+            return
+        from .agents.query import QueryAgent
+        from .agents.summarizer import SummarizerAgent
+        from .graph import create_graph
+
+        if embedder is None:
+            embedder = _build_embedder()
+            _restore_snapshot(embedder)
+        if query_agent is None:
+            query_agent = QueryAgent(embedder, context_tokens=_tokens("QUERY_CONTEXT_TOKENS"))
+        if summarizer is None:
+            summarizer = SummarizerAgent(context_tokens=_tokens("SUMMARY_CONTEXT_TOKENS"))
+        if memo is _UNSET:
+            memo = _build_memo()
+        if workflow is None:
+            workflow = create_graph(query_agent, summarizer, memo, _memoized_nodes())
+        if cache is _UNSET:
+            cache = _build_cache(embedder)
+        if ingestion is None:
+            ingestion = _ingestion_queue(embedder, _invalidate_cache)
+        ready = True
+
+
+async def _warm_up() -> None:
+    """Build the services off the event loop, then open their connections.
+
+    With ``WARMUP=1`` the vector store is queried and one embedding is
+    requested so that the first user request does not pay for opening
+    connections; failures are logged and do not block readiness.
+    """
+    global ready
+    ready = False
+    await asyncio.to_thread(startup)
+    await ingestion.start()
+    if os.environ.get("WARMUP", "") == "1":
+        try:
+            await asyncio.to_thread(embedder.count)
+            await embedder.embeddings.aembed_query("warm-up")
+        except Exception:
+            logger.warning("warm-up failed", exc_info=True)
+    ready = True
+
+
+async def services() -> None:
+    """Request dependency making sure the services exist before use."""
+    if _warming is not None and not _warming.done():
+        await asyncio.shield(_warming)
+    if _missing():
+        await asyncio.to_thread(startup)
+
+
+async def _collection(name: Optional[str], create: bool = False) -> Collection:
+    """Return the services of a collection, the default one when unnamed.
+
+    Only endpoints storing documents create collections; the others serve
+    collections already built or persisted under ``VECTOR_INDEX_PATH``,
+    so requests naming unknown collections cannot use up the limit.
+
+    Raises
+    ------
+    HTTPException
+        ``404`` for an unknown collection when ``create`` is false, ``429``
+        when no further collection may be created.
+    """
+    if name is None or name == default_collection:
+        return Collection(default_collection, embedder, query_agent, workflow, ingestion, cache, memo)
+    collection = collections.find(name)
+    if collection is None:
+        path = _index_path(name)
+        if not create and not (path and os.path.isdir(path)):
+            raise HTTPException(status_code=404, detail=f"Unknown collection {name}")
+        try:
+            collection = await asyncio.to_thread(collections.get, name)
+        except LookupError as exc:
+            raise HTTPException(status_code=429, detail=str(exc))
+    await collection.ingestion.start()
+    return collection
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build and warm the services in the background while serving.
+
+    ``/readyz`` reports 503 until this finishes; requests arriving earlier
+    wait for it. The ingestion workers run until shutdown.
+    """
+    global _warming
+    _warming = asyncio.create_task(_warm_up())
+    yield
+    if not _warming.done():
+        _warming.cancel()
+    await asyncio.gather(_warming, return_exceptions=True)
+    _warming = None
+    if ingestion is not None:
+        await ingestion.stop()
+    for collection in collections:
+        await collection.ingestion.stop()
+
+
+metrics.enabled = os.environ.get("METRICS_ENABLED", "") == "1"
+app = FastAPI(lifespan=lifespan)
+router = APIRouter(dependencies=[Depends(services)])
+embedder = None
+query_agent = None
+summarizer = None
+workflow = None
+cache = _UNSET
+memo = _UNSET
+ingestion = None
+ready = False
+_warming: Optional[asyncio.Task] = None
+_lock = threading.Lock()
+inflight = SingleFlight(on_shared=_count_coalesced)
+admission = _build_admission()
+_held: set = set()
+batch_concurrency = int(os.environ.get("QUERY_BATCH_CONCURRENCY", 8))
+batch_limit = int(os.environ.get("QUERY_BATCH_LIMIT", 1000))
+default_collection = os.environ.get("VECTOR_COLLECTION", "documents")
+collections = CollectionRegistry(_build_collection, int(os.environ.get("MAX_COLLECTIONS", 64)))
+
+
+@app.get("/healthz")
+async def healthz():
+    """Report that the process is alive."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Report whether the services are built and warmed up.
+
+    Returns
+    -------
+    JSONResponse
+        ``200`` once ready to serve, ``503`` while starting.
+    """
+    if ready and not _missing():
+        return {"status": "ready"}
+    return JSONResponse({"status": "starting"}, status_code=503)
+
+
+@router.post("/upload")
+async def upload(
+    file: UploadFile = File(...),
+    document_id: Optional[str] = None,
+    wait: bool = False,
+    collection: Optional[str] = Query(None, pattern=NAME_PATTERN),
+):
+    """Accept a document for background indexing.
+
+    The upload is spooled to disk and queued; chunking and embedding
+    happen in the background, where chunks from all pending uploads are
+    embedded in shared batches. Poll ``/jobs/{job_id}`` for progress.
+
+    Uploading under an existing document id replaces that document: only
+    chunks whose content is not stored yet are embedded, and chunks only
+    the old version used are deleted. Without an id the upload is a new
+    document, so files sharing a name never replace each other.
 
     Parameters
     ----------
     file: UploadFile
         Arbitrary text document supplied by the client.
+    document_id: str, optional
+        Key of the document to create or replace; a fresh id is assigned
+        when omitted.
+    wait: bool
+        Respond only once the document is indexed.
+    collection: str, optional
+        Name of the collection; the default collection when omitted.
 
     Returns
     -------
     dict
-        Confirmation that ingestion completed.
-    """
-    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-        data = await file.read()
-        tmp.write(data)
-        path = Path(tmp.name)
-    chunks = load_and_chunk(str(path))
-    embedder.add(chunks)
-    return {"status": "ok"}
+        Identifiers of the ingestion job and document, or with ``wait``
+        the finished job with the number of chunks embedded, skipped and
+        deleted.
+    """
+    from .agents.loader import BLOCK_SIZE
+
+    target = await _collection(collection, create=True)
+    try:
+        await admission.acquire("upload")
+    except Rejected as exc:
+        raise _reject(exc)
+    start = time.monotonic()
+    try:
+        with tempfile.NamedTemporaryFile(delete=False) as tmp:
+            while block := await file.read(BLOCK_SIZE):
+                tmp.write(block)
+        job = target.ingestion.submit(tmp.name, document_id or uuid.uuid4().hex)
+    except BaseException:
+        admission.release("upload", time.monotonic() - start)
+        raise
+    # The slot is held until the document is indexed, which is where
+    # uploads spend embedding quota.
+    task = asyncio.create_task(_release_when_finished(target, job, start))
+    _held.add(task)
+    task.add_done_callback(_held.discard)
+    if wait:
+        return (await target.ingestion.wait(job)).as_dict()
+    return {"status": "queued", "job_id": job.id, "document_id": job.document_id}
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Report the progress of an ingestion job.
+
+    Parameters
+    ----------
+    job_id: str
+        Identifier returned by ``/upload``.
 
-@app.get("/query")
-async def query(question: str):
+    Returns
+    -------
+    dict
+        Job state with the number of chunks embedded so far and the total,
+        which is known once the whole document has been chunked.
+    """
+    job = ingestion.get(job_id)
+    for other in collections:
+        job = job or other.ingestion.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.as_dict()
+
+@router.get("/query", dependencies=[Depends(_admitted("query"))])
+async def query(question: str, collection: Optional[str] = Query(None, pattern=NAME_PATTERN)):
     """Retrieve an answer and optional summary.
 
     Parameters
     ----------
     question: str
         Natural language prompt from a user.
+    collection: str, optional
+        Name of the collection; the default collection when omitted.
 
     Returns
     -------
     dict
         Answer, summary, and escalation flag.
+
+    Notes
+    -----
+    Concurrent requests for the same normalised question share a single
+    execution and receive the same result.
     """
-    result = workflow.invoke({"question": question})
-    return {
-        "answer": result.get("answer"),
-        "summary": result.get("summary"),
-        "needs_human": result.get("needs_human"),
-    }
+    target = await _collection(collection)
+
+    async def answer() -> dict:
+        vector = None
+        if target.cache is not None:
+            generation = target.cache.generation
+            vector, cached = await target.cache.alookup(question)
+            if cached is not None:
+                return cached
+        result = await target.workflow.ainvoke({"question": question})
+        payload = _payload(result)
+        if target.cache is not None:
+            await target.cache.aput(question, vector, payload, generation)
+        return payload
 
+    payload = await inflight.do((target.name, " ".join(question.lower().split())), answer)
+    return dict(payload)
 
-@app.post("/reset")
-async def reset():
-    """Remove all persisted vectors."""
-    embedder.clear()
+
+class BatchQuery(BaseModel):
+    """Body of ``/query/batch``."""
+    questions: List[str]
+
+
+@router.post("/query/batch", dependencies=[Depends(_admitted("batch"))])
+async def query_batch(request: BatchQuery, collection: Optional[str] = Query(None, pattern=NAME_PATTERN)):
+    """Answer many questions and stream results as they complete.
+
+    All questions are embedded in one call and searched in bulk; the
+    graph then runs over them with at most ``QUERY_BATCH_CONCURRENCY``
+    in flight.
+
+    Parameters
+    ----------
+    request: BatchQuery
+        Questions to answer, at most ``QUERY_BATCH_LIMIT``.
+    collection: str, optional
+        Name of the collection; the default collection when omitted.
+
+    Returns
+    -------
+    StreamingResponse
+        Newline-delimited JSON, one object per question in completion
+        order, carrying its ``index`` in the request and either the
+        fields of ``/query`` or an ``error``.
+    """
+    questions = request.questions
+    if len(questions) > batch_limit:
+        raise HTTPException(status_code=413, detail=f"At most {batch_limit} questions per batch")
+    target = await _collection(collection)
+    cache = target.cache
+    generation = cache.generation if cache is not None else None
+    vectors = await target.embedder.embeddings.aembed_documents(questions) if questions else []
+    cached, pending = {}, []
+    for i, (question, vector) in enumerate(zip(questions, vectors)):
+        if cache is not None:
+            vector, value = await cache.alookup_vector(vector)
+            if value is not None:
+                cached[i] = value
+                continue
+        pending.append((i, vector))
+    retrieved = await target.query_agent.aretrieve_many(
+        [questions[i] for i, _ in pending], vectors=[vectors[i] for i, _ in pending]
+    )
+    inputs = [
+        {"question": questions[i], "docs": [d.page_content for d in docs], "needs_human": needs_human}
+        for (i, _), (docs, needs_human) in zip(pending, retrieved)
+    ]
+
+    async def lines():
+        for i, value in cached.items():
+            yield json.dumps({"index": i, **value}) + "\n"
+        results = target.workflow.abatch_as_completed(
+            inputs, config={"max_concurrency": batch_concurrency}, return_exceptions=True
+        )
+        async for j, result in results:
+            i, vector = pending[j]
+            if isinstance(result, Exception):
+                yield json.dumps({"index": i, "error": str(result)}) + "\n"
+                continue
+            payload = _payload(result)
+            if cache is not None:
+                await cache.aput(questions[i], vector, payload, generation)
+            yield json.dumps({"index": i, **payload}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/query/stream", dependencies=[Depends(_admitted("query"))])
+async def query_stream(question: str, collection: Optional[str] = Query(None, pattern=NAME_PATTERN)):
+    """Stream answer and summary tokens as server-sent events.
+
+    Parameters
+    ----------
+    question: str
+        Natural language prompt from a user.
+    collection: str, optional
+        Name of the collection; the default collection when omitted.
+
+    Returns
+    -------
+    StreamingResponse
+        ``token`` events with model output, ``node`` events as each
+        graph step completes, and a closing ``done`` event carrying the
+        same fields as ``/query``.
+    """
+    from .graph import astream_query
+
+    target = await _collection(collection)
+
+    async def events():
+        async for event, data in astream_query(target.workflow, question):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.post("/reset")
+async def reset(collection: Optional[str] = Query(None, pattern=NAME_PATTERN)):
+    """Remove all persisted vectors of a collection."""
+    target = await _collection(collection)
+    target.embedder.clear()
+    target.invalidate()
     return {"status": "cleared"}
 
-@app.get("/stats")
-async def stats():
-    """Report the number of indexed fragments."""
-    return {"count": embedder.count()}
 
+@router.get("/snapshot")
+async def export(dtype: str = "float32", collection: Optional[str] = Query(None, pattern=NAME_PATTERN)):
+    """Download a snapshot of the vector store.
+
+    Parameters
+    ----------
+    dtype: str
+        Precision of the stored vectors, ``float32`` or ``float16``.
+    collection: str, optional
+        Name of the collection; the default collection when omitted.
+
+    Returns
+    -------
+    FileResponse
+        Snapshot file, deleted once sent.
+    """
+    from .snapshot import export_snapshot
+
+    if dtype not in ("float32", "float16"):
+        raise HTTPException(status_code=422, detail="dtype must be float32 or float16")
+    target = await _collection(collection)
+    handle, path = tempfile.mkstemp(suffix=".snap")
+    os.close(handle)
+    try:
+        await asyncio.to_thread(export_snapshot, target.embedder, path, dtype)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename="vectors.snap",
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
+@router.post("/snapshot")
+async def restore(file: UploadFile = File(...), collection: Optional[str] = Query(None, pattern=NAME_PATTERN)):
+    """Replace the vector store with an uploaded snapshot.
+
+    Parameters
+    ----------
+    file: UploadFile
+        Snapshot produced by ``GET /snapshot``.
+    collection: str, optional
+        Name of the collection; the default collection when omitted.
+
+    Returns
+    -------
+    dict
+        Number of fragments and documents loaded.
+    """
+    from .agents.loader import BLOCK_SIZE
+    from .snapshot import import_snapshot
+
+    target = await _collection(collection, create=True)
+    with tempfile.NamedTemporaryFile(suffix=".snap", delete=False) as tmp:
+        while block := await file.read(BLOCK_SIZE):
+            tmp.write(block)
+    try:
+        result = await asyncio.to_thread(import_snapshot, target.embedder, tmp.name)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        os.unlink(tmp.name)
+    target.invalidate()
+    return {"status": "restored", **result}
+
+
+@router.get("/stats")
+async def stats(collection: Optional[str] = Query(None, pattern=NAME_PATTERN)):
+    """Report fragments, cache counters, collections and admission queues."""
+    target = await _collection(collection)
+    result = {"count": target.embedder.count()}
+    if target.cache is not None:
+        result["cache"] = target.cache.stats()
+    if target.memo is not None:
+        result["memo"] = target.memo.stats()
+    result["collections"] = sorted(c.name for c in collections)
+    result["admission"] = admission.stats()
+    return result
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Expose node and agent timings in the Prometheus text format.
+
+    Series are only recorded when ``METRICS_ENABLED=1``.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+app.include_router(router)
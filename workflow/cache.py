@@ -0,0 +1,413 @@
+"""Semantic cache for answers produced by the workflow.
+
+Questions are embedded and compared with previously answered ones by
+cosine similarity, so paraphrases of a known question can be served
+without retrieval or model calls. Entries live in a pluggable store that
+bounds the number of entries, evicts the least recently used ones and
+expires stale answers.
+"""
+from collections import OrderedDict
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+
+def _normalise(vector) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+class _Vectors:
+    """Normalised question vectors kept in one matrix for scoring.
+
+    Rows are assigned on insertion and reused once freed, so a lookup is a
+    single matrix product instead of stacking every entry again.
+    """
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def set(self, key: str, vector: np.ndarray, created: float) -> None:
+        row = self.rows.get(key)
+        if row is None:
+            row = self._free.pop() if self._free else self._append(vector.shape[0])
+            self.rows[key] = row
+            self.keys[row] = key
+        self.matrix[row] = vector
+        self.created[row] = created
+
+    def remove(self, key: str) -> None:
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.keys[row] = None
+            self.created[row] = np.nan
+            self._free.append(row)
+
+    def clear(self) -> None:
+        self.matrix: Optional[np.ndarray] = None
+        self.created = np.empty(0)
+        self.keys: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self._free: List[int] = []
+
+    def candidates(self, vector: np.ndarray, threshold: float, cutoff: float) -> List[str]:
+        """Keys of entries created after ``cutoff`` scoring at least ``threshold``, best first."""
+        if not self.rows:
+            return []
+        used = len(self.keys)
+        scores = self.matrix[:used] @ vector
+        # Free rows carry a NaN creation time and fail the comparison.
+        scores[~(self.created[:used] >= cutoff)] = -np.inf
+        hits = np.flatnonzero(scores >= threshold)
+        return [self.keys[i] for i in hits[np.argsort(-scores[hits], kind="stable")]]
+
+    def stale(self, cutoff: float) -> List[str]:
+        """Keys of entries created before ``cutoff``."""
+        return [self.keys[i] for i in np.flatnonzero(self.created[:len(self.keys)] < cutoff)]
+
+    def _append(self, dim: int) -> int:
+        row = len(self.keys)
+        if self.matrix is None or row == self.matrix.shape[0]:
+            capacity = max(16, 2 * row)
+            matrix = np.zeros((capacity, dim), dtype=np.float32)
+            created = np.full(capacity, np.nan)
+            if self.matrix is not None:
+                matrix[:row] = self.matrix
+                created[:row] = self.created
+            self.matrix, self.created = matrix, created
+        self.keys.append(None)
+        return row
+
+
+class InMemoryCacheStore:
+    """Process-local store with LRU eviction and expiry."""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Configure capacity and lifetime of entries.
+
+        Parameters
+        ----------
+        max_size: int
+            Maximum number of cached questions.
+        ttl: float, optional
+            Seconds an entry stays valid; ``None`` disables expiry.
+        clock: Callable[[], float]
+            Source of the current time.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.generation = 0
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._vectors = _Vectors()
+        self._lock = threading.Lock()
+
+    def match(self, vector: np.ndarray, threshold: float) -> Optional[dict]:
+        """Return the value of the closest fresh entry above ``threshold``."""
+        with self._lock:
+            for question in self._vectors.candidates(vector, threshold, self._cutoff()):
+                self._entries.move_to_end(question)
+                return self._entries[question]
+            return None
+
+    def put(self, question: str, vector: np.ndarray, value: dict, generation: Optional[int] = None) -> None:
+        """Insert or refresh an entry, evicting the least recently used.
+
+        The entry is dropped when ``generation`` is given and the store was
+        cleared since it was read.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._expire()
+            self._entries[question] = value
+            self._entries.move_to_end(question)
+            self._vectors.set(question, vector, self.clock())
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._vectors.remove(evicted)
+
+    def clear(self) -> None:
+        """Drop every entry and start a new generation."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._vectors.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._entries)
+
+    def _cutoff(self) -> float:
+        return -np.inf if self.ttl is None else self.clock() - self.ttl
+
+    def _expire(self) -> None:
+        for question in self._vectors.stale(self._cutoff()):
+            del self._entries[question]
+            self._vectors.remove(question)
+
+
+class SQLiteCacheStore:
+    """On-disk store that several worker processes can share.
+
+    Each process mirrors the stored vectors in memory and only reads the
+    rows added since its last lookup, when another process wrote to the
+    file. Values are read for the best candidates only. The generation is
+    kept in the file, so clearing the store in one process also rejects
+    answers that other processes computed from the old knowledge base.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Open or create the cache database.
+
+        Parameters
+        ----------
+        path: str
+            Location of the SQLite file.
+        max_size: int
+            Maximum number of cached questions.
+        ttl: float, optional
+            Seconds an entry stays valid; ``None`` disables expiry.
+        clock: Callable[[], float]
+            Source of the current time.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "question TEXT PRIMARY KEY, vector BLOB, value TEXT, "
+            "created REAL, used REAL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('generation', 0)")
+        self._vectors = _Vectors()
+        self._seen = 0
+        self._version = None
+        self.generation = self._generation()
+
+    def match(self, vector: np.ndarray, threshold: float) -> Optional[dict]:
+        """Return the value of the closest fresh entry above ``threshold``."""
+        with self._lock:
+            self._sync()
+            cutoff = self._cutoff()
+            for question in self._vectors.candidates(vector, threshold, cutoff):
+                row = self._conn.execute(
+                    "SELECT value FROM answers WHERE question = ? AND created >= ?", (question, cutoff)
+                ).fetchone()
+                if row is None:
+                    # Evicted or expired by another process.
+                    self._vectors.remove(question)
+                    continue
+                self._conn.execute(
+                    "UPDATE answers SET used = ? WHERE question = ?", (self.clock(), question)
+                )
+                return json.loads(row[0])
+            return None
+
+    def put(self, question: str, vector: np.ndarray, value: dict, generation: Optional[int] = None) -> None:
+        """Insert or refresh an entry, evicting the least recently used.
+
+        The entry is dropped when ``generation`` is given and the store was
+        cleared since it was read, by this process or another one.
+        """
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                fresh = generation is None or generation == self._generation()
+                if fresh:
+                    self._conn.execute("DELETE FROM answers WHERE created < ?", (self._cutoff(),))
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                        (question, vector.astype(np.float32).tobytes(), json.dumps(value), now, now),
+                    )
+                    self._conn.execute(
+                        "DELETE FROM answers WHERE question NOT IN "
+                        "(SELECT question FROM answers ORDER BY used DESC LIMIT ?)",
+                        (self.max_size,),
+                    )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            if fresh:
+                self._vectors.set(question, vector, now)
+                # Rows evicted here stay mirrored until a lookup misses
+                # them; start over once they make up half the mirror.
+                if len(self._vectors) > 2 * self.max_size:
+                    self._reload()
+
+    def clear(self) -> None:
+        """Drop every entry and start a new generation."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM answers")
+            self._conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'generation'")
+            self._conn.execute("COMMIT")
+            self.generation = self._generation()
+            self._reload()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM answers WHERE created >= ?", (self._cutoff(),)
+            ).fetchone()[0]
+
+    def _cutoff(self) -> float:
+        return -np.inf if self.ttl is None else self.clock() - self.ttl
+
+    def _generation(self) -> int:
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()[0]
+
+    def _sync(self) -> None:
+        # data_version only changes when another connection committed.
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._version:
+            return
+        self._version = version
+        generation = self._generation()
+        if generation != self.generation:
+            self.generation = generation
+            self._vectors.clear()
+            self._seen = 0
+        rows = self._conn.execute(
+            "SELECT rowid, question, vector, created FROM answers WHERE rowid > ?", (self._seen,)
+        ).fetchall()
+        for rowid, question, blob, created in rows:
+            self._vectors.set(question, np.frombuffer(blob, dtype=np.float32), created)
+            self._seen = max(self._seen, rowid)
+
+    def _reload(self) -> None:
+        self._vectors.clear()
+        self._seen = 0
+        self._version = None
+        self._sync()
+
+
+class SemanticCache:
+    """Serve answers for questions similar to ones already answered."""
+
+    def __init__(self, embeddings, store=None, threshold: float = 0.95) -> None:
+        """Configure the cache.
+
+        Parameters
+        ----------
+        embeddings: Embeddings
+            Model exposing ``embed_query`` and ``aembed_query``.
+        store: object, optional
+            Backend implementing ``match``, ``put``, ``clear``,
+            ``generation`` and ``__len__``; an :class:`InMemoryCacheStore`
+            is used when omitted.
+        threshold: float
+            Minimum cosine similarity for a cached answer to be reused.
+        """
+        self.embeddings = embeddings
+        self.store = store if store is not None else InMemoryCacheStore()
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        """Number of invalidations seen by the store, shared with other processes when it is."""
+        return self.store.generation
+
+    def lookup(self, question: str):
+        """Return the embedding of ``question`` and any cached answer for it.
+
+        Parameters
+        ----------
+        question: str
+            Natural language prompt from a user.
+
+        Returns
+        -------
+        tuple
+            Normalised question vector and the cached value or ``None``.
+        """
+        return self.lookup_vector(self.embeddings.embed_query(question))
+
+    async def alookup(self, question: str):
+        """Asynchronous counterpart of :meth:`lookup`."""
+        return await self.alookup_vector(await self.embeddings.aembed_query(question))
+
+    def lookup_vector(self, vector):
+        """Like :meth:`lookup` for a question that is already embedded.
+
+        Parameters
+        ----------
+        vector: List[float]
+            Embedding of the question.
+
+        Returns
+        -------
+        tuple
+            Normalised question vector and the cached value or ``None``.
+        """
+        vector = _normalise(vector)
+        return vector, self._record(self.store.match(vector, self.threshold))
+
+    async def alookup_vector(self, vector):
+        """Like :meth:`lookup_vector`, searching the store in a worker thread."""
+        return await asyncio.to_thread(self.lookup_vector, vector)
+
+    def put(self, question: str, vector: np.ndarray, value: dict, generation: Optional[int] = None) -> None:
+        """Remember the answer produced for a question.
+
+        Parameters
+        ----------
+        question: str
+            Natural language prompt from a user.
+        vector: np.ndarray
+            Embedding returned by :meth:`lookup`.
+        value: dict
+            Answer, summary, and escalation flag.
+        generation: int, optional
+            :attr:`generation` read before the answer was computed; the
+            answer is dropped if the cache was invalidated since, as it may
+            stem from the previous knowledge base.
+        """
+        self.store.put(question, vector, value, generation)
+
+    async def aput(self, question: str, vector: np.ndarray, value: dict, generation: Optional[int] = None) -> None:
+        """Like :meth:`put`, writing to the store in a worker thread."""
+        await asyncio.to_thread(self.put, question, vector, value, generation)
+
+    def invalidate(self) -> None:
+        """Forget all answers, e.g. after the knowledge base changed."""
+        self.store.clear()
+
+    def stats(self) -> dict:
+        """Report hit and miss counters together with the current size."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.store)}
+
+    def _record(self, value: Optional[dict]) -> Optional[dict]:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
@@ -1,13 +1,17 @@
 """Assembly of the collaborative workflow.
 
-The graph orchestrates retrieval, summarisation, and optional human
-escalation using LangGraph's state machine primitives.
+The graph orchestrates retrieval, answering, summarisation, and optional
+human escalation using LangGraph's state machine primitives. Answering
+and summarisation fan out from retrieval and run concurrently.
 """
-from typing import List, TypedDict
+from typing import AsyncIterator, Iterable, List, Optional, Tuple, TypedDict
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 from .agents.query import QueryAgent
 from .agents.summarizer import SummarizerAgent
 from .agents.human import human_response
+from .memo import NodeMemo
+from .metrics import metrics
 
 class GraphState(TypedDict, total=False):
     """State carried between nodes in the workflow."""
@@ -17,7 +21,12 @@ class GraphState(TypedDict, total=False):
     summary: str
     needs_human: bool
 
-def create_graph(query_agent: QueryAgent, summarizer: SummarizerAgent):
+def create_graph(
+    query_agent: QueryAgent,
+    summarizer: SummarizerAgent,
+    memo: Optional[NodeMemo] = None,
+    memoize: Iterable[str] = ("summarize",),
+):
     """Construct the workflow graph linking agents together.
 
     Parameters
@@ -26,33 +35,147 @@ def create_graph(query_agent: QueryAgent, summarizer: SummarizerAgent):
         Retrieval and reasoning component.
     summarizer: SummarizerAgent
         Agent responsible for summarisation.
+    memo: NodeMemo, optional
+        Store reusing the output of the ``memoize`` nodes for inputs seen
+        before; every node runs each time when omitted.
+    memoize: Iterable[str]
+        Nodes whose outputs are memoised, among ``summarize``, which reads
+        the retrieved documents, and ``answer``, which also reads the
+        question.
 
     Returns
     -------
     Runnable
-        Executable graph object.
+        Executable graph object supporting both ``invoke`` and
+        ``ainvoke``; the latter awaits the agents' asynchronous methods.
     """
-    def query_node(state: GraphState) -> GraphState:
-        docs, answer, needs_human = query_agent.run(state["question"])
-        return {
-            "docs": [d.page_content for d in docs],
-            "answer": answer,
-            "needs_human": needs_human,
-        }
+    # Inputs may already carry retrieved context, e.g. from a batched
+    # search; retrieval is skipped for them.
+    def retrieve_node(state: GraphState) -> GraphState:
+        if "docs" in state:
+            return {"docs": state["docs"], "needs_human": state.get("needs_human", False)}
+        docs, needs_human = query_agent.retrieve(state["question"])
+        return {"docs": [d.page_content for d in docs], "needs_human": needs_human}
+
+    async def aretrieve_node(state: GraphState) -> GraphState:
+        if "docs" in state:
+            return {"docs": state["docs"], "needs_human": state.get("needs_human", False)}
+        docs, needs_human = await query_agent.aretrieve(state["question"])
+        return {"docs": [d.page_content for d in docs], "needs_human": needs_human}
+
+    def answer_node(state: GraphState) -> GraphState:
+        return {"answer": query_agent.answer(state["question"], state["docs"])}
+
+    async def aanswer_node(state: GraphState) -> GraphState:
+        return {"answer": await query_agent.aanswer(state["question"], state["docs"])}
 
     def summarize_node(state: GraphState) -> GraphState:
         summary = summarizer.run(state["docs"])
         return {"summary": summary}
 
+    async def asummarize_node(state: GraphState) -> GraphState:
+        summary = await summarizer.arun(state["docs"])
+        return {"summary": summary}
+
     def human_node(state: GraphState) -> GraphState:
+        if metrics.enabled:
+            metrics.inc("workflow_escalations_total")
         return {"answer": human_response(state["question"])}
 
+    def route(state: GraphState):
+        # Answering and summarising only depend on the retrieved docs, so
+        # they run side by side in the same step.
+        return "human" if state["needs_human"] else ["answer", "summarize"]
+
+    # Inputs and model determining each memoisable node's output.
+    keys = {
+        "summarize": lambda state: ("summarize", getattr(summarizer, "model", None), state["docs"]),
+        "answer": lambda state: (
+            "answer", getattr(query_agent, "model", None), [state["question"], state["docs"]]
+        ),
+    }
+    memoize = set(memoize) if memo is not None else set()
+    if memoize - set(keys):
+        raise ValueError(f"Cannot memoise nodes {sorted(memoize - set(keys))}")
+
+    def memoized(name, func, afunc):
+        def run(state: GraphState) -> GraphState:
+            key = memo.key(*keys[name](state))
+            update = memo.get(key)
+            if update is None:
+                update = func(state)
+                memo.put(key, update)
+            return update
+
+        async def arun(state: GraphState) -> GraphState:
+            key = memo.key(*keys[name](state))
+            update = memo.get(key)
+            if update is None:
+                update = await afunc(state)
+                memo.put(key, update)
+            return update
+
+        return run, arun
+
+    def node(name, func, afunc=None):
+        if name in memoize:
+            func, afunc = memoized(name, func, afunc)
+        timed = metrics.timed(f"node.{name}")
+        if afunc is None:
+            return timed(func)
+        return RunnableLambda(timed(func), afunc=timed(afunc))
+
     graph = StateGraph(GraphState)
-    graph.add_node("query", query_node)
-    graph.add_node("summarize", summarize_node)
-    graph.add_node("human", human_node)
-    graph.add_edge(START, "query")
-    graph.add_conditional_edges("query", lambda s: "human" if s["needs_human"] else "summarize")
+    graph.add_node("retrieve", node("retrieve", retrieve_node, aretrieve_node))
+    graph.add_node("answer", node("answer", answer_node, aanswer_node))
+    graph.add_node("summarize", node("summarize", summarize_node, asummarize_node))
+    graph.add_node("human", node("human", human_node))
+    graph.add_edge(START, "retrieve")
+    graph.add_conditional_edges("retrieve", route, ["human", "answer", "summarize"])
+    graph.add_edge("answer", END)
     graph.add_edge("summarize", END)
     graph.add_edge("human", END)
     return graph.compile()
+
+
+async def astream_query(workflow, question: str) -> AsyncIterator[Tuple[str, dict]]:
+    """Run the workflow and yield progress events as they happen.
+
+    Parameters
+    ----------
+    workflow: Runnable
+        Graph produced by :func:`create_graph`.
+    question: str
+        Natural language prompt from a user.
+
+    Yields
+    ------
+    tuple
+        ``(event, payload)`` pairs. ``token`` events carry a fragment of
+        model output and the node producing it, ``node`` events mark a
+        finished node, and a final ``done`` event holds the full result.
+    """
+    result: GraphState = {}
+    async for mode, chunk in workflow.astream(
+        {"question": question}, stream_mode=["updates", "messages"]
+    ):
+        if mode == "messages":
+            message, metadata = chunk
+            if message.content:
+                yield "token", {
+                    "node": metadata.get("langgraph_node"),
+                    "content": message.content,
+                }
+            continue
+        for node, update in chunk.items():
+            update = update or {}
+            result.update(update)
+            payload = {k: v for k, v in update.items() if k != "docs"}
+            if "docs" in update:
+                payload["docs"] = len(update["docs"])
+            yield "node", {"node": node, **payload}
+    yield "done", {
+        "answer": result.get("answer"),
+        "summary": result.get("summary"),
+        "needs_human": result.get("needs_human"),
+    }
@@ -0,0 +1,340 @@
+"""Background ingestion of uploaded documents.
+
+Uploads are spooled to disk and handed to an :class:`IngestionQueue`,
+which chunks them in the background and lets a pool of workers embed
+chunks from all pending uploads in shared batches. Progress of each
+upload is tracked as a job that clients can poll.
+
+Uploads submitted with a document id are indexed incrementally: chunks
+are addressed by content, only chunks the store does not hold yet are
+embedded, and chunks of the previous version that are no longer used
+are deleted once the new version is complete. When an upload fails, the
+chunks its batches already stored are deleted again unless a document or
+another running upload uses them.
+"""
+import asyncio
+from collections import OrderedDict
+import os
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import uuid
+from .agents.embedder import EmbeddingAgent, chunk_id
+from .agents.loader import BLOCK_SIZE, aiter_chunks
+
+
+class IngestionJob:
+    """Progress record for a single upload."""
+
+    def __init__(self, job_id: str, document_id: Optional[str] = None) -> None:
+        self.id = job_id
+        self.document_id = document_id
+        self.status = "queued"
+        self.embedded = 0
+        self.skipped = 0
+        self.deleted = 0
+        self.total: Optional[int] = None
+        self.error: Optional[str] = None
+        # Content addresses the upload uses, and those its batches stored.
+        self._chunks: Set[str] = set()
+        self._stored: List[str] = []
+        self._drained = asyncio.Event()
+        self._finished = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def as_dict(self) -> dict:
+        """Serialise the job for API responses."""
+        return {
+            "id": self.id,
+            "document_id": self.document_id,
+            "status": self.status,
+            "embedded": self.embedded,
+            "skipped": self.skipped,
+            "deleted": self.deleted,
+            "total": self.total,
+            "error": self.error,
+        }
+
+    def _settle(self) -> None:
+        if self.status != "running" or self.total is None:
+            return
+        if self.embedded + self.skipped >= self.total:
+            self._drained.set()
+            if self.document_id is None:
+                self._finish("done")
+
+    def _finish(self, status: str) -> None:
+        self.status = status
+        self._drained.set()
+        self._finished.set()
+
+
+class IngestionQueue:
+    """Chunk uploads in the background and embed them in coalesced batches."""
+
+    def __init__(
+        self,
+        embedder: EmbeddingAgent,
+        batch_size: int = 64,
+        max_wait: float = 0.05,
+        workers: int = 2,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_pending: int = 1024,
+        max_jobs: int = 1000,
+        on_change: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Configure batching and retry behaviour.
+
+        Parameters
+        ----------
+        embedder: EmbeddingAgent
+            Store that receives the chunks.
+        batch_size: int
+            Maximum number of chunks per ``aadd`` call.
+        max_wait: float
+            Seconds a worker waits for a batch to fill before flushing it.
+        workers: int
+            Number of concurrent embedding workers.
+        retries: int
+            Extra attempts for a failing batch before its jobs fail.
+        backoff: float
+            Initial delay between retries, doubled after every attempt.
+        max_pending: int
+            Chunks buffered ahead of the workers before readers pause.
+        max_jobs: int
+            Finished jobs remembered for status queries.
+        on_change: Callable[[], None], optional
+            Invoked after every batch that reached the store.
+        """
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.on_change = on_change
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._readers: Dict[str, asyncio.Task] = {}
+        # Content addresses queued but not stored yet, resolved to whether
+        # they reached the store.
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._commit_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Launch the embedding workers on the running event loop.
+
+        Does nothing when the workers are already running. :meth:`submit`
+        launches them too, so starting early is optional.
+        """
+        self._launch()
+
+    async def stop(self) -> None:
+        """Cancel readers and workers, abandoning unfinished jobs."""
+        tasks = self._tasks + list(self._readers.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._readers.clear()
+
+    def submit(self, path: str, document_id: Optional[str] = None) -> IngestionJob:
+        """Schedule a spooled upload for ingestion.
+
+        Must be called on the running event loop, where it launches the
+        workers unless :meth:`start` already did.
+
+        Parameters
+        ----------
+        path: str
+            Temporary file holding the upload; it is deleted once read.
+        document_id: str, optional
+            Key of the document. When given, the upload replaces the
+            previous version and only new or changed chunks are embedded;
+            otherwise every chunk is added as new.
+
+        Returns
+        -------
+        IngestionJob
+            Job tracking the upload's progress.
+        """
+        self._launch()
+        job = IngestionJob(uuid.uuid4().hex, document_id)
+        self.jobs[job.id] = job
+        self._prune()
+        self._readers[job.id] = asyncio.create_task(self._read(job, path))
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Return the job with the given id if it is still tracked."""
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: IngestionJob) -> IngestionJob:
+        """Wait until ``job`` is done or has failed and return it."""
+        await job._finished.wait()
+        return job
+
+    async def join(self) -> None:
+        """Wait until every submitted upload has been processed."""
+        while self._readers:
+            await asyncio.gather(*self._readers.values(), return_exceptions=True)
+        if self._queue is not None:
+            await self._queue.join()
+
+    def _launch(self) -> None:
+        # Workers belong to the loop they were created on; a new loop,
+        # e.g. one per request without a lifespan, needs its own.
+        loop = asyncio.get_running_loop()
+        if self._tasks and self._tasks[0].get_loop() is loop:
+            return
+        self._queue = asyncio.Queue(self.max_pending)
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    async def _read(self, job: IngestionJob, path: str) -> None:
+        job.status = "running"
+        ids: List[str] = []
+        seen = job._chunks
+        reused: Dict[str, str] = {}
+        shared: List[asyncio.Future] = []
+        try:
+            with open(path, "rb") as handle:
+                async def blocks():
+                    while block := await asyncio.to_thread(handle.read, BLOCK_SIZE):
+                        yield block
+
+                async for chunk in aiter_chunks(blocks()):
+                    if job.finished:
+                        break
+                    if job.document_id is None:
+                        ids.append(uuid.uuid4().hex)
+                        await self._queue.put((job, chunk, ids[-1]))
+                        continue
+                    key = chunk_id(chunk)
+                    ids.append(key)
+                    if key in seen:
+                        job.skipped += 1
+                    elif self.embedder.known([key]):
+                        reused[key] = chunk
+                        job.skipped += 1
+                    elif key in self._pending:
+                        shared.append(self._pending[key])
+                        job.skipped += 1
+                    else:
+                        self._pending[key] = asyncio.get_running_loop().create_future()
+                        await self._queue.put((job, chunk, key))
+                    seen.add(key)
+            job.total = len(ids)
+            job._settle()
+            if job.document_id is not None and not job.finished:
+                await self._commit(job, ids, reused, shared)
+        except Exception as exc:
+            self._fail([job], exc)
+        finally:
+            os.unlink(path)
+            self._readers.pop(job.id, None)
+
+    async def _commit(
+        self,
+        job: IngestionJob,
+        ids: List[str],
+        reused: Dict[str, str],
+        shared: List[asyncio.Future],
+    ) -> None:
+        # The old version stays searchable until every chunk of the new
+        # one, including those embedded for other uploads, is stored.
+        await job._drained.wait()
+        if job.finished:
+            return
+        if not all(await asyncio.gather(*shared)):
+            raise RuntimeError("Shared chunks could not be embedded")
+        async with self._commit_lock:
+            # Another upload may have dropped a reused chunk meanwhile.
+            known = self.embedder.known(reused)
+            lost = {key: text for key, text in reused.items() if key not in known}
+            if lost:
+                await self.embedder.aadd(list(lost.values()), list(lost))
+                job.embedded += len(lost)
+                job.skipped -= len(lost)
+            job.deleted = await asyncio.to_thread(self.embedder.replace_document, job.document_id, ids)
+        job._finish("done")
+        if job.deleted and self.on_change is not None:
+            self.on_change()
+
+    async def _work(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.batch_size:
+                if not self._queue.empty():
+                    items.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._embed(items)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    async def _embed(self, items: List[Tuple[IngestionJob, str, str]]) -> None:
+        for job, _, key in items:
+            if job.finished:
+                self._resolve(key, False)
+        items = [item for item in items if not item[0].finished]
+        if not items:
+            return
+        for attempt in range(self.retries + 1):
+            try:
+                await self.embedder.aadd([text for _, text, _ in items], [key for _, _, key in items])
+                break
+            except Exception as exc:
+                if attempt == self.retries:
+                    for _, _, key in items:
+                        self._resolve(key, False)
+                    self._fail({job for job, _, _ in items}, exc)
+                    return
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        for job, _, key in items:
+            job.embedded += 1
+            job._stored.append(key)
+            self._resolve(key, True)
+        for job in {job for job, _, _ in items}:
+            job._settle()
+        if self.on_change is not None:
+            self.on_change()
+
+    def _resolve(self, key: str, stored: bool) -> None:
+        future = self._pending.pop(key, None)
+        if future is not None:
+            future.set_result(stored)
+
+    def _fail(self, jobs, exc: Exception) -> None:
+        for job in jobs:
+            job.error = str(exc) or type(exc).__name__
+            job._finish("failed")
+        # The chunks stored so far belong to no document and would stay
+        # searchable. This runs on the event loop, so no upload can start
+        # relying on them between choosing and deleting them.
+        needed = set()
+        for job in self.jobs.values():
+            if not job.finished:
+                needed |= job._chunks
+        stored = [key for job in jobs for key in job._stored if key not in needed]
+        if stored and self.embedder.discard(stored) and self.on_change is not None:
+            self.on_change()
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(self.jobs) - self.max_jobs)]:
+            del self.jobs[job_id]
@@ -0,0 +1,120 @@
+"""Memoisation of graph node outputs.
+
+Some nodes are pure functions of part of the state: the summary only
+depends on the retrieved documents, so different questions retrieving
+the same chunks can share it. :class:`NodeMemo` keys a node's output by
+a stable hash of the node name, the model and the inputs it reads, keeps
+the most recently used entries in memory or in a SQLite file shared
+between workers, and is cleared whenever the collection changes.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class NodeMemo:
+    """Bounded LRU memo of node outputs, optionally persisted to disk."""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Create an empty memo.
+
+        Parameters
+        ----------
+        max_size: int
+            Maximum number of remembered outputs.
+        path: str, optional
+            SQLite file holding the entries; kept in memory when omitted.
+        clock: Callable[[], float]
+            Source of the current time, used to order entries on disk.
+        """
+        self.max_size = max_size
+        self.path = path
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._conn = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS memo (key TEXT PRIMARY KEY, value TEXT, used REAL)"
+            )
+
+    @staticmethod
+    def key(node: str, model: str, inputs: Any) -> str:
+        """Return the stable key of a node call.
+
+        Parameters
+        ----------
+        node: str
+            Name of the graph node.
+        model: str
+            Model producing the output.
+        inputs: Any
+            JSON-serialisable inputs the node reads.
+        """
+        blob = json.dumps([node, model, inputs], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the output stored under ``key`` and mark it recently used."""
+        with self._lock:
+            if self._conn is None:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+            else:
+                row = self._conn.execute("SELECT value FROM memo WHERE key = ?", (key,)).fetchone()
+                value = None if row is None else json.loads(row[0])
+                if value is not None:
+                    self._conn.execute("UPDATE memo SET used = ? WHERE key = ?", (self.clock(), key))
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: str, value: dict) -> None:
+        """Store an output, evicting the least recently used ones."""
+        with self._lock:
+            if self._conn is None:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO memo VALUES (?, ?, ?)", (key, json.dumps(value), self.clock())
+            )
+            self._conn.execute(
+                "DELETE FROM memo WHERE key NOT IN (SELECT key FROM memo ORDER BY used DESC LIMIT ?)",
+                (self.max_size,),
+            )
+
+    def invalidate(self) -> None:
+        """Forget every output, e.g. after the collection changed."""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM memo")
+
+    def stats(self) -> dict:
+        """Return hit and miss counters and the number of entries."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._conn is None:
+                return len(self._entries)
+            return self._conn.execute("SELECT COUNT(*) FROM memo").fetchone()[0]
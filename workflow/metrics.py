@@ -0,0 +1,173 @@
+"""Lightweight instrumentation for graph nodes and agent calls.
+
+A process-wide :data:`metrics` registry records latency histograms,
+error counters, in-flight gauges and model token usage, and renders
+them in the Prometheus text exposition format. Recording is off by
+default; while disabled the instrumented functions only pay for a
+single attribute check per call.
+"""
+import asyncio
+from contextlib import contextmanager
+import functools
+import threading
+import time
+from typing import Dict, Tuple
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_FAMILIES = {
+    "workflow_duration_seconds": ("histogram", "Time spent in graph nodes and agent calls."),
+    "workflow_errors_total": ("counter", "Graph nodes and agent calls that raised."),
+    "workflow_in_flight": ("gauge", "Graph nodes and agent calls currently running."),
+    "workflow_llm_tokens_total": ("counter", "Tokens exchanged with chat models."),
+    "workflow_escalations_total": ("counter", "Questions routed to human review."),
+    "workflow_coalesced_total": ("counter", "Queries that joined an identical query already in flight."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """Registry of counters, gauges and histograms."""
+
+    def __init__(self, enabled: bool = False, buckets=BUCKETS) -> None:
+        """Create an empty registry.
+
+        Parameters
+        ----------
+        enabled: bool
+            Whether instrumented calls record anything.
+        buckets: tuple
+            Upper bounds, in seconds, of the latency histogram buckets.
+        """
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[Labels, object]] = {name: {} for name in _FAMILIES}
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        """Increase a counter or gauge."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record a sample in a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def track(self, operation: str):
+        """Time a block and count it as in flight, noting any exception."""
+        self.inc("workflow_in_flight", operation=operation)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("workflow_errors_total", operation=operation)
+            raise
+        finally:
+            self.observe("workflow_duration_seconds", time.perf_counter() - start, operation=operation)
+            self.inc("workflow_in_flight", -1.0, operation=operation)
+
+    def timed(self, operation: str):
+        """Decorate a function or coroutine function with :meth:`track`.
+
+        Parameters
+        ----------
+        operation: str
+            Label identifying the call in every recorded series.
+        """
+        def decorate(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    with self.track(operation):
+                        return await func(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.track(operation):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorate
+
+    def record_usage(self, operation: str, response) -> None:
+        """Count prompt and completion tokens reported by a chat model reply.
+
+        Parameters
+        ----------
+        operation: str
+            Label identifying the calling agent.
+        response: object
+            Message returned by the model; replies without usage data are
+            ignored.
+        """
+        if not self.enabled:
+            return
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt, completion = usage.get("input_tokens"), usage.get("output_tokens")
+        if prompt is None and completion is None:
+            meta = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+            prompt, completion = meta.get("prompt_tokens"), meta.get("completion_tokens")
+        if prompt:
+            self.inc("workflow_llm_tokens_total", prompt, operation=operation, type="prompt")
+        if completion:
+            self.inc("workflow_llm_tokens_total", completion, operation=operation, type="completion")
+
+    def reset(self) -> None:
+        """Forget every recorded value."""
+        with self._lock:
+            self._values = {name: {} for name in _FAMILIES}
+
+    def render(self) -> str:
+        """Return all series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (kind, doc) in _FAMILIES.items():
+                lines.append(f"# HELP {name} {doc}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._values[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                        continue
+                    counts, total, count = value
+                    bounds = [f"{b:g}" for b in self.buckets] + ["+Inf"]
+                    for bound, bucket in zip(bounds, counts + [count]):
+                        le = 'le="%s"' % bound
+                        lines.append(f"{name}_bucket{_format_labels(labels, le)} {bucket}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,101 @@
+"""Registry of named document collections.
+
+Each collection, e.g. one per tenant or corpus, has its own vector store,
+retrieval agent, graph, ingestion queue and answer cache, so tenants never
+see each other's documents and a large corpus does not slow down searches
+in a small one. Collections are built on first use.
+"""
+import re
+import threading
+from typing import Callable, Dict, Iterator, Optional
+
+NAME_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_-]{1,62}[A-Za-z0-9]$"
+
+
+class Collection:
+    """Services bound to one named collection."""
+
+    def __init__(
+        self,
+        name: str,
+        embedder,
+        query_agent,
+        workflow,
+        ingestion,
+        cache=None,
+        memo=None,
+    ) -> None:
+        self.name = name
+        self.embedder = embedder
+        self.query_agent = query_agent
+        self.workflow = workflow
+        self.ingestion = ingestion
+        self.cache = cache
+        self.memo = memo
+
+    def invalidate(self) -> None:
+        """Drop cached answers and node outputs after the collection changed."""
+        if self.cache is not None:
+            self.cache.invalidate()
+        if self.memo is not None:
+            self.memo.invalidate()
+
+
+class CollectionRegistry:
+    """Build named collections on demand and keep them for reuse."""
+
+    def __init__(self, build: Callable[[str], Collection], limit: int = 64) -> None:
+        """Configure how collections are created.
+
+        Parameters
+        ----------
+        build: Callable[[str], Collection]
+            Factory creating the services of a collection from its name.
+        limit: int
+            Maximum number of collections served by this process.
+        """
+        self.build = build
+        self.limit = limit
+        self._collections: Dict[str, Collection] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Collection:
+        """Return the collection called ``name``, creating it if needed.
+
+        Parameters
+        ----------
+        name: str
+            Collection name matching :data:`NAME_PATTERN`.
+
+        Returns
+        -------
+        Collection
+            Services of the collection.
+
+        Raises
+        ------
+        ValueError
+            If the name is invalid.
+        LookupError
+            If creating the collection would exceed ``limit``.
+        """
+        if not re.match(NAME_PATTERN, name):
+            raise ValueError(f"Invalid collection name {name!r}")
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                if len(self._collections) >= self.limit:
+                    raise LookupError(f"At most {self.limit} collections are served")
+                collection = self._collections[name] = self.build(name)
+            return collection
+
+    def find(self, name: str) -> Optional[Collection]:
+        """Return the collection called ``name`` if it was built."""
+        return self._collections.get(name)
+
+    def __iter__(self) -> Iterator[Collection]:
+        with self._lock:
+            return iter(list(self._collections.values()))
+
+    def __len__(self) -> int:
+        return len(self._collections)
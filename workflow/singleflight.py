@@ -0,0 +1,85 @@
+"""Coalescing of identical concurrent calls.
+
+When many clients ask the same question at once, only the first call
+runs; the others wait for and share its result. Nothing is remembered
+once the call completes, so results are never stale.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """Share one in-flight execution among callers using the same key."""
+
+    def __init__(self, on_shared: Optional[Callable[[], None]] = None) -> None:
+        """Create an empty registry of in-flight calls.
+
+        Parameters
+        ----------
+        on_shared: Callable[[], None], optional
+            Invoked whenever a caller joins a call already in flight.
+        """
+        self.on_shared = on_shared
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``func`` unless a call with ``key`` is already in flight.
+
+        Parameters
+        ----------
+        key: Hashable
+            Identity of the call; callers with equal keys share a result.
+        func: Callable[[], Awaitable]
+            Coroutine factory invoked only by the first caller.
+
+        Returns
+        -------
+        Any
+            Result of the shared call. Its exception, if any, is raised in
+            every waiter.
+
+        Notes
+        -----
+        A cancelled waiter, e.g. one whose client disconnected, leaves the
+        call running for the others; the call itself is cancelled only
+        once nobody waits for it any more.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executed += 1
+        else:
+            self.shared += 1
+            if self.on_shared is not None:
+                self.on_shared()
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._calls.get(key) is task and self._waiters[key] == 1 and not task.done():
+                # Forget the call right away so a caller arriving before
+                # the cancellation completes starts a fresh execution.
+                del self._calls[key]
+                del self._waiters[key]
+                task.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            # Mark the exception as seen even when every waiter left.
+            task.exception()
@@ -0,0 +1,173 @@
+"""Snapshots of the vector store for cold-starting replicas.
+
+A snapshot holds every stored fragment with its id, text, metadata and
+vector, plus the manifest of uploaded documents, so a new replica can
+serve queries without a single embedding call. The file is columnar:
+
+* an 8-byte magic number, padded to 64 bytes;
+* the vectors as one contiguous little-endian ``float32`` or ``float16``
+  matrix, which is memory-mapped on load;
+* the ids, texts, metadata and manifest as JSON columns;
+* a JSON footer locating each column, its length and the magic number.
+
+Usage::
+
+    python -m workflow.snapshot export index.snap --dtype float16
+    python -m workflow.snapshot import index.snap --collection manuals
+
+The command line opens the store in its own process, so it needs a store
+persisted on disk (``VECTOR_BACKEND=local`` with ``VECTOR_INDEX_PATH``);
+the Chroma store lives in the serving process only and is exported and
+imported through ``/snapshot``.
+"""
+import argparse
+import json
+import os
+import struct
+from typing import List, Optional
+import numpy as np
+
+MAGIC = b"WFSNAP01"
+_HEADER = 64
+_TAIL = struct.Struct("<Q8s")
+_COLUMNS = ("ids", "texts", "metadatas", "documents")
+
+
+class Snapshot:
+    """Columns of a snapshot file with vectors mapped from disk."""
+
+    def __init__(self, path: str) -> None:
+        """Read the footer and columns of ``path``.
+
+        Parameters
+        ----------
+        path: str
+            Snapshot file written by :func:`export_snapshot`.
+        """
+        with open(path, "rb") as handle:
+            if handle.read(len(MAGIC)) != MAGIC or os.path.getsize(path) < _HEADER + _TAIL.size:
+                raise ValueError(f"{path} is not a snapshot")
+            handle.seek(-_TAIL.size, os.SEEK_END)
+            size, magic = _TAIL.unpack(handle.read(_TAIL.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is truncated")
+            handle.seek(-_TAIL.size - size, os.SEEK_END)
+            footer = json.loads(handle.read(size))
+            columns = {}
+            for name in _COLUMNS:
+                offset, length = footer["columns"][name]
+                handle.seek(offset)
+                columns[name] = json.loads(handle.read(length))
+        self.count: int = footer["count"]
+        self.dim: int = footer["dim"]
+        self.dtype = np.dtype(footer["dtype"]).newbyteorder("<")
+        self.ids: List[Optional[str]] = columns["ids"]
+        self.texts: List[str] = columns["texts"]
+        self.metadatas: List[dict] = columns["metadatas"]
+        self.documents: dict = columns["documents"]
+        if self.count:
+            self.vectors = np.memmap(path, self.dtype, "r", _HEADER, (self.count, self.dim))
+        else:
+            self.vectors = np.empty((0, self.dim), self.dtype)
+
+
+def export_snapshot(embedder, path: str, dtype: str = "float32", batch_size: int = 4096) -> dict:
+    """Write every fragment stored by ``embedder`` to a snapshot file.
+
+    Parameters
+    ----------
+    embedder: EmbeddingAgent
+        Agent whose backend implements ``dump``.
+    path: str
+        Destination file; replaced atomically.
+    dtype: str
+        Precision of the stored vectors, ``float32`` or ``float16``.
+    batch_size: int
+        Fragments read from the backend at a time.
+
+    Returns
+    -------
+    dict
+        Number of fragments, vector dimension, dtype and file size.
+    """
+    if dtype not in ("float32", "float16"):
+        raise ValueError(f"Unsupported snapshot dtype {dtype}")
+    stored = np.dtype(dtype).newbyteorder("<")
+    columns = {name: [] for name in _COLUMNS[:3]}
+    dim = 0
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(MAGIC.ljust(_HEADER, b"\0"))
+        for ids, texts, metadatas, vectors in embedder.backend.dump(batch_size):
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if len(vectors):
+                dim = vectors.shape[1]
+                handle.write(vectors.astype(stored).tobytes())
+            columns["ids"].extend(ids)
+            columns["texts"].extend(texts)
+            columns["metadatas"].extend(metadatas)
+        columns["documents"] = embedder.documents()
+        footer = {
+            "count": len(columns["ids"]),
+            "dim": dim,
+            "dtype": stored.name,
+            "columns": {},
+        }
+        for name in _COLUMNS:
+            blob = json.dumps(columns[name]).encode("utf-8")
+            footer["columns"][name] = [handle.tell(), len(blob)]
+            handle.write(blob)
+        blob = json.dumps(footer).encode("utf-8")
+        handle.write(blob)
+        handle.write(_TAIL.pack(len(blob), MAGIC))
+    os.replace(tmp, path)
+    return {"count": footer["count"], "dim": dim, "dtype": stored.name, "bytes": os.path.getsize(path)}
+
+
+def import_snapshot(embedder, path: str) -> dict:
+    """Replace the contents of ``embedder`` with a snapshot.
+
+    Parameters
+    ----------
+    embedder: EmbeddingAgent
+        Agent whose backend implements ``restore``.
+    path: str
+        Snapshot file written by :func:`export_snapshot`.
+
+    Returns
+    -------
+    dict
+        Number of fragments and documents loaded.
+    """
+    snapshot = Snapshot(path)
+    embedder.clear()
+    embedder.backend.restore(snapshot.ids, snapshot.texts, snapshot.metadatas, snapshot.vectors)
+    embedder.load_documents(snapshot.documents)
+    return {"count": snapshot.count, "documents": len(snapshot.documents)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or import a vector store snapshot.")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--collection", help="collection name; the default collection when omitted")
+    args = parser.parse_args()
+
+    from .app import _build_embedder, _index_path, default_collection
+
+    name = args.collection or default_collection
+    if os.environ.get("VECTOR_BACKEND", "chroma") != "local" or not _index_path(name):
+        parser.error(
+            "the store of this process is not persisted; set VECTOR_BACKEND=local and "
+            "VECTOR_INDEX_PATH, or use the /snapshot endpoints of the running service"
+        )
+    embedder = _build_embedder(name)
+    if args.action == "export":
+        print(json.dumps(export_snapshot(embedder, args.path, args.dtype)))
+    else:
+        print(json.dumps(import_snapshot(embedder, args.path)))
+
+
+if __name__ == "__main__":  # pragma: no cover - command-line entry point
+    main()